@@ -1,9 +1,122 @@
-from flask import Flask, jsonify
+from flask import Flask, Response, jsonify, request
+from urllib.parse import urlencode
+import base64
+import binascii
 import datetime
+import hmac
+import json
+import os
+
+import metrics
+from journey_planner import (
+    DEFAULT_MAX_TRANSFERS, DEFAULT_MIN_TRANSFER_MINUTES, describe_journey, earliest_arrival,
+)
+from response_cache import ResponseCache
+from schedule_deltas import ScheduleReloader, append_deltas, validate_delta
+from schedule_snapshot import load_snapshot
+from schedule_store import ScheduleStore, parse_time
 
 app = Flask(__name__)
+metrics.init_app(app)
+
+# Mock train schedule data
+SCHEDULE = [
+    {"train_id": "T101", "origin": "Station A", "destination": "Station B", "departure_time": "08:00", "arrival_time": "08:30"},
+    {"train_id": "T102", "origin": "Station B", "destination": "Station C", "departure_time": "09:15", "arrival_time": "09:45"},
+    {"train_id": "T103", "origin": "Station A", "destination": "Station C", "departure_time": "10:00", "arrival_time": "11:00"},
+]
+
+def load_schedule():
+    """Maps the snapshot named by SCHEDULE_SNAPSHOT, falling back to the mock data."""
+    snapshot_path = os.environ.get('SCHEDULE_SNAPSHOT')
+    if snapshot_path:
+        return load_snapshot(snapshot_path)
+    return ScheduleStore.from_trips(SCHEDULE)
+
+# Built once at startup; requests only read from it.
+schedule_store = load_schedule()
+
+response_cache = ResponseCache(
+    max_bytes=int(os.environ.get('RESPONSE_CACHE_MAX_BYTES', 64 * 1024 * 1024)),
+    on_lookup=metrics.cache_lookup_recorder('response'),
+)
+
+def set_schedule_store(store):
+    """Replaces the served timetable and drops responses built from the old one."""
+    global schedule_store
+    schedule_store = store
+    response_cache.clear()
+
+def schedule_version():
+    return schedule_store.version
+
+# Live updates: deltas appended to SCHEDULE_DELTA_LOG (by an operator or by
+# POST /admin/schedule/deltas) are applied in the background by every worker,
+# and each result is swapped in whole. Requests read `schedule_store` once and
+# keep that immutable store, so they never see a half-applied update.
+schedule_reloader = ScheduleReloader(
+    schedule_store,
+    set_schedule_store,
+    delta_path=os.environ.get('SCHEDULE_DELTA_LOG'),
+    poll_interval=float(os.environ.get('SCHEDULE_DELTA_POLL_SECONDS', 1.0)),
+)
+
+# Pagination defaults for /schedule?page_size=&after=
+DEFAULT_PAGE_SIZE = 500
+MAX_PAGE_SIZE = 10000
+# Rows serialized per chunk when streaming NDJSON.
+STREAM_CHUNK_ROWS = 1000
+
+# Upper bound on ?max_transfers= so one request cannot scan unbounded label sets.
+MAX_TRANSFERS_LIMIT = 8
+
+def bad_request(message):
+    return jsonify({"error": message}), 400
+
+def int_arg(name, default=None, minimum=0, maximum=None):
+    """Parses an optional integer query parameter, raising ValueError if out of range."""
+    value = request.args.get(name)
+    if value is None:
+        return default
+    try:
+        number = int(value)
+    except ValueError:
+        number = None
+    if number is None or number < minimum or (maximum is not None and number > maximum):
+        bounds = f"between {minimum} and {maximum}" if maximum is not None else f">= {minimum}"
+        raise ValueError(f"Invalid {name} '{value}', expected an integer {bounds}.")
+    return number
+
+def encode_cursor(store, row):
+    """Opaque keyset cursor: the sort key of the last row served (see ScheduleStore.sort_key)."""
+    key = json.dumps(store.sort_key(row), separators=(',', ':'))
+    return base64.urlsafe_b64encode(key.encode()).decode().rstrip('=')
+
+def decode_cursor(cursor):
+    """Returns the sort key in a cursor; it still applies after the timetable is swapped."""
+    try:
+        key = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        key = None
+    types = (int, str, str, str, int)
+    if not (isinstance(key, list) and len(key) == len(types)
+            and all(isinstance(v, t) and not isinstance(v, bool) for v, t in zip(key, types))):
+        raise ValueError(f"Invalid cursor '{cursor}'.")
+    return tuple(key)
+
+def stream_ndjson(store, rows):
+    """Yields trips as newline-delimited JSON, a chunk of rows at a time."""
+    chunk = []
+    for row in rows:
+        chunk.append(json.dumps(store.trip(row), separators=(',', ':')))
+        if len(chunk) == STREAM_CHUNK_ROWS:
+            yield '\n'.join(chunk) + '\n'
+            chunk = []
+    if chunk:
+        yield '\n'.join(chunk) + '\n'
 
 @app.route('/')
+@response_cache.cached(ttl=1)  # Short TTL keeps the timestamp fresh
 def home():
     return jsonify({
         "message": "Welcome to the Train Schedule API!",
@@ -12,14 +125,107 @@ def home():
     })
 
 @app.route('/schedule')
+@response_cache.cached(version=schedule_version)
 def get_schedule():
-    # Mock train schedule data
-    schedule = [
-        {"train_id": "T101", "origin": "Station A", "destination": "Station B", "departure_time": "08:00", "arrival_time": "08:30"},
-        {"train_id": "T102", "origin": "Station B", "destination": "Station C", "departure_time": "09:15", "arrival_time": "09:45"},
-        {"train_id": "T103", "origin": "Station A", "destination": "Station C", "departure_time": "10:00", "arrival_time": "11:00"},
-    ]
-    return jsonify(schedule)
+    """
+    Lists trips in departure order.
+    Optional filters: origin, destination, from/to (HH:MM, inclusive) and limit.
+    Pagination: page_size and after=<cursor>; the next page is linked in the
+    Link header. format=ndjson streams application/x-ndjson instead of a
+    JSON array.
+    """
+    store = schedule_store
+    paginated = 'page_size' in request.args or 'after' in request.args
+    try:
+        depart_from = parse_time(request.args['from']) if 'from' in request.args else None
+        depart_to = parse_time(request.args['to']) if 'to' in request.args else None
+        limit = int_arg('limit')
+        if paginated:
+            page_size = int_arg('page_size', DEFAULT_PAGE_SIZE, minimum=1, maximum=MAX_PAGE_SIZE)
+            limit = page_size if limit is None else min(limit, page_size)
+        after = decode_cursor(request.args['after']) if 'after' in request.args else None
+    except ValueError as e:
+        return bad_request(str(e))
+
+    rows = store.query(
+        origin=request.args.get('origin'),
+        destination=request.args.get('destination'),
+        depart_from=depart_from,
+        depart_to=depart_to,
+        # One extra row tells us whether there is a next page.
+        limit=limit + 1 if paginated else limit,
+        after=after,
+    )
+    next_cursor = None
+    if paginated and len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(store, rows[-1]) if limit else None
+
+    if request.args.get('format') == 'ndjson':
+        response = Response(stream_ndjson(store, rows), mimetype='application/x-ndjson')
+    else:
+        response = jsonify(store.trips(rows))
+    if next_cursor:
+        params = request.args.to_dict()
+        params['after'] = next_cursor
+        response.headers['Link'] = f'<{request.path}?{urlencode(params)}>; rel="next"'
+    return response
+
+@app.route('/journey')
+@response_cache.cached(version=schedule_version)
+def get_journey():
+    """
+    Earliest-arrival journey from origin to destination, including transfers.
+    Query: origin, destination, depart_after (HH:MM, default 00:00),
+    max_transfers and min_transfer (minutes).
+    """
+    origin, destination = request.args.get('origin'), request.args.get('destination')
+    if not origin or not destination:
+        return bad_request("Both 'origin' and 'destination' are required.")
+    try:
+        depart_after = parse_time(request.args.get('depart_after', '00:00'))
+        max_transfers = int_arg('max_transfers', DEFAULT_MAX_TRANSFERS, maximum=MAX_TRANSFERS_LIMIT)
+        min_transfer = int_arg('min_transfer', DEFAULT_MIN_TRANSFER_MINUTES)
+    except ValueError as e:
+        return bad_request(str(e))
+
+    store = schedule_store
+    journey = earliest_arrival(store, origin, destination, depart_after, max_transfers, min_transfer)
+    if journey is None:
+        return jsonify({"error": f"No journey found from '{origin}' to '{destination}'."}), 404
+    return jsonify(describe_journey(store, journey))
+
+@app.route('/admin/schedule/deltas', methods=['POST'])
+def post_schedule_deltas():
+    """
+    Accepts one delta or a list of deltas (see schedule_deltas.py) and queues
+    them for the background reloader. Requires `Authorization: Bearer
+    $ADMIN_TOKEN`; disabled when ADMIN_TOKEN is unset, and when
+    SCHEDULE_DELTA_LOG is unset, since without a shared log only the worker
+    serving the request would apply the deltas.
+    """
+    token = os.environ.get('ADMIN_TOKEN')
+    if not token:
+        return jsonify({"error": "Admin API is disabled."}), 404
+    if not schedule_reloader.delta_path:
+        return jsonify({"error": "Schedule deltas need SCHEDULE_DELTA_LOG set to a log shared by all workers."}), 503
+    supplied = request.headers.get('Authorization', '')
+    if not hmac.compare_digest(supplied.encode(), f"Bearer {token}".encode()):
+        return jsonify({"error": "Unauthorized."}), 401
+
+    deltas = request.get_json(silent=True)
+    deltas = deltas if isinstance(deltas, list) else [deltas]
+    try:
+        for delta in deltas:
+            validate_delta(delta)
+    except ValueError as e:
+        return bad_request(str(e))
+
+    # Through the log, so every worker (and pod sharing it) applies them.
+    append_deltas(schedule_reloader.delta_path, deltas)
+    schedule_reloader.wake()
+    return jsonify({"accepted": len(deltas), "version": schedule_store.version}), 202
 
 if __name__ == '__main__':
+    schedule_reloader.start()
     app.run(host='0.0.0.0', port=5000)
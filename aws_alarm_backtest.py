@@ -0,0 +1,158 @@
+import datetime
+import hashlib
+import json
+import os
+
+import numpy as np
+
+from aws_rate_limit import TokenBucket, call_with_backoff
+
+# get_metric_data takes at most 500 queries per call; 50 calls/second is the
+# default account quota.
+QUERIES_PER_CALL = 500
+GET_METRIC_DATA_TPS = 50
+
+COMPARATORS = {
+    'GreaterThanOrEqualToThreshold': np.greater_equal,
+    'GreaterThanThreshold': np.greater,
+    'LessThanThreshold': np.less,
+    'LessThanOrEqualToThreshold': np.less_equal,
+}
+
+def metric_stat(alarm):
+    return {
+        'Metric': {
+            'Namespace': alarm['Namespace'],
+            'MetricName': alarm['MetricName'],
+            'Dimensions': alarm['Dimensions'],
+        },
+        'Period': alarm['Period'],
+        'Stat': alarm['Statistic'],
+    }
+
+def cache_key(stat, start, end):
+    scope = json.dumps([stat, start, end], sort_keys=True)
+    return hashlib.sha1(scope.encode()).hexdigest()[:24]
+
+class MetricCache:
+    """
+    Datapoints of one metric query over one time range, one JSON file each
+    ({"timestamps": [epoch seconds], "values": [...]}). A directory of these
+    is also the fixture format for offline backtests.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+
+    def _path(self, key):
+        return os.path.join(self.directory, f"{key}.json")
+
+    def get(self, key):
+        try:
+            with open(self._path(key)) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+    def put(self, key, series):
+        os.makedirs(self.directory, exist_ok=True)
+        tmp_path = self._path(key) + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(series, f)
+        os.replace(tmp_path, self._path(key))
+
+def fetch_series(cloudwatch_client, alarms, start, end, cache, offline=False):
+    """
+    Returns {alarm name: {"timestamps", "values"}} for `alarms` between the
+    epoch seconds `start` and `end`. Cached series are read from `cache`;
+    the rest are fetched with get_metric_data, QUERIES_PER_CALL at a time,
+    following NextToken, and then cached. With `offline`, missing series
+    raise LookupError instead of calling AWS.
+    """
+    series, missing = {}, []
+    for alarm in alarms:
+        key = cache_key(metric_stat(alarm), start, end)
+        cached = cache.get(key)
+        if cached is not None:
+            series[alarm['AlarmName']] = cached
+        else:
+            missing.append((alarm, key))
+    if missing and offline:
+        raise LookupError(f"No recorded datapoints for {len(missing)} alarm(s), e.g. {missing[0][0]['AlarmName']}.")
+
+    bucket = TokenBucket(GET_METRIC_DATA_TPS)
+    for batch_start in range(0, len(missing), QUERIES_PER_CALL):
+        batch = missing[batch_start:batch_start + QUERIES_PER_CALL]
+        queries = [{'Id': f"m{i}", 'MetricStat': metric_stat(alarm), 'ReturnData': True}
+                   for i, (alarm, _) in enumerate(batch)]
+        collected = {query['Id']: ([], []) for query in queries}
+        request = {
+            'MetricDataQueries': queries,
+            'StartTime': datetime.datetime.fromtimestamp(start, datetime.timezone.utc),
+            'EndTime': datetime.datetime.fromtimestamp(end, datetime.timezone.utc),
+            'ScanBy': 'TimestampAscending',
+        }
+        while True:
+            response = call_with_backoff(cloudwatch_client.get_metric_data, bucket, **request)
+            for result in response['MetricDataResults']:
+                timestamps, values = collected[result['Id']]
+                timestamps.extend(int(ts.timestamp()) for ts in result['Timestamps'])
+                values.extend(result['Values'])
+            if not response.get('NextToken'):
+                break
+            request['NextToken'] = response['NextToken']
+        for query, (alarm, key) in zip(queries, batch):
+            timestamps, values = collected[query['Id']]
+            series[alarm['AlarmName']] = {'timestamps': timestamps, 'values': values}
+            cache.put(key, series[alarm['AlarmName']])
+    return series
+
+def replay_alarm(alarm, series, start, end):
+    """
+    Replays one alarm over its series on a regular grid of its period:
+    a period breaches when its datapoint compares true against the
+    threshold (missing data never breaches, like TreatMissingData=missing),
+    and the alarm is in ALARM while the last EvaluationPeriods periods all
+    breached. Returns datapoints, fires (OK -> ALARM transitions), the
+    fraction of periods in ALARM and the first firing time (epoch seconds).
+    """
+    period, needed = alarm['Period'], alarm['EvaluationPeriods']
+    slots = max(0, (end - start) // period)
+    values = np.full(slots, np.nan)
+    timestamps = np.asarray(series['timestamps'], dtype=np.int64)
+    index = (timestamps - start) // period
+    inside = (index >= 0) & (index < slots)
+    values[index[inside]] = np.asarray(series['values'], dtype=float)[inside]
+
+    with np.errstate(invalid='ignore'):
+        breaching = COMPARATORS[alarm['ComparisonOperator']](values, alarm['Threshold'])
+    # Windowed sum of breaches via a cumulative sum: in_alarm[i] covers slots i-needed+1..i.
+    counts = np.concatenate(([0], np.cumsum(breaching, dtype=np.int64)))
+    in_alarm = np.zeros(slots, dtype=bool)
+    if slots >= needed:
+        in_alarm[needed - 1:] = (counts[needed:] - counts[:-needed]) == needed
+    rising = np.flatnonzero(in_alarm & ~np.concatenate(([False], in_alarm[:-1])))
+    return {
+        'alarm': alarm['AlarmName'],
+        'datapoints': int(inside.sum()),
+        'fires': int(rising.size),
+        'alarm_fraction': round(float(in_alarm.mean()) if slots else 0.0, 4),
+        'first_fire': int(start + (rising[0] + 1) * period) if rising.size else None,
+    }
+
+def backtest(cloudwatch_client, alarms, days, cache_dir, offline=False, now=None):
+    """
+    Replays `alarms` over the last `days` days. The range ends on the last
+    full hour, so repeated runs within the hour reuse the cache.
+    """
+    end = int((now or datetime.datetime.now(datetime.timezone.utc).timestamp()) // 3600 * 3600)
+    start = end - int(days * 86400)
+    series = fetch_series(cloudwatch_client, alarms, start, end, MetricCache(cache_dir), offline)
+    return [replay_alarm(alarm, series[alarm['AlarmName']], start, end) for alarm in alarms]
+
+def print_backtest(results, days):
+    print(f"{'Alarm':<60} {'Fires':>6} {'In ALARM':>9} {'Datapoints':>11}")
+    for result in sorted(results, key=lambda r: (-r['fires'], r['alarm'])):
+        print(f"{result['alarm']:<60} {result['fires']:>6} {result['alarm_fraction']:>9.1%} {result['datapoints']:>11}")
+    noisy = sum(1 for result in results if result['fires'] / max(days, 1) >= 1)
+    print(f"{len(results)} alarm(s) replayed over {days} day(s); {noisy} would have fired at least once a day.")
@@ -0,0 +1,129 @@
+import json
+import os
+
+try:
+    import yaml
+except ImportError: # PyYAML is optional; JSON templates work without it
+    yaml = None
+
+DEFAULT_TEMPLATE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'alarm_templates')
+RESOURCE_TYPES = ('ec2', 'alb', 'rds')
+
+# One template file per resource type (<type>.json, or .yml/.yaml with PyYAML):
+#   resource_type: ec2 | alb | rds
+#   dimension:     CloudWatch dimension name carrying the resource
+#   alarms:        [{key, name, metric, namespace, statistic, period,
+#                    evaluation_periods, threshold, comparison, description}]
+#   overrides:     [{tags: {Name: Value or "*"}, alarms: {key: {field: value,
+#                    or "enabled": false}}}], applied in order to resources
+#                    carrying all the tags
+# name and description may use {id} (instance id / ARN / DB identifier),
+# {label} (the short name used in alarm names) and {dimension} (its value).
+ALARM_FIELDS = ('key', 'name', 'metric', 'namespace', 'statistic', 'period', 'evaluation_periods',
+                'threshold', 'comparison', 'description')
+
+def alarm_definition(alarm_name, metric_name, namespace, statistic, period, evaluation_periods,
+                     threshold, comparison_operator, alarm_description, dimensions):
+    """Returns the put_metric_alarm parameters of one alarm, minus its actions."""
+    return {
+        'AlarmName': alarm_name,
+        'AlarmDescription': alarm_description,
+        'ActionsEnabled': True,
+        'MetricName': metric_name,
+        'Namespace': namespace,
+        'Statistic': statistic,
+        'Period': period,
+        'EvaluationPeriods': evaluation_periods,
+        'Threshold': threshold,
+        'ComparisonOperator': comparison_operator,
+        'Dimensions': dimensions,
+    }
+
+def _read(path):
+    with open(path) as f:
+        if os.path.splitext(path)[1] in ('.yml', '.yaml'):
+            if yaml is None:
+                raise ValueError(f"'{path}' is YAML but PyYAML is not installed; use JSON or pip install pyyaml.")
+            return yaml.safe_load(f)
+        return json.load(f)
+
+def validate_template(template, path):
+    if not isinstance(template, dict) or template.get('resource_type') not in RESOURCE_TYPES:
+        raise ValueError(f"Template '{path}': 'resource_type' must be one of {', '.join(RESOURCE_TYPES)}.")
+    if not isinstance(template.get('dimension'), str) or not isinstance(template.get('alarms'), list):
+        raise ValueError(f"Template '{path}' needs a 'dimension' name and an 'alarms' list.")
+    keys = set()
+    for alarm in template['alarms']:
+        missing = [f for f in ALARM_FIELDS if f not in alarm]
+        if missing:
+            raise ValueError(f"Template '{path}': alarm {alarm.get('key')!r} is missing {', '.join(missing)}.")
+        keys.add(alarm['key'])
+    for override in template.get('overrides') or []:
+        unknown = set(override.get('alarms', {})) - keys
+        if not isinstance(override.get('tags'), dict) or unknown:
+            raise ValueError(f"Template '{path}': each override needs 'tags' and may only name known "
+                             f"alarm keys (unknown: {', '.join(sorted(unknown)) or 'none'}).")
+
+def load_templates(directory=DEFAULT_TEMPLATE_DIR):
+    """Returns {resource_type: template} for the template files in `directory`."""
+    templates = {}
+    for name in sorted(os.listdir(directory)):
+        if os.path.splitext(name)[1] not in ('.json', '.yml', '.yaml'):
+            continue
+        path = os.path.join(directory, name)
+        template = _read(path)
+        validate_template(template, path)
+        templates[template['resource_type']] = template
+    return templates
+
+_default_templates = None
+
+def default_templates():
+    global _default_templates
+    if _default_templates is None:
+        _default_templates = load_templates()
+    return _default_templates
+
+def resource(resource_type, resource_id, tags=None, region=None):
+    """The resource dict templates are rendered for."""
+    if resource_type == 'alb':
+        label, dimension = resource_id.split('/')[-1], resource_id.split(':loadbalancer/')[-1]
+    else:
+        label, dimension = resource_id, resource_id
+    return {'type': resource_type, 'id': resource_id, 'label': label, 'dimension': dimension,
+            'tags': tags or {}, 'region': region}
+
+def _tags_match(wanted, tags):
+    return all(name in tags and (value == '*' or tags[name] == value) for name, value in wanted.items())
+
+def render_alarms(template, res):
+    """Returns the alarm definitions (put_metric_alarm parameters minus actions) for one resource."""
+    settings = {alarm['key']: dict(alarm, enabled=True) for alarm in template['alarms']}
+    for override in template.get('overrides') or []:
+        if _tags_match(override['tags'], res['tags']):
+            for key, changes in override.get('alarms', {}).items():
+                settings[key].update(changes)
+    fields = {'id': res['id'], 'label': res['label'], 'dimension': res['dimension']}
+    alarms = []
+    for alarm in template['alarms']:
+        spec = settings[alarm['key']]
+        if not spec['enabled']:
+            continue
+        alarms.append(alarm_definition(
+            alarm_name=spec['name'].format(**fields),
+            metric_name=spec['metric'],
+            namespace=spec['namespace'],
+            statistic=spec['statistic'],
+            period=spec['period'],
+            evaluation_periods=spec['evaluation_periods'],
+            threshold=float(spec['threshold']),
+            comparison_operator=spec['comparison'],
+            alarm_description=spec['description'].format(**fields),
+            dimensions=[{'Name': template['dimension'], 'Value': res['dimension']}],
+        ))
+    return alarms
+
+def managed_prefixes(templates):
+    """Alarm name prefixes owned by `templates` (the name up to its first placeholder)."""
+    return tuple(sorted({alarm['name'].split('{')[0] for template in templates.values()
+                         for alarm in template['alarms']}))
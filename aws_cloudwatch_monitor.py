@@ -1,57 +1,262 @@
 import boto3
 import argparse
 import json
+import os
 import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
 
-def create_sns_topic(sns_client, topic_name, email_address):
+from botocore.exceptions import BotoCoreError, ClientError
+
+from aws_alarm_templates import (RESOURCE_TYPES, DEFAULT_TEMPLATE_DIR, default_templates,
+                                 load_templates, managed_prefixes, render_alarms, resource)
+from aws_discovery import DEFAULT_CACHE_TTL, discover
+from aws_rate_limit import TokenBucket, call_with_backoff, client_config
+
+# CloudWatch's default PutMetricAlarm quota is 3 transactions per second
+# per account and region; raise --put-rate if the quota was increased.
+PUT_ALARM_TPS = 3
+DEFAULT_WORKERS = 4
+DEFAULT_DISCOVERY_CACHE = os.path.expanduser('~/.cache/aws_cloudwatch_monitor/discovery.json')
+DEFAULT_METRIC_CACHE = os.path.expanduser('~/.cache/aws_cloudwatch_monitor/metrics')
+
+DESCRIBE_ALARMS_TPS = 9
+DELETE_ALARMS_TPS = 3
+DELETE_BATCH_SIZE = 100 # delete_alarms accepts at most 100 names per call
+# Fields compared when deciding whether an existing alarm needs a put.
+COMPARED_FIELDS = (
+    'AlarmDescription', 'ActionsEnabled', 'MetricName', 'Namespace', 'Statistic', 'Period',
+    'EvaluationPeriods', 'Threshold', 'ComparisonOperator', 'Dimensions', 'AlarmActions', 'OKActions',
+)
+
+def find_sns_topic(sns_client, topic_name):
+    """Returns the ARN of the existing topic called `topic_name`, or None."""
+    for page in sns_client.get_paginator('list_topics').paginate():
+        for topic in page['Topics']:
+            if topic['TopicArn'].split(':')[-1] == topic_name:
+                return topic['TopicArn']
+    return None
+
+def has_email_subscription(sns_client, topic_arn, email_address):
+    """True if `email_address` is subscribed to the topic (confirmed or pending)."""
+    for page in sns_client.get_paginator('list_subscriptions_by_topic').paginate(TopicArn=topic_arn):
+        for subscription in page['Subscriptions']:
+            if subscription['Protocol'] == 'email' and subscription['Endpoint'].lower() == email_address.lower():
+                return True
+    return False
+
+def create_sns_topic(sns_client, topic_name, email_address, dry_run=False):
     """
-    Creates an SNS topic and subscribes an email address to it.
-    Returns the Topic ARN.
+    Creates an SNS topic and subscribes an email address to it, unless the
+    topic or the subscription already exist (so no repeat confirmation
+    emails). Returns the Topic ARN (None in a dry run if it does not exist).
     """
     try:
-        print(f"Creating SNS topic: {topic_name}...")
-        response = sns_client.create_topic(Name=topic_name)
-        topic_arn = response['TopicArn']
-        print(f"SNS Topic '{topic_name}' created with ARN: {topic_arn}")
-
-        print(f"Subscribing {email_address} to topic {topic_name}...")
-        sns_client.subscribe(
-            TopicArn=topic_arn,
-            Protocol='email',
-            Endpoint=email_address
-        )
-        print(f"Subscription request sent to {email_address}. Please confirm it in your email inbox.")
+        topic_arn = find_sns_topic(sns_client, topic_name)
+        if topic_arn:
+            print(f"Using existing SNS Topic '{topic_name}': {topic_arn}")
+        elif dry_run:
+            print(f"Would create SNS topic '{topic_name}' and subscribe {email_address}.")
+            return None
+        else:
+            print(f"Creating SNS topic: {topic_name}...")
+            response = sns_client.create_topic(Name=topic_name)
+            topic_arn = response['TopicArn']
+            print(f"SNS Topic '{topic_name}' created with ARN: {topic_arn}")
+
+        if has_email_subscription(sns_client, topic_arn, email_address):
+            print(f"{email_address} is already subscribed to topic {topic_name}.")
+        elif dry_run:
+            print(f"Would subscribe {email_address} to topic {topic_name}.")
+        else:
+            print(f"Subscribing {email_address} to topic {topic_name}...")
+            sns_client.subscribe(
+                TopicArn=topic_arn,
+                Protocol='email',
+                Endpoint=email_address
+            )
+            print(f"Subscription request sent to {email_address}. Please confirm it in your email inbox.")
         return topic_arn
     except Exception as e:
         print(f"Error creating SNS topic or subscription: {e}")
         sys.exit(1)
 
-def create_cloudwatch_alarm(cloudwatch_client, alarm_name, metric_name, namespace, statistic,
-                            period, evaluation_periods, threshold, comparison_operator,
-                            alarm_description, dimensions, topic_arn):
+def alarm_request(alarm, topic_arn):
+    request = dict(alarm)
+    request['AlarmActions'] = [topic_arn]
+    request['OKActions'] = [topic_arn] # Optional: Send notification when alarm returns to OK state
+    return request
+
+def provision_alarms(cloudwatch_client, alarms, topic_arn, workers=DEFAULT_WORKERS, rate=PUT_ALARM_TPS,
+                     sleep=time.sleep):
     """
-    Creates or updates a CloudWatch alarm.
+    Puts `alarms` through a pool of `workers` threads sharing one adaptive
+    token bucket, so the account never exceeds `rate` calls/second and
+    slows down further on throttling. Returns one result dict per alarm,
+    in input order: alarm, ok, attempts, seconds and error (if any).
     """
-    try:
-        print(f"Creating/Updating CloudWatch Alarm: {alarm_name}...")
-        cloudwatch_client.put_metric_alarm(
-            AlarmName=alarm_name,
-            AlarmDescription=alarm_description,
-            ActionsEnabled=True,
-            MetricName=metric_name,
-            Namespace=namespace,
-            Statistic=statistic,
-            Period=period,
-            EvaluationPeriods=evaluation_periods,
-            Threshold=threshold,
-            ComparisonOperator=comparison_operator,
-            Dimensions=dimensions,
-            AlarmActions=[topic_arn],
-            OKActions=[topic_arn] # Optional: Send notification when alarm returns to OK state
-        )
-        print(f"CloudWatch Alarm '{alarm_name}' created/updated successfully.")
-    except Exception as e:
-        print(f"Error creating CloudWatch Alarm '{alarm_name}': {e}")
+    bucket = TokenBucket(rate, sleep=sleep)
+
+    def put(alarm):
+        attempts = [1]
+
+        def on_retry(attempt, error, delay):
+            attempts[0] = attempt + 1
+
+        started = time.monotonic()
+        result = {'alarm': alarm['AlarmName'], 'ok': True, 'error': None}
+        try:
+            call_with_backoff(cloudwatch_client.put_metric_alarm, bucket, on_retry=on_retry, sleep=sleep,
+                              **alarm_request(alarm, topic_arn))
+        except (ClientError, BotoCoreError) as e:
+            result.update(ok=False, error=str(e))
+        result.update(attempts=attempts[0], seconds=round(time.monotonic() - started, 3))
+        return result
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(put, alarms))
+
+def print_summary(results):
+    for result in results:
+        action = "deleted" if result.get('deleted') else "created/updated"
+        if result['ok']:
+            retries = f" after {result['attempts']} attempts" if result.get('attempts', 1) > 1 else ""
+            print(f"  OK      {result['alarm']} {action}{retries}")
+        else:
+            print(f"  FAILED  {result['alarm']} not {action}: {result['error']}")
+    failed = sum(1 for result in results if not result['ok'])
+    print(f"{len(results) - failed} alarm(s) changed, {failed} failed.")
+
+def fetch_alarms(cloudwatch_client, prefixes, sleep=time.sleep):
+    """Returns {name: alarm} for every metric alarm under `prefixes`, one rate-limited describe_alarms page at a time."""
+    bucket = TokenBucket(DESCRIBE_ALARMS_TPS, sleep=sleep)
+    alarms = {}
+    for prefix in prefixes:
+        request = {'AlarmNamePrefix': prefix, 'AlarmTypes': ['MetricAlarm'], 'MaxRecords': 100}
+        while True:
+            page = call_with_backoff(cloudwatch_client.describe_alarms, bucket, sleep=sleep, **request)
+            for alarm in page['MetricAlarms']:
+                alarms[alarm['AlarmName']] = alarm
+            if not page.get('NextToken'):
+                break
+            request['NextToken'] = page['NextToken']
+    return alarms
+
+def _normalized(alarm, field):
+    value = alarm.get(field)
+    if field == 'Dimensions':
+        return sorted((d['Name'], d['Value']) for d in value or [])
+    if field in ('AlarmActions', 'OKActions'):
+        return sorted(value or [])
+    if field == 'Threshold' and value is not None:
+        return float(value)
+    return value
+
+def _in_scope(alarm, scope):
+    return scope is None or any((d['Name'], d['Value']) in scope or (d['Name'], None) in scope
+                                for d in alarm.get('Dimensions') or [])
+
+def diff_alarms(desired, existing, topic_arn, prefixes, scope=None):
+    """
+    Compares desired alarms (definitions) with existing ones ({name: alarm}).
+    Returns a plan dict: create and update (put_metric_alarm requests, each
+    update with the 'changed' fields listed separately), unchanged (names)
+    and delete (names of managed alarms no longer desired that notify our
+    topic, so alarms created by hand are never removed). With `scope`, a
+    set of (dimension name, value) pairs, only alarms on those resources
+    are deleted; a value of None covers every resource with that dimension.
+    """
+    plan = {'create': [], 'update': [], 'changed': {}, 'unchanged': [], 'delete': []}
+    wanted = set()
+    for alarm in desired:
+        request = alarm_request(alarm, topic_arn)
+        name = request['AlarmName']
+        wanted.add(name)
+        current = existing.get(name)
+        if current is None:
+            plan['create'].append(request)
+            continue
+        changed = [f for f in COMPARED_FIELDS if _normalized(request, f) != _normalized(current, f)]
+        if changed:
+            plan['update'].append(request)
+            plan['changed'][name] = changed
+        else:
+            plan['unchanged'].append(name)
+    for name, alarm in sorted(existing.items()):
+        if (name not in wanted and name.startswith(tuple(prefixes)) and topic_arn in alarm.get('AlarmActions', [])
+                and _in_scope(alarm, scope)):
+            plan['delete'].append(name)
+    return plan
+
+def print_plan(plan):
+    for request in plan['create']:
+        print(f"  + create  {request['AlarmName']}")
+    for request in plan['update']:
+        print(f"  ~ update  {request['AlarmName']} ({', '.join(plan['changed'][request['AlarmName']])})")
+    for name in plan['delete']:
+        print(f"  - delete  {name}")
+    print(f"Plan: {len(plan['create'])} to create, {len(plan['update'])} to update, "
+          f"{len(plan['delete'])} to delete, {len(plan['unchanged'])} unchanged.")
+
+def delete_alarms(cloudwatch_client, names, rate=DELETE_ALARMS_TPS, sleep=time.sleep):
+    """Deletes alarms in batches of DELETE_BATCH_SIZE; returns per-alarm results like provision_alarms()."""
+    bucket = TokenBucket(rate, sleep=sleep)
+    results = []
+    for start in range(0, len(names), DELETE_BATCH_SIZE):
+        batch = names[start:start + DELETE_BATCH_SIZE]
+        error = None
+        try:
+            call_with_backoff(cloudwatch_client.delete_alarms, bucket, sleep=sleep, AlarmNames=batch)
+        except (ClientError, BotoCoreError) as e:
+            error = str(e)
+        results.extend({'alarm': name, 'ok': error is None, 'error': error, 'deleted': True} for name in batch)
+    return results
+
+def reconcile_alarms(cloudwatch_client, desired, topic_arn, workers=DEFAULT_WORKERS, rate=PUT_ALARM_TPS,
+                     dry_run=False, prefixes=None, scope=None):
+    """
+    Puts only the alarms that are missing or differ and deletes orphans
+    among the alarms under `prefixes` (default: the alarm name prefixes of
+    the default templates) on the resources in `scope` (see diff_alarms()).
+    Returns (plan, results); results is empty in a dry run.
+    """
+    prefixes = prefixes or managed_prefixes(default_templates())
+    existing = fetch_alarms(cloudwatch_client, prefixes)
+    plan = diff_alarms(desired, existing, topic_arn, prefixes, scope)
+    print_plan(plan)
+    if dry_run:
+        return plan, []
+    # provision_alarms() adds the actions itself, so hand it the bare definitions.
+    to_put = [{k: v for k, v in request.items() if k not in ('AlarmActions', 'OKActions')}
+              for request in plan['create'] + plan['update']]
+    results = provision_alarms(cloudwatch_client, to_put, topic_arn, workers, rate)
+    results.extend(delete_alarms(cloudwatch_client, plan['delete']))
+    return plan, results
+
+def backtest_alarms(args, alarms_by_region):
+    # NumPy is only needed for backtests, so import it (via the engine) here.
+    from aws_alarm_backtest import backtest, print_backtest
+
+    results = []
+    for region, alarms in sorted(alarms_by_region.items()):
+        if not alarms:
+            continue
+        print(f"\n--- Backtesting {len(alarms)} alarm(s) in {region} over {args.backtest:g} day(s) ---")
+        cloudwatch_client = None
+        if not args.offline:
+            cloudwatch_client = boto3.client('cloudwatch', region_name=region, config=client_config())
+        try:
+            region_results = backtest(cloudwatch_client, alarms, args.backtest,
+                                      os.path.join(args.metric_cache, region), args.offline)
+        except (LookupError, ClientError, BotoCoreError) as e:
+            print(f"Error fetching metric history: {e}")
+            sys.exit(1)
+        print_backtest(region_results, args.backtest)
+        results.extend(dict(result, region=region) for result in region_results)
+    if args.summary_json:
+        with open(args.summary_json, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"Backtest results written to {args.summary_json}")
 
 def main():
     parser = argparse.ArgumentParser(
@@ -64,156 +269,133 @@ def main():
     parser.add_argument("--ec2-instance-ids", nargs='*', help="Space-separated list of EC2 Instance IDs to monitor (e.g., i-xxxxxxxxxxxxxxxxx)")
     parser.add_argument("--alb-arns", nargs='*', help="Space-separated list of Application Load Balancer ARNs to monitor (e.g., arn:aws:elasticloadbalancing:REGION:ACCOUNT:loadbalancer/app/NAME/ID)")
     parser.add_argument("--rds-instance-ids", nargs='*', help="Space-separated list of RDS DB Instance Identifiers to monitor (e.g., my-database-instance)")
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS,
+                        help=f"Concurrent put_metric_alarm calls (default: {DEFAULT_WORKERS})")
+    parser.add_argument("--put-rate", type=float, default=PUT_ALARM_TPS,
+                        help=f"Maximum put_metric_alarm calls per second (default: {PUT_ALARM_TPS}, the CloudWatch quota)")
+    parser.add_argument("--summary-json", help="Also write the per-alarm results to this JSON file")
+    parser.add_argument("--reconcile", action="store_true",
+                        help="Only put alarms that are missing or changed, and delete managed alarms no "
+                             "longer wanted on the listed resources (with --discover and no --tag, on every "
+                             "resource of the discovered types)")
+    parser.add_argument("--plan", action="store_true",
+                        help="Dry run of --reconcile: print the differences without changing anything")
+
+    parser.add_argument("--discover", action="store_true",
+                        help="Also find EC2 instances, ALBs and RDS instances automatically (see --tag)")
+    parser.add_argument("--tag", action="append", default=[], metavar="KEY=VALUE",
+                        help="Only discover resources with this tag; repeat to require several")
+    parser.add_argument("--resource-types", nargs='+', choices=RESOURCE_TYPES, default=list(RESOURCE_TYPES),
+                        help="Resource types to discover (default: ec2 alb rds)")
+    parser.add_argument("--discover-regions", nargs='+', metavar="REGION",
+                        help="Regions to discover in (default: --region); alarms go to each resource's region")
+    parser.add_argument("--templates", default=DEFAULT_TEMPLATE_DIR,
+                        help="Directory of per-resource-type alarm templates (default: alarm_templates/)")
+    parser.add_argument("--discovery-cache", default=DEFAULT_DISCOVERY_CACHE,
+                        help=f"File caching discovery results (default: {DEFAULT_DISCOVERY_CACHE})")
+    parser.add_argument("--discovery-ttl", type=int, default=DEFAULT_CACHE_TTL,
+                        help=f"Seconds a cached discovery stays valid (default: {DEFAULT_CACHE_TTL}; 0 to rescan)")
+    parser.add_argument("--backtest", type=float, metavar="DAYS",
+                        help="Instead of creating alarms, replay them over the last DAYS days of metrics "
+                             "and report how often each would have fired")
+    parser.add_argument("--metric-cache", default=DEFAULT_METRIC_CACHE,
+                        help=f"Directory caching fetched datapoints for --backtest (default: {DEFAULT_METRIC_CACHE})")
+    parser.add_argument("--offline", action="store_true",
+                        help="With --backtest, only use datapoints already in --metric-cache (e.g. recorded fixtures)")
 
     args = parser.parse_args()
 
-    # Initialize AWS clients
     try:
-        sns_client = boto3.client('sns', region_name=args.region)
-        cloudwatch_client = boto3.client('cloudwatch', region_name=args.region)
-    except Exception as e:
-        print(f"Error initializing AWS clients: {e}. Ensure your AWS credentials are configured.")
+        templates = load_templates(args.templates)
+    except (OSError, ValueError) as e:
+        print(f"Error loading alarm templates: {e}")
         sys.exit(1)
+    tag_filters = {}
+    for tag in args.tag:
+        name, sep, value = tag.partition('=')
+        if not sep:
+            parser.error(f"--tag expects KEY=VALUE, got '{tag}'")
+        tag_filters[name] = value
 
-    # 1. Create SNS Topic
-    topic_arn = create_sns_topic(sns_client, args.sns_topic_name, args.email)
-
-    # 2. Create EC2 Alarms
-    if args.ec2_instance_ids:
-        print("\n--- Setting up EC2 Alarms ---")
-        for instance_id in args.ec2_instance_ids:
-            # EC2 CPU Utilization Alarm
-            create_cloudwatch_alarm(
-                cloudwatch_client,
-                alarm_name=f"EC2-CPU-High-{instance_id}",
-                metric_name="CPUUtilization",
-                namespace="AWS/EC2",
-                statistic="Average",
-                period=300, # 5 minutes
-                evaluation_periods=2,
-                threshold=80.0,
-                comparison_operator="GreaterThanOrEqualToThreshold",
-                alarm_description=f"EC2 instance {instance_id} CPU utilization is consistently high (>=80% for 10 minutes).",
-                dimensions=[{'Name': 'InstanceId', 'Value': instance_id}],
-                topic_arn=topic_arn
-            )
-            # EC2 Status Check Failed (Instance) Alarm
-            create_cloudwatch_alarm(
-                cloudwatch_client,
-                alarm_name=f"EC2-StatusCheckFailed-Instance-{instance_id}",
-                metric_name="StatusCheckFailed_Instance",
-                namespace="AWS/EC2",
-                statistic="Maximum",
-                period=60, # 1 minute
-                evaluation_periods=5,
-                threshold=1.0,
-                comparison_operator="GreaterThanOrEqualToThreshold",
-                alarm_description=f"EC2 instance {instance_id} failed instance status checks (e.g., OS issues, exhausted resources).",
-                dimensions=[{'Name': 'InstanceId', 'Value': instance_id}],
-                topic_arn=topic_arn
-            )
-            # EC2 Status Check Failed (System) Alarm
-            create_cloudwatch_alarm(
-                cloudwatch_client,
-                alarm_name=f"EC2-StatusCheckFailed-System-{instance_id}",
-                metric_name="StatusCheckFailed_System",
-                namespace="AWS/EC2",
-                statistic="Maximum",
-                period=60, # 1 minute
-                evaluation_periods=5,
-                threshold=1.0,
-                comparison_operator="GreaterThanOrEqualToThreshold",
-                alarm_description=f"EC2 instance {instance_id} failed system status checks (e.g., underlying hardware issues).",
-                dimensions=[{'Name': 'InstanceId', 'Value': instance_id}],
-                topic_arn=topic_arn
-            )
+    # 1. Collect the EC2, ALB and RDS resources, listed and discovered
+    resources = [resource('ec2', i, region=args.region) for i in args.ec2_instance_ids or []]
+    resources += [resource('alb', arn, region=args.region) for arn in args.alb_arns or []]
+    resources += [resource('rds', i, region=args.region) for i in args.rds_instance_ids or []]
+    if args.discover:
+        regions = args.discover_regions or [args.region]
+        print(f"Discovering {', '.join(args.resource_types)} in {', '.join(regions)}...")
+        try:
+            discovered = discover(regions, args.resource_types, tag_filters, args.discovery_cache, args.discovery_ttl)
+        except (ClientError, BotoCoreError) as e:
+            print(f"Error discovering resources: {e}")
+            sys.exit(1)
+        listed = {(r['type'], r['id']) for r in resources}
+        resources += [r for r in discovered if (r['type'], r['id']) not in listed]
+        print(f"Found {len(discovered)} resource(s).")
 
-    # 3. Create ALB Alarms
-    if args.alb_arns:
-        print("\n--- Setting up ALB Alarms ---")
-        for alb_arn in args.alb_arns:
-            # ALB HTTP 5xx Errors Alarm
-            # Note: For more granular monitoring, you might need TargetGroup dimensions.
-            # This example monitors 5xx from the LoadBalancer level.
-            create_cloudwatch_alarm(
-                cloudwatch_client,
-                alarm_name=f"ALB-HTTP-5XX-High-{alb_arn.split('/')[-1]}", # Use part of ARN for name
-                metric_name="HTTPCode_Target_5XX_Count",
-                namespace="AWS/ApplicationELB",
-                statistic="Sum",
-                period=300, # 5 minutes
-                evaluation_periods=1,
-                threshold=1.0, # At least one 5xx error in 5 minutes
-                comparison_operator="GreaterThanOrEqualToThreshold",
-                alarm_description=f"ALB {alb_arn} is reporting HTTP 5xx errors from targets.",
-                dimensions=[{'Name': 'LoadBalancer', 'Value': alb_arn.split(':loadbalancer/')[-1]}], # Extract LB part of ARN
-                topic_arn=topic_arn
-            )
-            # ALB Healthy Host Count Low
-            create_cloudwatch_alarm(
-                cloudwatch_client,
-                alarm_name=f"ALB-HealthyHost-Low-{alb_arn.split('/')[-1]}",
-                metric_name="HealthyHostCount",
-                namespace="AWS/ApplicationELB",
-                statistic="Minimum",
-                period=300,
-                evaluation_periods=1,
-                threshold=1.0, # If healthy hosts drop to 0
-                comparison_operator="LessThanThreshold",
-                alarm_description=f"ALB {alb_arn} has a low number of healthy hosts.",
-                dimensions=[{'Name': 'LoadBalancer', 'Value': alb_arn.split(':loadbalancer/')[-1]}],
-                topic_arn=topic_arn
-            )
+    # 2. Render their alarms from the templates, grouped by region
+    alarms_by_region = {}
+    for res in resources:
+        if res['type'] in templates:
+            alarms_by_region.setdefault(res['region'], []).extend(render_alarms(templates[res['type']], res))
+    alarms_by_region.setdefault(args.region, [])
+    prefixes = managed_prefixes(templates)
 
-    # 4. Create RDS Alarms
-    if args.rds_instance_ids:
-        print("\n--- Setting up RDS Alarms ---")
-        for db_instance_id in args.rds_instance_ids:
-            # RDS CPU Utilization Alarm
-            create_cloudwatch_alarm(
-                cloudwatch_client,
-                alarm_name=f"RDS-CPU-High-{db_instance_id}",
-                metric_name="CPUUtilization",
-                namespace="AWS/RDS",
-                statistic="Average",
-                period=300,
-                evaluation_periods=2,
-                threshold=70.0,
-                comparison_operator="GreaterThanOrEqualToThreshold",
-                alarm_description=f"RDS instance {db_instance_id} CPU utilization is consistently high (>=70% for 10 minutes).",
-                dimensions=[{'Name': 'DBInstanceIdentifier', 'Value': db_instance_id}],
-                topic_arn=topic_arn
-            )
-            # RDS Freeable Memory Low Alarm
-            create_cloudwatch_alarm(
-                cloudwatch_client,
-                alarm_name=f"RDS-FreeableMemory-Low-{db_instance_id}",
-                metric_name="FreeableMemory",
-                namespace="AWS/RDS",
-                statistic="Average",
-                period=300,
-                evaluation_periods=2,
-                threshold=100000000.0, # e.g., 100 MB (in bytes)
-                comparison_operator="LessThanThreshold",
-                alarm_description=f"RDS instance {db_instance_id} has low freeable memory (<100MB for 10 minutes).",
-                dimensions=[{'Name': 'DBInstanceIdentifier', 'Value': db_instance_id}],
-                topic_arn=topic_arn
-            )
-            # RDS Database Connections High Alarm
-            create_cloudwatch_alarm(
-                cloudwatch_client,
-                alarm_name=f"RDS-DBConnections-High-{db_instance_id}",
-                metric_name="DatabaseConnections",
-                namespace="AWS/RDS",
-                statistic="Average",
-                period=300,
-                evaluation_periods=2,
-                threshold=80.0, # e.g., 80 connections
-                comparison_operator="GreaterThanOrEqualToThreshold",
-                alarm_description=f"RDS instance {db_instance_id} has a high number of database connections (>=80 for 10 minutes).",
-                dimensions=[{'Name': 'DBInstanceIdentifier', 'Value': db_instance_id}],
-                topic_arn=topic_arn
-            )
+    if args.backtest:
+        backtest_alarms(args, alarms_by_region)
+        return
+
+    all_results = []
+    for region, alarms in sorted(alarms_by_region.items()):
+        if len(alarms_by_region) > 1:
+            print(f"\n=== {region} ===")
+        # Initialize AWS clients
+        try:
+            sns_client = boto3.client('sns', region_name=region)
+            cloudwatch_client = boto3.client('cloudwatch', region_name=region,
+                                             config=client_config(max_pool_connections=args.workers))
+        except Exception as e:
+            print(f"Error initializing AWS clients: {e}. Ensure your AWS credentials are configured.")
+            sys.exit(1)
+
+        # 3. Create SNS Topic (or reuse it)
+        topic_arn = create_sns_topic(sns_client, args.sns_topic_name, args.email, dry_run=args.plan)
+
+        # 4. Create/update the alarms concurrently, within the PutMetricAlarm quota
+        if args.reconcile or args.plan:
+            print(f"\n--- Reconciling {len(alarms)} CloudWatch Alarms ---")
+            # Orphans are only deleted where the desired set is complete: on the
+            # resources collected above, and on every resource of a type
+            # discovered here without a tag filter (a filter or a list of ids
+            # says nothing about the alarms of the other resources).
+            scope = {(templates[res['type']]['dimension'], res['dimension']) for res in resources
+                     if res['region'] == region and res['type'] in templates}
+            if args.discover and not tag_filters and region in (args.discover_regions or [args.region]):
+                scope |= {(templates[t]['dimension'], None) for t in args.resource_types if t in templates}
+            # Without a topic yet (dry run), every alarm shows its actions changing.
+            try:
+                _, results = reconcile_alarms(cloudwatch_client, alarms,
+                                              topic_arn or f"(new topic {args.sns_topic_name})", args.workers,
+                                              args.put_rate, dry_run=args.plan, prefixes=prefixes, scope=scope)
+            except (ClientError, BotoCoreError) as e:
+                print(f"Error reconciling alarms in {region}: {e}")
+                results = [{'alarm': f"(alarms in {region})", 'ok': False, 'error': str(e)}]
+        else:
+            print(f"\n--- Setting up {len(alarms)} CloudWatch Alarms ({args.workers} workers, {args.put_rate}/s) ---")
+            results = provision_alarms(cloudwatch_client, alarms, topic_arn, args.workers, args.put_rate)
+        all_results.extend(dict(result, region=region) for result in results)
+    if args.plan:
+        if any(not result['ok'] for result in all_results):
+            sys.exit(1)
+        return
+
+    print_summary(all_results)
+    if args.summary_json:
+        with open(args.summary_json, 'w') as f:
+            json.dump(all_results, f, indent=2)
+        print(f"Per-alarm results written to {args.summary_json}")
+    if any(not result['ok'] for result in all_results):
+        sys.exit(1)
 
     print("\nMonitoring setup complete. Check your email for SNS subscription confirmation.")
 
@@ -0,0 +1,99 @@
+import hashlib
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import boto3
+
+from aws_alarm_templates import RESOURCE_TYPES, resource
+
+DEFAULT_CACHE_TTL = 900 # seconds
+# elbv2 describe_tags accepts at most 20 ARNs per call.
+ELB_TAG_BATCH = 20
+# Instances in these states still have (or will have) metrics worth alarming on.
+EC2_STATES = ['pending', 'running', 'stopping', 'stopped']
+
+def _tag_dict(tags):
+    return {tag['Key']: tag['Value'] for tag in tags or []}
+
+def _tags_match(tag_filters, tags):
+    return all(tags.get(name) == value for name, value in tag_filters.items())
+
+def discover_ec2(ec2_client, tag_filters, region=None):
+    filters = [{'Name': 'instance-state-name', 'Values': EC2_STATES}]
+    filters += [{'Name': f'tag:{name}', 'Values': [value]} for name, value in tag_filters.items()]
+    resources = []
+    for page in ec2_client.get_paginator('describe_instances').paginate(Filters=filters):
+        for reservation in page['Reservations']:
+            for instance in reservation['Instances']:
+                resources.append(resource('ec2', instance['InstanceId'], _tag_dict(instance.get('Tags')), region))
+    return resources
+
+def discover_alb(elbv2_client, tag_filters, region=None):
+    arns = []
+    for page in elbv2_client.get_paginator('describe_load_balancers').paginate():
+        arns.extend(lb['LoadBalancerArn'] for lb in page['LoadBalancers'] if lb.get('Type') == 'application')
+    resources = []
+    # Load balancers carry no tags in describe_load_balancers; fetch them in batches.
+    for start in range(0, len(arns), ELB_TAG_BATCH):
+        response = elbv2_client.describe_tags(ResourceArns=arns[start:start + ELB_TAG_BATCH])
+        for description in response['TagDescriptions']:
+            tags = _tag_dict(description.get('Tags'))
+            if _tags_match(tag_filters, tags):
+                resources.append(resource('alb', description['ResourceArn'], tags, region))
+    return resources
+
+def discover_rds(rds_client, tag_filters, region=None):
+    resources = []
+    # describe_db_instances cannot filter on tags, but returns them (TagList).
+    for page in rds_client.get_paginator('describe_db_instances').paginate():
+        for instance in page['DBInstances']:
+            tags = _tag_dict(instance.get('TagList'))
+            if _tags_match(tag_filters, tags):
+                resources.append(resource('rds', instance['DBInstanceIdentifier'], tags, region))
+    return resources
+
+DISCOVERERS = {'ec2': ('ec2', discover_ec2), 'alb': ('elbv2', discover_alb), 'rds': ('rds', discover_rds)}
+
+def _cache_key(regions, resource_types, tag_filters):
+    scope = json.dumps([sorted(regions), sorted(resource_types), sorted(tag_filters.items())])
+    return hashlib.sha1(scope.encode()).hexdigest()[:16]
+
+def discover(regions, resource_types=RESOURCE_TYPES, tag_filters=None, cache_path=None,
+             ttl=DEFAULT_CACHE_TTL, session=None, workers=None):
+    """
+    Lists the EC2 instances, application load balancers and RDS instances
+    in `regions` carrying every tag in `tag_filters`, one thread per
+    (region, service). Results are cached in `cache_path` (if given) for
+    `ttl` seconds per scope. Returns resource dicts (see aws_alarm_templates.resource).
+    """
+    tag_filters = tag_filters or {}
+    key = _cache_key(regions, resource_types, tag_filters)
+    cache = {}
+    if cache_path:
+        try:
+            with open(cache_path) as f:
+                cache = json.load(f)
+        except (OSError, ValueError):
+            cache = {}
+        entry = cache.get(key)
+        if entry and time.time() - entry['discovered_at'] < ttl:
+            return entry['resources']
+
+    session = session or boto3.session.Session()
+    # Clients are created here, not in the threads: sessions are not thread-safe.
+    jobs = [(session.client(DISCOVERERS[t][0], region_name=region), DISCOVERERS[t][1], region)
+            for region in regions for t in resource_types]
+    with ThreadPoolExecutor(max_workers=workers or len(jobs) or 1) as pool:
+        found = pool.map(lambda job: job[1](job[0], tag_filters, job[2]), jobs)
+        resources = [res for batch in found for res in batch]
+
+    if cache_path:
+        cache[key] = {'discovered_at': time.time(), 'resources': resources}
+        os.makedirs(os.path.dirname(os.path.abspath(cache_path)), exist_ok=True)
+        tmp_path = f"{cache_path}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(cache, f)
+        os.replace(tmp_path, cache_path)
+    return resources
@@ -0,0 +1,109 @@
+import random
+import threading
+import time
+
+from botocore.exceptions import ClientError, HTTPClientError
+from botocore.exceptions import ConnectionError as BotocoreConnectionError
+
+# Error codes AWS APIs use to say "slow down".
+THROTTLING_CODES = {
+    'Throttling', 'ThrottlingException', 'ThrottledException', 'RequestLimitExceeded',
+    'TooManyRequestsException', 'RequestThrottled', 'SlowDown', 'RequestThrottledException',
+}
+
+# Error codes (besides any 5xx response) for failures that may pass on retry.
+TRANSIENT_CODES = {'RequestTimeout', 'RequestTimeoutException', 'PriorRequestNotComplete', 'InternalError'}
+
+def is_throttling(error):
+    return isinstance(error, ClientError) and error.response.get('Error', {}).get('Code') in THROTTLING_CODES
+
+def is_transient(error):
+    """Server-side errors and dropped or timed-out connections: worth retrying, but not throttling."""
+    if isinstance(error, (BotocoreConnectionError, HTTPClientError)):
+        return True
+    if not isinstance(error, ClientError):
+        return False
+    return (error.response.get('Error', {}).get('Code') in TRANSIENT_CODES
+            or error.response.get('ResponseMetadata', {}).get('HTTPStatusCode', 0) >= 500)
+
+def client_config(max_pool_connections=10):
+    """
+    botocore settings for clients driven through call_with_backoff():
+    botocore's own retries are turned off so that throttling, 5xx and
+    connection errors are retried (and counted) in one place, and the
+    connection pool fits the workers.
+    """
+    # Imported here: botocore.config is most of the import time of a Lambda cold start.
+    from botocore.config import Config
+    return Config(retries={'mode': 'standard', 'total_max_attempts': 1}, max_pool_connections=max_pool_connections)
+
+class TokenBucket:
+    """
+    Thread-safe token bucket: acquire() blocks until a call may be made at
+    `rate` calls/second (bursts up to `burst`). It adapts to throttling:
+    throttled() halves the rate (down to `min_rate`) and each succeeded()
+    wins back a twentieth of the configured rate.
+    """
+
+    def __init__(self, rate, burst=None, min_rate=None, clock=time.monotonic, sleep=time.sleep):
+        self.max_rate = float(rate)
+        self.rate = float(rate)
+        self.min_rate = min_rate or self.max_rate / 10
+        self.burst = burst or max(1.0, self.max_rate)
+        self._clock = clock
+        self._sleep = sleep
+        self._tokens = self.burst
+        self._updated = clock()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self._lock:
+                now = self._clock()
+                self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            self._sleep(wait)
+
+    def throttled(self):
+        with self._lock:
+            self.rate = max(self.min_rate, self.rate / 2)
+            self._tokens = min(self._tokens, 0.0)
+
+    def succeeded(self):
+        with self._lock:
+            self.rate = min(self.max_rate, self.rate + self.max_rate / 20)
+
+def call_with_backoff(method, bucket=None, max_attempts=8, base_delay=0.25, max_delay=20.0,
+                      on_retry=None, sleep=time.sleep, **kwargs):
+    """
+    Calls method(**kwargs), first taking a token from `bucket` if given.
+    Throttling and transient errors (5xx, dropped connections, timeouts)
+    are retried up to `max_attempts` in total, sleeping a random ("full
+    jitter") delay up to base_delay * 2**attempt, capped at `max_delay`;
+    on_retry(attempt, error, delay) is called before each sleep. Only
+    throttling slows `bucket` down. Other errors, and the last retryable
+    one, are raised.
+    """
+    for attempt in range(1, max_attempts + 1):
+        if bucket is not None:
+            bucket.acquire()
+        try:
+            response = method(**kwargs)
+        except (ClientError, BotocoreConnectionError, HTTPClientError) as e:
+            throttled = is_throttling(e)
+            if not (throttled or is_transient(e)) or attempt == max_attempts:
+                raise
+            if throttled and bucket is not None:
+                bucket.throttled()
+            delay = random.uniform(0, min(max_delay, base_delay * 2 ** attempt))
+            if on_retry:
+                on_retry(attempt, e, delay)
+            sleep(delay)
+            continue
+        if bucket is not None:
+            bucket.succeeded()
+        return response
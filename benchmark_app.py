@@ -0,0 +1,308 @@
+import argparse
+import http.client
+import json
+import os
+import random
+import resource
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from array import array
+from urllib.parse import urlencode
+
+from schedule_snapshot import write_snapshot
+from schedule_store import ScheduleStore, format_time
+
+DEFAULT_SIZES = (1000, 100000, 1000000)
+
+# (weight, scenario) pairs; each scenario builds a request path from a
+# random generator and the list of station names.
+QUERY_MIX = (
+    (30, 'origin_window'),
+    (15, 'route'),
+    (10, 'destination'),
+    (15, 'paged'),
+    (10, 'journey'),
+    (10, 'home'),
+    (10, 'origin_window_revalidate'),
+)
+
+def synthetic_store(trips, seed=42):
+    """Builds a deterministic synthetic timetable of `trips` rows."""
+    rng = random.Random(seed)
+    station_count = max(10, int(trips ** 0.5))
+    stations = [f"Station {i:05d}" for i in range(station_count)]
+    train_ids = [f"T{i:07d}" for i in range(trips)]
+    departure = array('H', sorted(rng.randrange(5 * 60, 23 * 60) for _ in range(trips)))
+    origin = array('I', (rng.randrange(station_count) for _ in range(trips)))
+    destination = array('I', ((o + rng.randrange(1, station_count)) % station_count for o in origin))
+    arrival = array('H', (d + rng.randrange(10, 120) for d in departure))
+    train = array('I', range(trips))
+    return ScheduleStore.from_columns(stations, train_ids, train, origin, destination, departure, arrival)
+
+def build_path(scenario, rng, stations):
+    station, other = rng.choice(stations), rng.choice(stations)
+    start = rng.randrange(5 * 60, 22 * 60)
+    window = {'from': format_time(start), 'to': format_time(start + 60)}
+    if scenario == 'origin_window':
+        return '/schedule?' + urlencode(dict(origin=station, limit=50, **window)), {}
+    if scenario == 'origin_window_revalidate':
+        # Polling client: same small set of queries, always revalidating.
+        return '/schedule?' + urlencode({'origin': stations[rng.randrange(10)], 'limit': 50}), {'revalidate': True}
+    if scenario == 'route':
+        return '/schedule?' + urlencode({'origin': station, 'destination': other}), {}
+    if scenario == 'destination':
+        return '/schedule?' + urlencode(dict(destination=station, limit=50, **window)), {}
+    if scenario == 'paged':
+        return '/schedule?' + urlencode({'origin': station, 'page_size': 100}), {}
+    if scenario == 'journey':
+        return '/journey?' + urlencode({'origin': station, 'destination': other,
+                                        'depart_after': window['from']}), {}
+    return '/', {}
+
+class InProcessClient:
+    """Drives the Flask app through its test client (no sockets)."""
+
+    def __init__(self, flask_app):
+        self.client = flask_app.test_client()
+
+    def get(self, path, headers):
+        response = self.client.get(path, headers=headers)
+        return response.status_code, response.headers.get('ETag')
+
+class HttpClient:
+    """One keep-alive HTTP/1.1 connection to a running server."""
+
+    def __init__(self, host, port):
+        self.host, self.port = host, port
+        self.conn = http.client.HTTPConnection(host, port, timeout=30)
+
+    def get(self, path, headers):
+        try:
+            self.conn.request('GET', path, headers=headers)
+            response = self.conn.getresponse()
+            response.read()
+        except (OSError, http.client.HTTPException):
+            self.conn.close()
+            self.conn = http.client.HTTPConnection(self.host, self.port, timeout=30)
+            raise
+        return response.status, response.getheader('ETag')
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, int(fraction * len(sorted_values)))
+    return sorted_values[index]
+
+def run_load(make_client, stations, concurrency, duration, seed):
+    """Runs the query mix at fixed concurrency for `duration` seconds."""
+    scenarios = [name for weight, name in QUERY_MIX for _ in range(weight)]
+    latencies = {name: [] for _, name in QUERY_MIX}
+    errors = {name: 0 for _, name in QUERY_MIX}
+    lock = threading.Lock()
+    deadline = time.perf_counter() + duration
+
+    def worker(worker_id):
+        rng = random.Random(seed + worker_id)
+        client = make_client()
+        etags = {}
+        local = {name: [] for name in latencies}
+        local_errors = {name: 0 for name in errors}
+        while time.perf_counter() < deadline:
+            scenario = rng.choice(scenarios)
+            path, options = build_path(scenario, rng, stations)
+            headers = {'Accept-Encoding': 'gzip'}
+            if options.get('revalidate') and path in etags:
+                headers['If-None-Match'] = etags[path]
+            start = time.perf_counter()
+            try:
+                status, etag = client.get(path, headers)
+            except (OSError, http.client.HTTPException):
+                local_errors[scenario] += 1
+                continue
+            local[scenario].append(time.perf_counter() - start)
+            if status >= 500:
+                local_errors[scenario] += 1
+            if etag:
+                etags[path] = etag
+        with lock:
+            for name in latencies:
+                latencies[name].extend(local[name])
+                errors[name] += local_errors[name]
+
+    started = time.perf_counter()
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(concurrency)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - started
+
+    def summarize(values, error_count):
+        values = sorted(values)
+        to_ms = lambda v: None if v is None else round(v * 1000, 3)
+        return {
+            "requests": len(values),
+            "errors": error_count,
+            "throughput_rps": round(len(values) / elapsed, 1),
+            "p50_ms": to_ms(percentile(values, 0.50)),
+            "p99_ms": to_ms(percentile(values, 0.99)),
+            "p999_ms": to_ms(percentile(values, 0.999)),
+        }
+
+    result = {name: summarize(latencies[name], errors[name]) for name in latencies}
+    result["all"] = summarize([v for values in latencies.values() for v in values], sum(errors.values()))
+    return result
+
+def peak_rss_mb(pid):
+    """Peak resident set size (VmHWM) of a process, in MiB."""
+    try:
+        with open(f'/proc/{pid}/status') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return round(int(line.split()[1]) / 1024, 1)
+    except OSError:
+        pass
+    return None
+
+def child_pids(pid):
+    children = []
+    for entry in os.listdir('/proc'):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f'/proc/{entry}/stat') as f:
+                # Field 4 is the parent pid; the command name may contain spaces.
+                if int(f.read().rsplit(')', 1)[1].split()[1]) == pid:
+                    children.append(int(entry))
+        except (OSError, IndexError, ValueError):
+            continue
+    return children
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+def wait_for_server(port, timeout=120):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            conn = http.client.HTTPConnection('127.0.0.1', port, timeout=1)
+            conn.request('GET', '/')
+            conn.getresponse().read()
+            return True
+        except OSError:
+            time.sleep(0.2)
+    return False
+
+def bench_in_process(store, args):
+    import app
+    app.set_schedule_store(store)
+    result = run_load(lambda: InProcessClient(app.app), store.stations,
+                      args.concurrency, args.duration, args.seed)
+    # ru_maxrss is in KiB on Linux.
+    result["peak_rss_mb"] = {"in-process": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)}
+    return result
+
+def bench_gunicorn(store, args, workdir):
+    snapshot = os.path.join(workdir, f"schedule-{len(store)}.snap")
+    write_snapshot(store, snapshot)
+    port = free_port()
+    env = dict(os.environ, SCHEDULE_SNAPSHOT=snapshot, GUNICORN_BIND=f'127.0.0.1:{port}',
+               PROMETHEUS_MULTIPROC_DIR=os.path.join(workdir, f'metrics-{port}'))
+    if args.workers:
+        env['GUNICORN_WORKERS'] = str(args.workers)
+    server = subprocess.Popen(
+        [sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', '--access-logfile', '/dev/null', 'app:app'],
+        cwd=os.path.dirname(os.path.abspath(__file__)), env=env,
+    )
+    try:
+        if not wait_for_server(port):
+            raise RuntimeError("gunicorn did not become ready")
+        result = run_load(lambda: HttpClient('127.0.0.1', port), store.stations,
+                          args.concurrency, args.duration, args.seed)
+        result["peak_rss_mb"] = {f"worker-{pid}": peak_rss_mb(pid) for pid in child_pids(server.pid)}
+        return result
+    finally:
+        server.terminate()
+        server.wait(timeout=60)
+
+def find_regressions(results, baseline, threshold):
+    """Lists metrics that got worse than the baseline by more than `threshold`."""
+    regressions = []
+    for size, scenarios in baseline.get("results", {}).items():
+        for scenario, base in scenarios.items():
+            current = results.get(size, {}).get(scenario)
+            if not current or scenario == "peak_rss_mb":
+                continue
+            for metric in ("p50_ms", "p99_ms", "p999_ms"):
+                if base.get(metric) and current.get(metric) and current[metric] > base[metric] * (1 + threshold):
+                    regressions.append(f"{size}/{scenario} {metric}: {base[metric]} -> {current[metric]}")
+            if base.get("throughput_rps") and current.get("throughput_rps", 0) < base["throughput_rps"] * (1 - threshold):
+                regressions.append(f"{size}/{scenario} throughput_rps: {base['throughput_rps']} -> {current['throughput_rps']}")
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Load and latency benchmark for the Train Schedule API."
+    )
+    parser.add_argument("--sizes", type=int, nargs='+', default=list(DEFAULT_SIZES),
+                        help="Synthetic timetable sizes in trips (default: 1000 100000 1000000).")
+    parser.add_argument("--mode", choices=("in-process", "gunicorn"), default="in-process",
+                        help="Drive the app through Flask's test client or a local gunicorn server.")
+    parser.add_argument("--workers", type=int, help="gunicorn worker count (default: gunicorn.conf.py sizing).")
+    parser.add_argument("--concurrency", type=int, default=8, help="Concurrent clients (default: 8).")
+    parser.add_argument("--duration", type=float, default=10.0, help="Seconds of load per size (default: 10).")
+    parser.add_argument("--seed", type=int, default=42, help="Random seed for timetables and queries.")
+    parser.add_argument("--output", default="bench_results.json", help="Where to write the JSON results.")
+    parser.add_argument("--baseline", help="Previous results JSON to compare against.")
+    parser.add_argument("--max-regression", type=float, default=0.2,
+                        help="Allowed relative slowdown vs. the baseline before failing (default: 0.2).")
+    args = parser.parse_args()
+
+    results = {}
+    with tempfile.TemporaryDirectory() as workdir:
+        for size in args.sizes:
+            print(f"Building synthetic timetable with {size} trips...")
+            store = synthetic_store(size, args.seed)
+            print(f"Running {args.mode} load: {args.concurrency} clients for {args.duration}s...")
+            if args.mode == "gunicorn":
+                results[str(size)] = bench_gunicorn(store, args, workdir)
+            else:
+                results[str(size)] = bench_in_process(store, args)
+            overall = results[str(size)]["all"]
+            print(f"  {overall['throughput_rps']} req/s, p50 {overall['p50_ms']} ms, "
+                  f"p99 {overall['p99_ms']} ms, p999 {overall['p999_ms']} ms, errors {overall['errors']}")
+
+    report = {
+        "mode": args.mode,
+        "concurrency": args.concurrency,
+        "duration_s": args.duration,
+        "seed": args.seed,
+        "python": sys.version.split()[0],
+        "results": results,
+    }
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"Results written to {args.output}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        if baseline.get("mode") != args.mode:
+            print(f"Baseline was recorded in {baseline.get('mode')} mode, not {args.mode}; cannot compare.")
+            sys.exit(1)
+        regressions = find_regressions(results, baseline, args.max_regression)
+        if regressions:
+            print(f"Performance regressions beyond {args.max_regression:.0%}:")
+            for line in regressions:
+                print(f"  {line}")
+            sys.exit(1)
+        print("No regressions against the baseline.")
+
+if __name__ == "__main__":
+    main()
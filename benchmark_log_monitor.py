@@ -0,0 +1,222 @@
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import random
+import sys
+import tempfile
+import time
+
+from log_monitor import SECURITY_PATTERNS, RuleSet
+from log_tailer import tail_many
+
+DEFAULT_RULE_COUNTS = (6, 50, 100, 500)
+
+HOSTS = ('web01', 'web02', 'db01', 'bastion')
+USERS = ('root', 'admin', 'deploy', 'alice', 'bob', 'mallory')
+
+# Lines that trigger the default SECURITY_PATTERNS, one template per rule.
+MATCHING_TEMPLATES = (
+    "sshd[{pid}]: Failed password for {user} from 10.{a}.{b}.{c} port {port} ssh2",
+    "sudo:    {user} : TTY=pts/{tty} ; PWD=/home/{user} ; USER=root ; COMMAND=/bin/bash",
+    "useradd[{pid}]: new user: name={user}, UID={uid}, GID={uid}, home=/home/{user}, shell=/bin/bash",
+    "sshd[{pid}]: pam_unix(sshd:session): sshd: session opened for user root by (uid=0)",
+    "bash[{pid}]: {user} ran: chmod 777 /srv/app/uploads",
+    "CRON[{pid}]: CRON (root) CMD (/usr/local/bin/backup.sh)",
+)
+# Routine lines that match nothing.
+BACKGROUND_TEMPLATES = (
+    "sshd[{pid}]: Accepted publickey for {user} from 10.{a}.{b}.{c} port {port} ssh2: ED25519 SHA256:",
+    "systemd[1]: Started Session {uid} of user {user}.",
+    "kernel: [{port}.{pid}] eth0: link up, 1000Mbps, full-duplex, lpa 0x{uid}",
+    "sshd[{pid}]: Disconnected from user {user} 10.{a}.{b}.{c} port {port}",
+    "systemd-logind[{pid}]: New session {uid} of user {user}.",
+    "nginx[{pid}]: 10.{a}.{b}.{c} - - \"GET /api/v1/items/{uid} HTTP/1.1\" 200 {port}",
+)
+MONTHS = ('Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun', 'Jul', 'Aug', 'Sep', 'Oct', 'Nov', 'Dec')
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, int(fraction * len(sorted_values)))
+    return sorted_values[index]
+
+def generate_lines(count, match_ratio=0.01, mean_length=120, max_length=512, seed=42, marker=None):
+    """
+    Deterministic synthetic syslog/auth.log lines. About `match_ratio` of
+    them trigger a default rule; lengths follow a log-normal distribution
+    around `mean_length`, padded with key=value noise and capped at
+    `max_length`. `marker(i)`, if given, is appended to matching lines.
+    """
+    rng = random.Random(seed)
+    start = 1700000000
+    lines = []
+    for i in range(count):
+        matching = rng.random() < match_ratio
+        template = rng.choice(MATCHING_TEMPLATES if matching else BACKGROUND_TEMPLATES)
+        ts = time.gmtime(start + i // 50)
+        body = template.format(
+            pid=rng.randrange(100, 65535), user=rng.choice(USERS), uid=rng.randrange(1000, 60000),
+            port=rng.randrange(1024, 65535), tty=rng.randrange(10),
+            a=rng.randrange(256), b=rng.randrange(256), c=rng.randrange(256),
+        )
+        line = f"{MONTHS[ts.tm_mon - 1]} {ts.tm_mday:2d} {ts.tm_hour:02d}:{ts.tm_min:02d}:{ts.tm_sec:02d} " \
+               f"{rng.choice(HOSTS)} {body}"
+        target = min(max_length, int(rng.lognormvariate(0, 0.4) * mean_length))
+        while len(line) < target:
+            line += f" k{rng.randrange(100)}=v{rng.randrange(100000)}"
+        line = line[:max_length]
+        if matching and marker:
+            line += marker(i)
+        lines.append(line)
+    return lines
+
+def synthetic_rules(count, seed=42):
+    """The default rules plus generated ones of typical shapes, `count` in total."""
+    rng = random.Random(seed)
+    rules = list(SECURITY_PATTERNS[:count])
+    shapes = (
+        lambda i: rf"svc{i:04d}: (error|fatal) in worker \d+",
+        lambda i: rf"denied access to /srv/app{i}/",
+        lambda i: rf"(login|logout) failure for tenant-{i}",
+        lambda i: rf"module_{i}\.so: segfault at [0-9a-f]+",
+        lambda i: rf"token[- ]{i}x?(expired|revoked)",
+    )
+    for i in range(len(rules), count):
+        rules.append({
+            "pattern": rng.choice(shapes)(i),
+            "message": f"[SYNTHETIC] Rule {i}",
+            "level": rng.choice(("LOW", "MEDIUM", "HIGH")),
+        })
+    return rules
+
+def bench_batch(lines, rules):
+    """Scans `lines` once; returns wall throughput and CPU per 10k lines."""
+    rule_set = RuleSet(rules)
+    wall, cpu = time.perf_counter(), time.process_time()
+    matches = 0
+    for line in lines:
+        matches += len(rule_set.match(line))
+    wall, cpu = time.perf_counter() - wall, time.process_time() - cpu
+    return {
+        "rules": len(rules),
+        "lines": len(lines),
+        "matches": matches,
+        "lines_per_sec": round(len(lines) / wall),
+        "cpu_ms_per_10k_lines": round(cpu * 1000 * 10000 / len(lines), 2),
+    }
+
+def _write_log(path, lines, rate):
+    """Appends `lines` at about `rate` lines/sec, stamping the write time into matching lines."""
+    interval = 1.0 / rate
+    next_write = time.time()
+    with open(path, 'a', buffering=1) as f:
+        for line in lines:
+            delay = next_write - time.time()
+            if delay > 0:
+                time.sleep(delay)
+            next_write += interval
+            f.write(line.replace('@TS@', repr(time.time())) + '\n')
+
+def bench_latency(lines, rules, rate):
+    """
+    Tails a file that a separate process appends to at `rate` lines/sec and
+    returns append-to-alert latency percentiles for the matching lines.
+    """
+    rule_set = RuleSet(rules)
+    latencies = []
+
+    def on_lines(path, batch):
+        now = time.time()
+        for line in batch:
+            if rule_set.match(line):
+                marker = line.rfind(' bench_ts=')
+                if marker >= 0:
+                    latencies.append(now - float(line[marker + len(' bench_ts='):]))
+
+    async def run(path, writer):
+        tail = asyncio.ensure_future(tail_many([path], on_lines, recheck_interval=1.0))
+        while writer.is_alive():
+            await asyncio.sleep(0.1)
+        await asyncio.sleep(0.5) # Let the tail catch up
+        tail.cancel()
+        try:
+            await tail
+        except asyncio.CancelledError:
+            pass
+
+    with tempfile.TemporaryDirectory() as workdir:
+        path = os.path.join(workdir, 'auth.log')
+        open(path, 'w').close()
+        writer = multiprocessing.Process(target=_write_log, args=(path, lines, rate))
+        writer.start()
+        asyncio.run(run(path, writer))
+        writer.join()
+
+    latencies.sort()
+    to_ms = lambda v: None if v is None else round(v * 1000, 3)
+    return {
+        "rate_lines_per_sec": rate,
+        "alerts": len(latencies),
+        "p50_ms": to_ms(percentile(latencies, 0.50)),
+        "p99_ms": to_ms(percentile(latencies, 0.99)),
+        "max_ms": to_ms(latencies[-1] if latencies else None),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Throughput and latency benchmark for log_monitor."
+    )
+    parser.add_argument("--lines", type=int, default=200000, help="Synthetic lines for the batch scan (default: 200000).")
+    parser.add_argument("--match-ratio", type=float, default=0.01, help="Fraction of lines that match a rule (default: 0.01).")
+    parser.add_argument("--mean-length", type=int, default=120, help="Mean line length in characters (default: 120).")
+    parser.add_argument("--max-length", type=int, default=512, help="Maximum line length (default: 512).")
+    parser.add_argument("--rule-counts", type=int, nargs='+', default=list(DEFAULT_RULE_COUNTS),
+                        help="Rule counts to scan with (default: 6 50 100 500).")
+    parser.add_argument("--rate", type=int, default=5000, help="Append rate for the latency run, lines/sec (default: 5000).")
+    parser.add_argument("--latency-seconds", type=float, default=10.0, help="Length of the latency run (default: 10).")
+    parser.add_argument("--seed", type=int, default=42, help="Random seed for lines and rules.")
+    parser.add_argument("--generate", metavar="PATH", help="Only write --lines synthetic lines to PATH and exit.")
+    parser.add_argument("--output", default="log_bench_results.json", help="Where to write the JSON results.")
+    args = parser.parse_args()
+
+    if args.generate:
+        lines = generate_lines(args.lines, args.match_ratio, args.mean_length, args.max_length, args.seed)
+        with open(args.generate, 'w') as f:
+            f.writelines(line + '\n' for line in lines)
+        print(f"Wrote {len(lines)} lines to {args.generate}")
+        return
+
+    print(f"Generating {args.lines} lines (match ratio {args.match_ratio})...")
+    lines = generate_lines(args.lines, args.match_ratio, args.mean_length, args.max_length, args.seed)
+    batch = []
+    for count in args.rule_counts:
+        result = bench_batch(lines, synthetic_rules(count, args.seed))
+        batch.append(result)
+        print(f"  {count} rules: {result['lines_per_sec']} lines/s, "
+              f"{result['cpu_ms_per_10k_lines']} ms CPU per 10k lines, {result['matches']} matches")
+
+    live_lines = generate_lines(int(args.rate * args.latency_seconds), args.match_ratio, args.mean_length,
+                                args.max_length, args.seed + 1, marker=lambda i: ' bench_ts=@TS@')
+    print(f"Tailing at {args.rate} lines/s for {args.latency_seconds}s...")
+    latency = bench_latency(live_lines, SECURITY_PATTERNS, args.rate)
+    print(f"  {latency['alerts']} alerts, p50 {latency['p50_ms']} ms, p99 {latency['p99_ms']} ms, "
+          f"max {latency['max_ms']} ms")
+
+    report = {
+        "lines": args.lines,
+        "match_ratio": args.match_ratio,
+        "mean_length": args.mean_length,
+        "max_length": args.max_length,
+        "seed": args.seed,
+        "python": sys.version.split()[0],
+        "batch": batch,
+        "latency": latency,
+    }
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"Results written to {args.output}")
+
+if __name__ == "__main__":
+    main()
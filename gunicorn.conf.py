@@ -0,0 +1,69 @@
+# Production server settings: gunicorn -c gunicorn.conf.py app:app
+import math
+import os
+import shutil
+
+def cgroup_cpu_limit():
+    """Returns the container's CPU quota in cores, or None if unlimited."""
+    try:
+        # cgroup v2: "<quota> <period>" or "max <period>"
+        with open('/sys/fs/cgroup/cpu.max') as f:
+            quota, period = f.read().split()
+        if quota != 'max':
+            return int(quota) / int(period)
+        return None
+    except (OSError, ValueError):
+        pass
+    try:
+        # cgroup v1
+        with open('/sys/fs/cgroup/cpu/cpu.cfs_quota_us') as f:
+            quota = int(f.read())
+        with open('/sys/fs/cgroup/cpu/cpu.cfs_period_us') as f:
+            period = int(f.read())
+        if quota > 0:
+            return quota / period
+    except (OSError, ValueError):
+        pass
+    return None
+
+def default_workers():
+    cpus = cgroup_cpu_limit() or os.cpu_count() or 1
+    # One worker per (rounded-up) core plus one to cover a worker blocked
+    # on I/O; never fewer than two so a restart never drops all capacity.
+    return max(2, math.ceil(cpus) + 1)
+
+bind = os.environ.get('GUNICORN_BIND', '0.0.0.0:5000')
+workers = int(os.environ.get('GUNICORN_WORKERS', default_workers()))
+worker_class = 'gthread'
+threads = int(os.environ.get('GUNICORN_THREADS', 4))
+
+# Load the app (and the schedule) once in the master; workers inherit it
+# copy-on-write instead of each parsing it again.
+preload_app = True
+
+# Keep idle connections open longer than the load balancer's idle timeout
+# (60 s on AWS), so the LB never reuses a connection we just closed.
+keepalive = int(os.environ.get('GUNICORN_KEEPALIVE', 65))
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 30))
+# On SIGTERM, workers stop accepting and get this long to finish in-flight
+# requests. Keep it below terminationGracePeriodSeconds in k8s-deployment.yml.
+graceful_timeout = int(os.environ.get('GUNICORN_GRACEFUL_TIMEOUT', 30))
+
+accesslog = '-'
+errorlog = '-'
+
+# Per-worker metric files for prometheus_client's multiprocess mode. This file
+# is read before the app (and metrics.py) is imported, so set it up here and
+# start from an empty directory to drop samples from a previous run.
+os.environ.setdefault('PROMETHEUS_MULTIPROC_DIR', '/tmp/prometheus-multiproc')
+shutil.rmtree(os.environ['PROMETHEUS_MULTIPROC_DIR'], ignore_errors=True)
+os.makedirs(os.environ['PROMETHEUS_MULTIPROC_DIR'], exist_ok=True)
+
+def child_exit(server, worker):
+    from prometheus_client import multiprocess
+    multiprocess.mark_process_dead(worker.pid)
+
+def post_fork(server, worker):
+    # Threads do not survive fork, so each worker starts its own reloader.
+    import app
+    app.schedule_reloader.start()
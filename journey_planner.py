@@ -0,0 +1,93 @@
+from bisect import bisect_left
+
+from schedule_store import format_time
+
+DEFAULT_MAX_TRANSFERS = 3
+DEFAULT_MIN_TRANSFER_MINUTES = 2
+
+_NO_LABEL = (float('inf'),)
+
+def earliest_arrival(store, origin, destination, depart_after,
+                     max_transfers=DEFAULT_MAX_TRANSFERS,
+                     min_transfer_minutes=DEFAULT_MIN_TRANSFER_MINUTES):
+    """
+    Connection Scan over the store's departure-ordered rows.
+    Each row is a connection; rows sharing a train_id are consecutive stops of
+    the same run, so staying aboard is not a transfer. Labels are kept per
+    number of legs used, which bounds the transfers. Returns a list of
+    (board_row, alight_row) legs, or None if the destination is unreachable.
+    """
+    source, target = store.station_id(origin), store.station_id(destination)
+    if source is None or target is None or source == target:
+        return None
+
+    departure, arrival = store.departure, store.arrival
+    from_station, to_station, train = store.origin, store.destination, store.train
+    max_legs = max_transfers + 1
+
+    # labels[n][station] = (arrival, alight_row, board_row, legs) using at most n legs.
+    labels = [{} for _ in range(max_legs + 1)]
+    labels[0][source] = (depart_after,)
+    # trips[train] = (legs, board_row) for runs we are already aboard.
+    trips = {}
+    best = float('inf')
+
+    for row in range(bisect_left(departure, depart_after), len(departure)):
+        dep = departure[row]
+        if dep >= best:
+            break  # Nothing departing now can arrive earlier.
+
+        run = train[row]
+        boarded = trips.get(run)
+        station = from_station[row]
+        # Board here if it takes fewer legs than the way we are already aboard.
+        for legs in range(max_legs if boarded is None else boarded[0] - 1):
+            reached = labels[legs].get(station)
+            if reached is not None and reached[0] + (min_transfer_minutes if legs else 0) <= dep:
+                boarded = trips[run] = (legs + 1, row)
+                break
+        if boarded is None:
+            continue
+
+        legs, board_row = boarded
+        arr, stop = arrival[row], to_station[row]
+        label = (arr, row, board_row, legs)
+        for n in range(legs, max_legs + 1):
+            if arr >= labels[n].get(stop, _NO_LABEL)[0]:
+                break  # Labels only improve with more legs allowed.
+            labels[n][stop] = label
+        if stop == target:
+            best = labels[max_legs][target][0]
+
+    if target not in labels[max_legs]:
+        return None
+
+    journey = []
+    station, legs = target, max_legs
+    while station != source:
+        _, alight_row, board_row, legs = labels[legs][station]
+        journey.append((board_row, alight_row))
+        station, legs = from_station[board_row], legs - 1
+    journey.reverse()
+    return journey
+
+def describe_journey(store, journey):
+    """Formats a journey from earliest_arrival() for the /journey response."""
+    legs = [
+        {
+            "train_id": store.train_ids[store.train[board]],
+            "origin": store.stations[store.origin[board]],
+            "destination": store.stations[store.destination[alight]],
+            "departure_time": format_time(store.departure[board]),
+            "arrival_time": format_time(store.arrival[alight]),
+        }
+        for board, alight in journey
+    ]
+    return {
+        "origin": legs[0]["origin"],
+        "destination": legs[-1]["destination"],
+        "departure_time": legs[0]["departure_time"],
+        "arrival_time": legs[-1]["arrival_time"],
+        "transfers": len(legs) - 1,
+        "legs": legs,
+    }
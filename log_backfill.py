@@ -0,0 +1,148 @@
+import bz2
+import datetime
+import glob
+import gzip
+import heapq
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+
+BLOCK_SIZE = 4 * 1024 * 1024
+# Plain files larger than this are split into ranges scanned in parallel.
+SPLIT_SIZE = 64 * 1024 * 1024
+
+OPENERS = {'.gz': gzip.open, '.bz2': bz2.open}
+
+SYSLOG_TIMESTAMP = re.compile(r'([A-Z][a-z]{2}) +(\d{1,2}) (\d{2}):(\d{2}):(\d{2})')
+ISO_TIMESTAMP = re.compile(r'(\d{4})-(\d{2})-(\d{2})[T ](\d{2}):(\d{2}):(\d{2})')
+MONTHS = {m: i for i, m in enumerate(
+    ('Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun', 'Jul', 'Aug', 'Sep', 'Oct', 'Nov', 'Dec'), 1)}
+
+def expand_paths(patterns):
+    """Expands files and globs, keeping argument order and dropping duplicates."""
+    paths = []
+    for pattern in patterns:
+        matches = sorted(glob.glob(pattern)) if glob.has_magic(pattern) else [pattern]
+        for path in matches:
+            if path not in paths:
+                paths.append(path)
+    return paths
+
+def plan_units(paths, split_size=SPLIT_SIZE):
+    """
+    Splits the scan into (path, start, end) units. Compressed files are one
+    unit each; plain files are cut into ranges of about `split_size` bytes
+    (end=None means to EOF). A unit owns the lines that start inside it.
+    """
+    units = []
+    for path in paths:
+        size = os.path.getsize(path)
+        if os.path.splitext(path)[1] in OPENERS or size <= split_size:
+            units.append((path, 0, None))
+            continue
+        for start in range(0, size, split_size):
+            end = start + split_size
+            units.append((path, start, end if end < size else None))
+    return units
+
+def parse_timestamp(line, reference):
+    """
+    Returns the epoch seconds of a syslog or ISO-8601 line prefix, or None.
+    Syslog timestamps carry no year: `reference` is the (year, month) the file
+    was last written, and months after it belong to the previous year.
+    """
+    found = ISO_TIMESTAMP.match(line)
+    if found:
+        return datetime.datetime(*map(int, found.groups())).timestamp()
+    found = SYSLOG_TIMESTAMP.match(line)
+    if not found or found.group(1) not in MONTHS:
+        return None
+    month = MONTHS[found.group(1)]
+    year = reference[0] if month <= reference[1] else reference[0] - 1
+    day, hour, minute, second = map(int, found.groups()[1:])
+    try:
+        return datetime.datetime(year, month, day, hour, minute, second).timestamp()
+    except ValueError:
+        return None
+
+def _read_lines(f, start, end):
+    """Yields the lines (bytes) that start in [start, end), reading big blocks."""
+    skip_first = start > 0
+    if skip_first:
+        # Begin one byte early: if that byte is a newline, the line at
+        # `start` is ours; otherwise the first piece belongs to the
+        # previous unit.
+        start -= 1
+        f.seek(start)
+    pos, partial = start, b''
+    while True:
+        block = f.read(BLOCK_SIZE)
+        if not block:
+            # An unterminated last line belongs to the previous unit if we
+            # never got past its start.
+            if partial and not skip_first and (end is None or pos < end):
+                yield partial
+            return
+        lines = (partial + block).split(b'\n')
+        partial = lines.pop()
+        for line in lines:
+            if end is not None and pos >= end:
+                return
+            pos += len(line) + 1
+            if skip_first:
+                skip_first = False
+                continue
+            yield line
+
+_worker_rules = None
+
+def _init_worker(rules):
+    global _worker_rules
+    from log_monitor import ScopedRules
+    _worker_rules = ScopedRules(rules)
+
+def scan_unit(unit_index, path, start, end, reference):
+    """
+    Scans one unit in a worker process. Returns (timestamp, unit_index, seq,
+    rule_index, line) tuples in file order. Only matching lines are parsed
+    for a timestamp; one without a timestamp takes the previous match's.
+    """
+    opener = OPENERS.get(os.path.splitext(path)[1])
+    results = []
+    timestamp = 0.0
+    rule_set, rule_indexes = _worker_rules.for_source(path)
+    with (opener(path, 'rb') if opener else open(path, 'rb')) as f:
+        for seq, raw in enumerate(_read_lines(f, start, end)):
+            line = raw.decode('utf-8', 'replace')
+            matches = rule_set.match_indexes(line)
+            if not matches:
+                continue
+            timestamp = parse_timestamp(line, reference) or timestamp
+            for index, _ in matches:
+                results.append((timestamp, unit_index, seq, rule_indexes[index], line))
+    return results
+
+def file_reference(path):
+    modified = datetime.datetime.fromtimestamp(os.path.getmtime(path))
+    return modified.year, modified.month
+
+def backfill(patterns, rules, workers=None, split_size=SPLIT_SIZE):
+    """
+    Scans historical logs (plain, .gz or .bz2) across a process pool and
+    yields (timestamp, path, rule, line) for every match in timestamp
+    order. This is a batch: the earliest match may be in the last unit to
+    finish, so nothing is yielded until every unit has been scanned, and
+    all matches (not lines) are held in memory until then.
+    """
+    paths = expand_paths(patterns)
+    units = plan_units(paths, split_size)
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(rules,)) as pool:
+        futures = [
+            pool.submit(scan_unit, i, path, start, end, file_reference(path))
+            for i, (path, start, end) in enumerate(units)
+        ]
+        scanned = [future.result() for future in futures]
+    # Each unit's matches are already in time order, so merging the
+    # finished lists orders them without a full sort.
+    for timestamp, unit_index, _seq, rule_index, line in heapq.merge(*scanned):
+        yield timestamp, units[unit_index][0], rules[rule_index], line
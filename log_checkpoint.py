@@ -0,0 +1,119 @@
+import hashlib
+import json
+import os
+import time
+
+# How often tail_many() writes checkpoints while lines are flowing; one
+# fsync covers every file that advanced since the last flush.
+DEFAULT_FLUSH_INTERVAL = 5.0
+
+def line_hash(line):
+    """Short fingerprint of a raw line (bytes, without its newline)."""
+    return hashlib.sha1(line).hexdigest()[:16]
+
+class CheckpointStore:
+    """
+    Durable read positions for tailed files, keyed by absolute path:
+    {"dev", "ino", "offset", "hash"} where offset is the end of the last
+    processed line and hash fingerprints that line. Updates stay in memory
+    and are written atomically (temp file, fsync, rename) at most every
+    `flush_interval` seconds, so the tail loop never waits on the disk per line.
+    `before_flush` runs first, e.g. to make sure alerts for the lines being
+    checkpointed have been delivered.
+    """
+
+    def __init__(self, path, flush_interval=DEFAULT_FLUSH_INTERVAL, before_flush=None):
+        self.path = path
+        self.flush_interval = flush_interval
+        self.before_flush = before_flush
+        self.entries = {}
+        self.dirty = False
+        self._last_flush = time.monotonic()
+        try:
+            with open(path) as f:
+                self.entries = json.load(f).get("files", {})
+        except FileNotFoundError:
+            pass
+        except ValueError as e:
+            print(f"Warning: ignoring unreadable checkpoint file '{path}': {e}")
+
+    def get(self, path):
+        return self.entries.get(os.path.abspath(path))
+
+    def record(self, tailer):
+        """Remembers how far `tailer` has been processed."""
+        entry = {"dev": tailer.dev, "ino": tailer.ino, "offset": tailer.offset,
+                 "hash": line_hash(tailer.last_line)}
+        key = os.path.abspath(tailer.path)
+        if self.entries.get(key) != entry:
+            self.entries[key] = entry
+            self.dirty = True
+
+    def forget(self, path):
+        """Drops the position of a file that is no longer tailed."""
+        if self.entries.pop(os.path.abspath(path), None) is not None:
+            self.dirty = True
+
+    def due_in(self):
+        """Seconds until the next flush is due, or None if nothing is pending."""
+        if not self.dirty:
+            return None
+        return max(0.0, self._last_flush + self.flush_interval - time.monotonic())
+
+    def maybe_flush(self):
+        if self.dirty and time.monotonic() - self._last_flush >= self.flush_interval:
+            self.flush()
+
+    def flush(self):
+        if not self.dirty:
+            return
+        if self.before_flush:
+            self.before_flush()
+        directory = os.path.dirname(os.path.abspath(self.path))
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump({"files": self.entries}, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
+        # Persist the rename itself.
+        dir_fd = os.open(directory, os.O_RDONLY)
+        try:
+            os.fsync(dir_fd)
+        finally:
+            os.close(dir_fd)
+        self.dirty = False
+        self._last_flush = time.monotonic()
+
+def last_line_before(f, offset, max_length=1 << 20):
+    """Returns the raw line that ends (with its newline) at `offset` in `f`, or None."""
+    if offset <= 0:
+        return b''
+    start = max(0, offset - max_length)
+    f.seek(start)
+    data = f.read(offset - start)
+    if len(data) != offset - start or not data.endswith(b'\n'):
+        return None
+    begin = data.rfind(b'\n', 0, len(data) - 1) + 1
+    if begin == 0 and start > 0:
+        return None # Longer than max_length; cannot verify
+    return data[begin:-1]
+
+def find_by_inode(path, dev, ino):
+    """Finds the file in `path`'s directory that now has inode (dev, ino), e.g. after rotation."""
+    directory = os.path.dirname(os.path.abspath(path))
+    try:
+        names = os.listdir(directory)
+    except OSError:
+        return None
+    # Rotated names usually extend the original (auth.log.1), so try those first.
+    base = os.path.basename(path)
+    for name in sorted(names, key=lambda n: not n.startswith(base)):
+        candidate = os.path.join(directory, name)
+        try:
+            st = os.stat(candidate)
+        except OSError:
+            continue
+        if (st.st_dev, st.st_ino) == (dev, ino):
+            return candidate
+    return None
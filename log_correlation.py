@@ -0,0 +1,226 @@
+import re
+from collections import OrderedDict, deque
+
+# Sliding windows are approximated with this many time buckets, so a key
+# costs O(BUCKETS) memory however many lines hit it.
+BUCKETS = 10
+# Keys tracked per kind of state (counters, sequences, cooldowns); the least
+# recently seen keys are evicted beyond this.
+DEFAULT_MAX_KEYS = 10000
+
+# Rule keys understood here, in addition to pattern/message/level:
+#   "id":        name that correlation rules refer to.
+#   "key":       named groups from the pattern to group by, e.g. ["ip"].
+#   "threshold": {"count": N, "window": seconds} - alert once N matches for
+#                the same key fall within the window, instead of every line.
+#   "cooldown":  seconds to suppress repeats of an alert for the same key
+#                (defaults to the window for threshold rules, else 0).
+# Correlation rules have no pattern; they fire when the rules named in
+# "sequence" match in that order for the same "key" within "window" seconds.
+
+class BoundedState(OrderedDict):
+    """An LRU dict that drops its least recently used keys beyond `max_keys`."""
+
+    def __init__(self, max_keys):
+        super().__init__()
+        self.max_keys = max_keys
+
+    def touch(self, key, value):
+        self[key] = value
+        self.move_to_end(key)
+        while len(self) > self.max_keys:
+            self.popitem(last=False)
+
+class SlidingCounter:
+    """Counts events over the last `window` seconds in BUCKETS time buckets."""
+
+    __slots__ = ('bucket_seconds', 'window', 'buckets', 'total')
+
+    def __init__(self, window):
+        self.window = window
+        self.bucket_seconds = window / BUCKETS
+        self.buckets = deque() # [bucket start, count]
+        self.total = 0
+
+    def add(self, now):
+        """Records one event at `now` and returns the count within the window."""
+        while self.buckets and self.buckets[0][0] <= now - self.window:
+            self.total -= self.buckets.popleft()[1]
+        start = now - now % self.bucket_seconds
+        if self.buckets and self.buckets[-1][0] == start:
+            self.buckets[-1][1] += 1
+        else:
+            self.buckets.append([start, 1])
+        self.total += 1
+        return self.total
+
+def _key_fields(rule):
+    fields = rule.get("key") or []
+    if isinstance(fields, str):
+        fields = [fields]
+    return tuple(fields)
+
+def _is_number(value):
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+def _validate_common(entry, label):
+    """Checks the fields rules and correlations share: id, key and cooldown."""
+    if "id" in entry and not isinstance(entry["id"], str):
+        raise ValueError(f"{label}: 'id' must be a string.")
+    fields = entry.get("key")
+    if fields is not None and not isinstance(fields, str) and not (
+            isinstance(fields, list) and all(isinstance(f, str) for f in fields)):
+        raise ValueError(f"{label}: 'key' must be a group name or a list of them.")
+    cooldown = entry.get("cooldown")
+    if cooldown is not None and (not _is_number(cooldown) or cooldown < 0):
+        raise ValueError(f"{label}: 'cooldown' must be a number of seconds.")
+
+def validate_rules(rules, correlations):
+    """Raises ValueError for threshold or correlation settings that cannot work."""
+    ids = {}
+    for rule in rules:
+        _validate_common(rule, f"Rule {rule.get('id', rule['pattern'])!r}")
+        groups = re.compile(rule["pattern"]).groupindex
+        missing = [f for f in _key_fields(rule) if f not in groups]
+        if missing:
+            raise ValueError(f"Rule {rule.get('id', rule['pattern'])!r}: key fields {missing} are not "
+                             f"named groups in its pattern.")
+        threshold = rule.get("threshold")
+        if threshold is not None and not (
+                isinstance(threshold, dict) and _is_number(threshold.get("count"))
+                and isinstance(threshold["count"], int) and threshold["count"] > 0
+                and _is_number(threshold.get("window")) and threshold["window"] > 0):
+            raise ValueError(f"Rule {rule.get('id', rule['pattern'])!r}: threshold needs a positive "
+                             f"'count' and 'window'.")
+        if "id" in rule:
+            ids[rule["id"]] = rule
+    for correlation in correlations:
+        _validate_common(correlation, f"Correlation {correlation.get('id')!r}")
+        sequence = correlation.get("sequence") or []
+        if not isinstance(sequence, list) or not all(isinstance(step, str) for step in sequence):
+            sequence = []
+        unknown = [step for step in sequence if step not in ids]
+        if len(sequence) < 2 or unknown:
+            raise ValueError(f"Correlation {correlation.get('id')!r}: 'sequence' needs two or more "
+                             f"known rule ids (unknown: {unknown}).")
+        for step in sequence:
+            groups = re.compile(ids[step]["pattern"]).groupindex
+            if any(f not in groups for f in _key_fields(correlation)):
+                raise ValueError(f"Correlation {correlation.get('id')!r}: rule {step!r} does not "
+                                 f"capture key fields {list(_key_fields(correlation))}.")
+        window = correlation.get("window")
+        if not _is_number(window) or window <= 0:
+            raise ValueError(f"Correlation {correlation.get('id')!r}: 'window' must be positive.")
+
+class Correlator:
+    """
+    Turns rule matches into alerts: plain rules alert on every match (less
+    any cooldown), threshold rules once enough matches share a key within
+    their window, and correlation rules when their sequence completes.
+    All per-key state lives in LRU-capped dicts, so memory stays bounded
+    however many distinct IPs or users show up.
+    """
+
+    def __init__(self, rules, correlations=(), max_keys=DEFAULT_MAX_KEYS):
+        self.rules = list(rules)
+        self.correlations = list(correlations)
+        validate_rules(self.rules, self.correlations)
+        self._patterns = {}
+        self._counters = BoundedState(max_keys)
+        self._sequences = BoundedState(max_keys)
+        self._cooldowns = BoundedState(max_keys)
+        # Rule id -> [(correlation index, step)] for every step it fills.
+        self._steps = {}
+        for index, correlation in enumerate(self.correlations):
+            for step, rule_id in enumerate(correlation["sequence"]):
+                self._steps.setdefault(rule_id, []).append((index, step))
+
+    def adopt_state(self, previous):
+        """
+        Carries counters, partial sequences and cooldowns over from the
+        Correlator `previous` (after a rule reload) for every rule and
+        correlation whose definition did not change.
+        """
+        unchanged = {rule.get("id", rule["pattern"]) for rule in self.rules if rule in previous.rules}
+        unchanged.update(correlation.get("id", index) for index, correlation in enumerate(self.correlations)
+                         if correlation in previous.correlations)
+        for state, old in ((self._counters, previous._counters), (self._sequences, previous._sequences),
+                           (self._cooldowns, previous._cooldowns)):
+            for key, value in old.items():
+                if key[0] in unchanged:
+                    state.touch(key, value)
+
+    def _match(self, rule, line, found):
+        if found is None or found.re.pattern != rule["pattern"]:
+            pattern = self._patterns.get(rule["pattern"])
+            if pattern is None:
+                pattern = self._patterns[rule["pattern"]] = re.compile(rule["pattern"], re.IGNORECASE)
+            found = pattern.search(line)
+        return found
+
+    def _cooling(self, alert_id, key, cooldown, now):
+        """True if this alert fired for `key` less than `cooldown` seconds ago; else arms it."""
+        if cooldown <= 0:
+            return False
+        until = self._cooldowns.get((alert_id, key))
+        if until is not None and now < until:
+            return True
+        self._cooldowns.touch((alert_id, key), now + cooldown)
+        return False
+
+    def observe(self, rule, line, now, found=None):
+        """
+        Feeds one rule match (the line, its time and optionally the re match
+        object) and returns the alerts it triggers as (rule, line, detail).
+        """
+        found = self._match(rule, line, found)
+        groups = found.groupdict() if found else {}
+        rule_id = rule.get("id", rule["pattern"])
+        key = tuple(groups.get(f) or '-' for f in _key_fields(rule))
+        alerts = []
+
+        threshold = rule.get("threshold")
+        if threshold is None:
+            if not self._cooling(rule_id, key, rule.get("cooldown", 0), now):
+                alerts.append((rule, line, None))
+        else:
+            counter = self._counters.get((rule_id, key))
+            if counter is None:
+                counter = SlidingCounter(threshold["window"])
+            self._counters.touch((rule_id, key), counter)
+            count = counter.add(now)
+            if count >= threshold["count"] and not self._cooling(
+                    rule_id, key, rule.get("cooldown", threshold["window"]), now):
+                detail = f"{count} matches in {threshold['window']}s"
+                if key:
+                    detail += " for " + ", ".join(f"{f}={v}" for f, v in zip(_key_fields(rule), key))
+                alerts.append((rule, line, detail))
+
+        for index, step in self._steps.get(rule.get("id"), ()):
+            alerts.extend(self._advance(index, step, groups, line, now))
+        return alerts
+
+    def _advance(self, index, step, groups, line, now):
+        correlation = self.correlations[index]
+        fields = _key_fields(correlation)
+        key = tuple(groups.get(f) or '-' for f in fields)
+        correlation_id = correlation.get("id", index)
+        state_key = (correlation_id, key)
+        state = self._sequences.get(state_key)
+        if state is not None and now - state[1] > correlation["window"]:
+            del self._sequences[state_key]
+            state = None
+        if state is not None and state[0] == step:
+            if step + 1 < len(correlation["sequence"]):
+                self._sequences.touch(state_key, (step + 1, state[1]))
+                return []
+            del self._sequences[state_key]
+            if self._cooling(correlation_id, key, correlation.get("cooldown", 0), now):
+                return []
+            detail = " -> ".join(correlation["sequence"]) + f" within {correlation['window']}s"
+            if key:
+                detail += " for " + ", ".join(f"{f}={v}" for f, v in zip(fields, key))
+            return [(correlation, line, detail)]
+        if step == 0:
+            self._sequences.touch(state_key, (1, now))
+        return []
@@ -1,91 +1,347 @@
-import time
 import re
 import argparse
+import asyncio
+import fnmatch
 import os
+import signal
+import time
 
-def monitor_log(log_file_path):
-    """Monitors a log file for security-related patterns in real-time."""
-    # Define security patterns (regex) and their corresponding alert messages
-    security_patterns = [
-        {
-            "pattern": r"authentication failure|failed password",
-            "message": "[SECURITY ALERT] Failed login attempt detected!",
-            "level": "CRITICAL"
-        },
-        {
-            "pattern": r"sudo: .*COMMAND=\/bin\/(bash|sh)",
-            "message": "[SECURITY ALERT] Suspicious sudo to shell command!",
-            "level": "HIGH"
-        },
-        {
-            "pattern": r"useradd|usermod|groupadd|groupmod",
-            "message": "[SECURITY ALERT] User/Group modification detected!",
-            "level": "MEDIUM"
-        },
-        {
-            "pattern": r"sshd: session opened for user root",
-            "message": "[SECURITY ALERT] Root SSH session opened!",
-            "level": "HIGH"
-        },
-        {
-            "pattern": r"rm -rf|chmod 777|chown root",
-            "message": "[SECURITY ALERT] Potentially destructive or privilege-changing command!",
-            "level": "HIGH"
-        },
-        {
-            "pattern": r"CRON \(root\) CMD",
-            "message": "[INFO] Root CRON job executed.",
-            "level": "LOW"
-        }
-    ]
-
-    print(f"Monitoring log file: {log_file_path} for security events...")
+from log_backfill import backfill, expand_paths
+from log_checkpoint import CheckpointStore
+from log_correlation import Correlator
+from log_rules import RuleFile
+from log_sinks import AlertWriter, ConsoleSink, make_alert, make_sink
+from log_tailer import tail_many
+
+try:
+    import re._parser as sre_parse # Python 3.11+
+    import re._constants as sre_constants
+except ImportError:
+    import sre_parse
+    import sre_constants
+
+# Security patterns (regex, matched case-insensitively) and their alert messages.
+# Threshold, key and cooldown settings are described in log_correlation.py.
+# A rule may add "sources": a list of globs (matched against the full path or
+# the file name, e.g. ["auth.log*"]) to apply only to those logs.
+SECURITY_PATTERNS = [
+    {
+        "id": "failed_login",
+        "pattern": r"(?:authentication failure|failed password)(?:.*?(?:rhost=| from )(?P<ip>[0-9a-f.:]+))?",
+        "message": "[SECURITY ALERT] Repeated failed login attempts detected!",
+        "level": "CRITICAL",
+        "key": ["ip"],
+        "threshold": {"count": 5, "window": 60},
+        "cooldown": 300
+    },
+    {
+        "id": "sudo_shell",
+        "pattern": r"sudo: +(?:(?P<user>[^\s:]+) +: )?.*COMMAND=\/bin\/(bash|sh)",
+        "message": "[SECURITY ALERT] Suspicious sudo to shell command!",
+        "level": "HIGH"
+    },
+    {
+        "id": "user_modification",
+        "pattern": r"(?:useradd|usermod|groupadd|groupmod)(?:.*?\bname=(?P<user>[^\s,]+))?",
+        "message": "[SECURITY ALERT] User/Group modification detected!",
+        "level": "MEDIUM"
+    },
+    {
+        "id": "root_ssh_session",
+        "pattern": r"sshd: session opened for user root",
+        "message": "[SECURITY ALERT] Root SSH session opened!",
+        "level": "HIGH"
+    },
+    {
+        "id": "destructive_command",
+        "pattern": r"rm -rf|chmod 777|chown root",
+        "message": "[SECURITY ALERT] Potentially destructive or privilege-changing command!",
+        "level": "HIGH"
+    },
+    {
+        "id": "root_cron",
+        "pattern": r"CRON \(root\) CMD",
+        "message": "[INFO] Root CRON job executed.",
+        "level": "LOW"
+    }
+]
+
+# Alerts on a sequence of the rules above for the same key (see log_correlation.py).
+CORRELATION_RULES = [
+    {
+        "id": "new_user_root_shell",
+        "sequence": ["user_modification", "sudo_shell"],
+        "key": ["user"],
+        "window": 3600,
+        "message": "[SECURITY ALERT] Newly created/modified user ran a root shell via sudo!",
+        "level": "CRITICAL"
+    }
+]
+
+# Shortest literal worth using as a prefilter keyword; shorter ones match
+# too many lines to save anything.
+MIN_KEYWORD_LENGTH = 3
+
+def _required_keywords(items):
+    """
+    Returns a set of lowercase literals, one of which appears in every match
+    of the parsed regex `items`, or None if no useful set can be derived.
+    """
+    options, run = [], []
+    for op, arg in list(items) + [(None, None)]:
+        if op == sre_constants.LITERAL:
+            run.append(chr(arg))
+            continue
+        if run:
+            options.append({''.join(run).lower()})
+            run = []
+        if op == sre_constants.BRANCH:
+            branches = [_required_keywords(branch) for branch in arg[1]]
+            if all(branches):
+                options.append(set().union(*branches))
+        elif op == sre_constants.SUBPATTERN:
+            inner = _required_keywords(arg[-1])
+            if inner:
+                options.append(inner)
+    # Prefer the option whose shortest keyword is longest (most selective).
+    options = [o for o in options if min(map(len, o)) >= MIN_KEYWORD_LENGTH]
+    return max(options, key=lambda o: (min(map(len, o)), -len(o))) if options else None
+
+class RuleSet:
+    """
+    Security rules compiled once into a single-pass matcher.
+    Every rule's regex is reduced to required keywords; all keywords go into
+    one case-insensitive alternation that is scanned once per line, and only
+    rules whose keywords occur (plus any rule without usable keywords) run
+    their full regex. match() still reports every matching rule.
+    """
+
+    def __init__(self, rules):
+        self.rules = list(rules)
+        self.compiled = [re.compile(rule["pattern"], re.IGNORECASE) for rule in self.rules]
+        self.always = []
+        self.all_indexes = set(range(len(self.rules)))
+        rules_by_keyword = {}
+        for index, rule in enumerate(self.rules):
+            keywords = _required_keywords(sre_parse.parse(rule["pattern"], re.IGNORECASE))
+            if keywords is None:
+                self.always.append(index)
+                continue
+            for keyword in keywords:
+                rules_by_keyword.setdefault(keyword, set()).add(index)
+
+        # Longest keywords first, so at each position the scan reports the
+        # longest keyword there; shorter keywords at the same position are
+        # its prefixes, so their rules are folded into its candidate list.
+        keywords = sorted(rules_by_keyword, key=len, reverse=True)
+        self.candidates = {}
+        for keyword in keywords:
+            matching = set()
+            for other, indexes in rules_by_keyword.items():
+                if keyword.startswith(other):
+                    matching |= indexes
+            self.candidates[keyword] = matching
+        self.prefilter = None
+        if keywords:
+            alternation = '|'.join(re.escape(k) for k in keywords)
+            self.prefilter = re.compile(f"(?=({alternation}))", re.IGNORECASE)
+
+    def match(self, line):
+        """Returns (rule, match) pairs for every rule that matches `line`, in rule order."""
+        return [(self.rules[index], found) for index, found in self.match_indexes(line)]
+
+    def match_indexes(self, line):
+        """Like match(), but returns (rule index, match) pairs."""
+        indexes = set(self.always)
+        if self.prefilter is not None:
+            for keyword in self.prefilter.findall(line):
+                # Unusual case folding falls back to checking every rule.
+                indexes |= self.candidates.get(keyword.lower(), self.all_indexes)
+        results = []
+        for index in sorted(indexes):
+            found = self.compiled[index].search(line)
+            if found:
+                results.append((index, found))
+        return results
+
+def rule_applies(rule, path):
+    """True if `rule` is unscoped or one of its "sources" globs matches `path`."""
+    sources = rule.get("sources")
+    if not sources:
+        return True
+    name = os.path.basename(path)
+    return any(fnmatch.fnmatch(path, s) or fnmatch.fnmatch(name, s) for s in sources)
+
+class ScopedRules:
+    """Hands out the RuleSet for each source, shared by sources with the same rules."""
+
+    def __init__(self, rules):
+        self.rules = list(rules)
+        self._by_path = {}
+        self._by_indexes = {}
+
+    def for_source(self, path):
+        """Returns (RuleSet, indexes of its rules in the full rule list) for `path`."""
+        if path not in self._by_path:
+            indexes = tuple(i for i, rule in enumerate(self.rules) if rule_applies(rule, path))
+            if indexes not in self._by_indexes:
+                self._by_indexes[indexes] = RuleSet(self.rules[i] for i in indexes)
+            self._by_path[path] = (self._by_indexes[indexes], indexes)
+        return self._by_path[path]
+
+def _stop_on_sigterm(signum, frame):
+    raise KeyboardInterrupt
+
+def monitor_logs(patterns, rules=SECURITY_PATTERNS, correlations=CORRELATION_RULES, checkpoint_path=None,
+                 rules_path=None, sinks=None):
+    """
+    Monitors many log files (paths or globs) for security patterns from one
+    event loop. With `checkpoint_path`, read positions survive restarts.
+    With `rules_path`, rules come from that file and are reloaded between
+    batches of lines when it changes. Alerts go to `sinks` (default: console).
+    """
+    rule_file = None
+    if rules_path:
+        try:
+            rule_file = RuleFile(rules_path)
+        except (OSError, ValueError) as e:
+            print(f"Error: cannot load rules from '{rules_path}': {e}")
+            return
+        rules, correlations = rule_file.rules, rule_file.correlations
+    paths = expand_paths(patterns)
+    if not any(os.path.isfile(p) for p in paths):
+        print(f"Error: no log files found for: {', '.join(patterns)}. Please check the path.")
+        return
+
+    active = {"scoped": ScopedRules(rules), "correlator": Correlator(rules, correlations)}
+    writer = AlertWriter(sinks or [ConsoleSink()])
+
+    def on_lines(path, lines):
+        if rule_file and rule_file.reload_if_changed():
+            # Swapped between batches, so no line is skipped or seen twice.
+            correlator = Correlator(rule_file.rules, rule_file.correlations)
+            correlator.adopt_state(active["correlator"])
+            active.update(scoped=ScopedRules(rule_file.rules), correlator=correlator)
+            print(f"Reloaded {len(rule_file.rules)} rule(s) from '{rule_file.path}' (version {rule_file.version}).")
+        rule_set, _ = active["scoped"].for_source(path)
+        correlator = active["correlator"]
+        now = time.time()
+        for line in lines:
+            for rule, found in rule_set.match(line):
+                for alert, alert_line, detail in correlator.observe(rule, line, now, found):
+                    writer.emit(make_alert(alert, alert_line, path, detail, now))
+
+    print(f"Monitoring {', '.join(patterns)} for security events...")
     print("Press Ctrl+C to stop.")
 
+    checkpoints = None
+    if checkpoint_path:
+        checkpoints = CheckpointStore(checkpoint_path, before_flush=writer.drain)
+    # Stop cleanly on SIGTERM too, so the final checkpoint gets written.
+    signal.signal(signal.SIGTERM, _stop_on_sigterm)
     try:
-        # Open the file and seek to the end to only read new lines
-        with open(log_file_path, 'r') as f:
-            f.seek(0, os.SEEK_END)
-
-            while True:
-                line = f.readline()
-                if not line:
-                    time.sleep(0.1)  # Sleep briefly if no new lines
-                    continue
-
-                # Process the new line
-                for pattern_info in security_patterns:
-                    if re.search(pattern_info["pattern"], line, re.IGNORECASE):
-                        color_code = "\033[0m" # Reset
-                        if pattern_info["level"] == "CRITICAL":
-                            color_code = "\033[91m" # Red
-                        elif pattern_info["level"] == "HIGH":
-                            color_code = "\033[93m" # Yellow
-                        elif pattern_info["level"] == "MEDIUM":
-                            color_code = "\033[94m" # Blue
-
-                        print(f"{color_code}{pattern_info["message"]} (Level: {pattern_info["level"]})\033[0m")
-                        print(f"    Log Entry: {line.strip()}")
-                        print("-" * 60)
-
-    except FileNotFoundError:
-        print(f"Error: Log file not found at '{log_file_path}'. Please check the path.")
+        # Without a checkpoint only new lines are inspected; the tailer
+        # follows rotation and truncation
+        asyncio.run(tail_many(patterns, on_lines, checkpoints=checkpoints))
     except KeyboardInterrupt:
         print("\nMonitoring stopped.")
     except Exception as e:
         print(f"An unexpected error occurred: {e}")
+    finally:
+        writer.close()
+
+def monitor_log(log_file_path, rules=SECURITY_PATTERNS, correlations=CORRELATION_RULES):
+    """Monitors a log file for security-related patterns in real-time."""
+    monitor_logs([log_file_path], rules, correlations)
+
+def backfill_logs(patterns, rules=SECURITY_PATTERNS, workers=None, correlations=CORRELATION_RULES,
+                  rules_path=None, sinks=None):
+    """
+    Runs the rules over historical logs and prints alerts in timestamp order.
+    Windows and cooldowns use the log timestamps, so results match what the
+    live monitor would have reported.
+    """
+    if rules_path:
+        try:
+            rule_file = RuleFile(rules_path)
+        except (OSError, ValueError) as e:
+            print(f"Error: cannot load rules from '{rules_path}': {e}")
+            return
+        rules, correlations = rule_file.rules, rule_file.correlations
+    correlator = Correlator(rules, correlations)
+    paths = expand_paths(patterns)
+    missing = [p for p in paths if not os.path.isfile(p)]
+    if missing or not paths:
+        print(f"Error: no log files found for: {', '.join(missing or patterns)}")
+        return
+    print(f"Backfilling {len(paths)} log file(s) for security events...")
+    alerts = 0
+    writer = AlertWriter(sinks or [ConsoleSink()])
+    try:
+        for timestamp, path, rule, line in backfill(paths, rules, workers):
+            for alert, alert_line, detail in correlator.observe(rule, line, timestamp):
+                writer.emit(make_alert(alert, alert_line, path, detail, timestamp))
+                alerts += 1
+    except KeyboardInterrupt:
+        print("\nBackfill stopped.")
+        return
+    finally:
+        writer.close()
+    print(f"Backfill complete: {alerts} alert(s).")
 
 def main():
     parser = argparse.ArgumentParser(
         description="Real-time log monitor for security events."
     )
     parser.add_argument(
-        "log_file",
-        help="The path to the log file to monitor (e.g., /var/log/auth.log, /var/log/syslog)."
+        "log_files",
+        nargs='*',
+        metavar="log_file",
+        help="Log files or globs to monitor together (e.g., /var/log/auth.log '/var/log/nginx/*.log')."
+    )
+    parser.add_argument(
+        "--checkpoint",
+        metavar="FILE",
+        help="Persist read positions here and resume from them on restart, "
+             "including across rotations that happened while stopped."
+    )
+    parser.add_argument(
+        "--rules",
+        metavar="FILE",
+        help="Load rules from a YAML or JSON file instead of the built-in ones; "
+             "reloaded automatically when it changes."
+    )
+    parser.add_argument(
+        "--sink",
+        action="append",
+        metavar="SPEC",
+        help="Where alerts go: console (default), jsonl:PATH, unix:PATH or tcp:HOST:PORT. Repeatable."
+    )
+    parser.add_argument(
+        "--backfill",
+        nargs='+',
+        metavar="PATH",
+        help="Scan existing logs instead of tailing: files or globs, including .gz/.bz2 rotations "
+             "(e.g., '/var/log/auth.log*')."
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        help="Worker processes for --backfill (default: one per CPU)."
     )
     args = parser.parse_args()
 
-    monitor_log(args.log_file)
+    try:
+        sinks = [make_sink(spec) for spec in args.sink or ['console']]
+    except (OSError, ValueError) as e:
+        parser.error(str(e))
+
+    if args.backfill:
+        backfill_logs(args.backfill, workers=args.workers, rules_path=args.rules, sinks=sinks)
+    elif args.log_files:
+        monitor_logs(args.log_files, checkpoint_path=args.checkpoint, rules_path=args.rules, sinks=sinks)
+    else:
+        parser.error("a log_file to monitor or --backfill PATH is required")
 
 if __name__ == "__main__":
     main()
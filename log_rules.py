@@ -0,0 +1,100 @@
+import hashlib
+import json
+import os
+import re
+import time
+
+from log_correlation import validate_rules
+
+try:
+    import yaml
+except ImportError: # PyYAML is optional; JSON rule files work without it
+    yaml = None
+
+# A rule file holds the same structures as SECURITY_PATTERNS and
+# CORRELATION_RULES in log_monitor.py:
+#   rules:        [{id, pattern, message, level, sources, key, threshold, cooldown}, ...]
+#   correlations: [{id, sequence, key, window, message, level, cooldown}, ...]
+# as YAML (.yml/.yaml, needs PyYAML) or JSON (anything else).
+
+def parse_rule_file(path, data):
+    """Parses rule file bytes; returns (rules, correlations) or raises ValueError."""
+    if os.path.splitext(path)[1] in ('.yml', '.yaml'):
+        if yaml is None:
+            raise ValueError(f"'{path}' is YAML but PyYAML is not installed; use JSON or pip install pyyaml.")
+        try:
+            document = yaml.safe_load(data)
+        except yaml.YAMLError as e:
+            raise ValueError(f"'{path}' is not valid YAML: {e}")
+    else:
+        document = json.loads(data)
+    if not isinstance(document, dict) or not isinstance(document.get("rules"), list):
+        raise ValueError(f"'{path}' must contain a 'rules' list.")
+    rules, correlations = document["rules"], document.get("correlations") or []
+    for i, rule in enumerate(rules):
+        if not isinstance(rule, dict) or any(not isinstance(rule.get(f), str) for f in ("pattern", "message", "level")):
+            raise ValueError(f"Rule #{i} in '{path}' needs string 'pattern', 'message' and 'level'.")
+        try:
+            re.compile(rule["pattern"])
+        except re.error as e:
+            raise ValueError(f"Rule #{i} in '{path}' has an invalid pattern: {e}")
+        sources = rule.get("sources")
+        if sources is not None and (not isinstance(sources, list) or not all(isinstance(s, str) for s in sources)):
+            raise ValueError(f"Rule #{i} in '{path}': 'sources' must be a list of globs.")
+    for i, correlation in enumerate(correlations):
+        if not isinstance(correlation, dict) or any(not isinstance(correlation.get(f), str) for f in ("message", "level")):
+            raise ValueError(f"Correlation #{i} in '{path}' needs string 'message' and 'level'.")
+    validate_rules(rules, correlations)
+    ids = [rule["id"] for rule in rules if "id" in rule]
+    if len(ids) != len(set(ids)):
+        raise ValueError(f"Rule ids in '{path}' must be unique.")
+    return rules, correlations
+
+class RuleFile:
+    """
+    A rules file that reloads itself when it changes. reload_if_changed()
+    is cheap to call often: it stats the file at most every
+    `check_interval` seconds and only parses it when the content hash
+    changes. A broken edit is reported and the previous rules stay active.
+    """
+
+    def __init__(self, path, check_interval=1.0):
+        self.path = path
+        self.check_interval = check_interval
+        self._checked = time.monotonic()
+        self._stat = self._file_stat()
+        with open(path, 'rb') as f:
+            data = f.read()
+        self.rules, self.correlations = parse_rule_file(path, data)
+        self.version = hashlib.sha1(data).hexdigest()[:16]
+
+    def _file_stat(self):
+        st = os.stat(self.path)
+        return st.st_ino, st.st_size, st.st_mtime_ns
+
+    def reload_if_changed(self):
+        """Returns True if new rules were loaded."""
+        now = time.monotonic()
+        if now - self._checked < self.check_interval:
+            return False
+        self._checked = now
+        try:
+            stat = self._file_stat()
+            if stat == self._stat:
+                return False
+            self._stat = stat
+            with open(self.path, 'rb') as f:
+                data = f.read()
+        except OSError as e:
+            print(f"Warning: cannot read rule file '{self.path}', keeping current rules: {e}")
+            return False
+        version = hashlib.sha1(data).hexdigest()[:16]
+        if version == self.version:
+            return False
+        try:
+            self.rules, self.correlations = parse_rule_file(self.path, data)
+        except ValueError as e:
+            print(f"Warning: invalid rule file '{self.path}', keeping current rules: {e}")
+            return False
+        self.version = version
+        return True
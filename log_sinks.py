@@ -0,0 +1,170 @@
+import json
+import queue
+import socket
+import sys
+import threading
+import time
+
+LEVEL_COLORS = {
+    "CRITICAL": "\033[91m", # Red
+    "HIGH": "\033[93m", # Yellow
+    "MEDIUM": "\033[94m", # Blue
+}
+
+# Alerts waiting for the sinks; when full, emit() blocks the tail loop until
+# the writer catches up (backpressure) instead of buffering without bound.
+DEFAULT_QUEUE_SIZE = 10000
+# Most alerts handed to a sink in one write.
+BATCH_SIZE = 500
+
+def make_alert(rule, line, source=None, detail=None, timestamp=None):
+    """The structured form of an alert, as written by every sink."""
+    return {
+        "timestamp": time.time() if timestamp is None else timestamp,
+        "level": rule["level"],
+        "message": rule["message"],
+        "rule": rule.get("id"),
+        "source": source,
+        "detail": detail,
+        "line": line.strip(),
+    }
+
+def format_alert(alert, color=True):
+    """The human-readable console form of an alert."""
+    color_code, reset = (LEVEL_COLORS.get(alert["level"], "\033[0m"), "\033[0m") if color else ('', '')
+    text = f"{color_code}{alert['message']} (Level: {alert['level']}){reset}\n"
+    if alert.get("source"):
+        text += f"    Source: {alert['source']}\n"
+    if alert.get("detail"):
+        text += f"    Detail: {alert['detail']}\n"
+    return text + f"    Log Entry: {alert['line']}\n" + "-" * 60 + "\n"
+
+class ConsoleSink:
+    """Colored text on stdout (colors only when it is a terminal)."""
+
+    def __init__(self, stream=None, color=None):
+        self.stream = stream or sys.stdout
+        self.color = self.stream.isatty() if color is None else color
+
+    def write(self, alerts):
+        self.stream.write(''.join(format_alert(alert, self.color) for alert in alerts))
+        self.stream.flush()
+
+    def close(self):
+        pass
+
+class JsonLinesSink:
+    """One JSON object per alert, appended to a file."""
+
+    def __init__(self, path):
+        self.path = path
+        self._file = open(path, 'a', encoding='utf-8')
+
+    def write(self, alerts):
+        self._file.write(''.join(json.dumps(alert, separators=(',', ':')) + '\n' for alert in alerts))
+        self._file.flush()
+
+    def close(self):
+        self._file.close()
+
+class SocketSink:
+    """
+    JSON lines over a local stream socket (a Unix socket path, or
+    host:port for TCP). Reconnects on the next batch after a failure.
+    """
+
+    def __init__(self, address):
+        self.address = address
+        self._sock = None
+
+    def _connect(self):
+        if isinstance(self.address, tuple):
+            sock = socket.create_connection(self.address, timeout=10)
+        else:
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            sock.settimeout(10)
+            sock.connect(self.address)
+        return sock
+
+    def write(self, alerts):
+        data = ''.join(json.dumps(alert, separators=(',', ':')) + '\n' for alert in alerts).encode('utf-8')
+        if self._sock is None:
+            self._sock = self._connect()
+        try:
+            self._sock.sendall(data)
+        except OSError:
+            self.close()
+            raise
+
+    def close(self):
+        if self._sock is not None:
+            self._sock.close()
+            self._sock = None
+
+def make_sink(spec):
+    """
+    Builds a sink from a command-line spec: "console", "jsonl:PATH",
+    "unix:PATH" or "tcp:HOST:PORT". Raises ValueError for anything else.
+    """
+    kind, _, target = spec.partition(':')
+    if kind == 'console' and not target:
+        return ConsoleSink()
+    if kind == 'jsonl' and target:
+        return JsonLinesSink(target)
+    if kind == 'unix' and target:
+        return SocketSink(target)
+    if kind == 'tcp' and target:
+        host, _, port = target.rpartition(':')
+        if host and port.isdigit():
+            return SocketSink((host, int(port)))
+    raise ValueError(f"Unknown sink '{spec}': use console, jsonl:PATH, unix:PATH or tcp:HOST:PORT.")
+
+class AlertWriter:
+    """
+    Delivers alerts to the sinks from a background thread, in batches of up
+    to BATCH_SIZE. The tail loop only enqueues; a slow sink holds up the
+    other sinks and, once the bounded queue fills, the producer. A sink that
+    raises is reported and retried with the next batch; that batch is dropped
+    for it alone.
+    """
+
+    def __init__(self, sinks, max_queue=DEFAULT_QUEUE_SIZE):
+        self.sinks = list(sinks)
+        self._queue = queue.Queue(max_queue)
+        self._thread = threading.Thread(target=self._run, name='alert-writer', daemon=True)
+        self._thread.start()
+
+    def emit(self, alert):
+        self._queue.put(alert)
+
+    def drain(self):
+        """Blocks until every alert emitted so far has been written."""
+        self._queue.join()
+
+    def close(self):
+        self._queue.put(None)
+        self._thread.join()
+        for sink in self.sinks:
+            sink.close()
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            while len(batch) < BATCH_SIZE:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            stop = None in batch
+            alerts = [alert for alert in batch if alert is not None]
+            if alerts:
+                for sink in self.sinks:
+                    try:
+                        sink.write(alerts)
+                    except Exception as e:
+                        print(f"Warning: alert sink {type(sink).__name__} failed, "
+                              f"{len(alerts)} alert(s) not delivered to it: {e}", file=sys.stderr)
+            for _ in batch:
+                self._queue.task_done()
+            if stop:
+                return
@@ -0,0 +1,387 @@
+import asyncio
+import ctypes
+import ctypes.util
+import fnmatch
+import glob
+import os
+import select
+import stat
+import struct
+import sys
+import time
+
+from log_checkpoint import find_by_inode, last_line_before, line_hash
+
+# inotify(7) event masks
+IN_MODIFY = 0x002
+IN_ATTRIB = 0x004
+IN_CLOSE_WRITE = 0x008
+IN_MOVED_FROM = 0x040
+IN_MOVED_TO = 0x080
+IN_CREATE = 0x100
+IN_DELETE = 0x200
+IN_DELETE_SELF = 0x400
+IN_MOVE_SELF = 0x800
+# Watching the directory (not the file) also reports the rename/create that
+# logrotate performs, so one watch covers writes, rotation and truncation.
+DIRECTORY_EVENTS = (IN_MODIFY | IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO |
+                    IN_CREATE | IN_DELETE | IN_DELETE_SELF | IN_MOVE_SELF)
+_EVENT_HEADER = struct.Struct('iIII')
+
+READ_SIZE = 1 << 16
+# Bytes tail_many() reads from one file before moving on to the next, so a
+# busy log cannot starve the quiet ones.
+TURN_BYTES = 4 * READ_SIZE
+# Rotated logs compressed by logrotate; tail_many() never tails these.
+COMPRESSED_SUFFIXES = ('.gz', '.bz2', '.xz', '.zst', '.zip')
+
+class LogTailer:
+    """
+    Non-blocking reader of complete lines appended to a log file.
+    Follows the path, not the descriptor: when the file is replaced
+    (logrotate create mode) the old file is drained to EOF before the new one
+    is opened from the start, and when it shrinks in place (copytruncate)
+    reading restarts at offset 0. Lines are neither lost nor repeated.
+    A `checkpoint` (see log_checkpoint.py) resumes where a previous run
+    stopped, in the rotated file if the log was rotated in the meantime.
+    `known(dev, ino)`, if given, says whether a file is already read by
+    another tailer: when the path is replaced by such a file (auth.log.1
+    becoming the old auth.log), the old file is drained and the tailer
+    stops, setting `done`, instead of reading that file again.
+    """
+
+    def __init__(self, path, from_start=False, checkpoint=None, known=None):
+        self.path = path
+        self.known = known
+        self.more = False
+        self.done = False
+        self.last_line = b''
+        self._file = None
+        if checkpoint is not None and self._resume(checkpoint):
+            return
+        # A checkpoint that no longer fits means the file was replaced or
+        # truncated while we were down, so all of it is unread.
+        self._attach(open(path, 'rb', buffering=0), from_start or checkpoint is not None)
+
+    def _attach(self, f, from_start):
+        st = os.fstat(f.fileno())
+        self._file = f
+        self.dev, self.ino = st.st_dev, st.st_ino
+        self._read_pos = 0 if from_start else st.st_size
+        self._partial = b''
+        self.last_line = b''
+        f.seek(self._read_pos)
+
+    def _resume(self, checkpoint):
+        """Reopens the checkpointed position if its file and last line still match."""
+        try:
+            st = os.stat(self.path)
+            same_file = (st.st_dev, st.st_ino) == (checkpoint['dev'], checkpoint['ino'])
+        except FileNotFoundError:
+            same_file = False
+        source = self.path if same_file else find_by_inode(self.path, checkpoint['dev'], checkpoint['ino'])
+        if source is None:
+            return False
+        f = open(source, 'rb', buffering=0)
+        line = last_line_before(f, checkpoint['offset'])
+        if line is None or line_hash(line) != checkpoint['hash']:
+            f.close()
+            return False
+        # If `source` is the rotated file, the next read_lines() drains it
+        # and then moves on to the new file at `path`, as for a live rotation.
+        self._attach(f, from_start=True)
+        self._read_pos = checkpoint['offset']
+        self.last_line = line
+        f.seek(self._read_pos)
+        return True
+
+    @property
+    def offset(self):
+        """Bytes consumed up to the end of the last complete line."""
+        return self._read_pos - len(self._partial)
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def _read_available(self, max_bytes=None):
+        lines, consumed = [], 0
+        while True:
+            if max_bytes is not None and consumed >= max_bytes:
+                self.more = True
+                return lines
+            chunk = self._file.read(READ_SIZE)
+            if not chunk:
+                return lines
+            consumed += len(chunk)
+            self._read_pos += len(chunk)
+            data = self._partial + chunk
+            end = data.rfind(b'\n')
+            if end < 0:
+                self._partial = data
+                continue
+            self._partial = data[end + 1:]
+            self.last_line = data[data.rfind(b'\n', 0, end) + 1:end]
+            lines.extend(line.decode('utf-8', 'replace') for line in data[:end].split(b'\n'))
+
+    def read_lines(self, max_bytes=None):
+        """
+        Returns the complete lines available now (without trailing newlines).
+        With `max_bytes`, stops after about that much and sets `more` so the
+        caller knows to come back; rotation is only checked once caught up.
+        """
+        self.more = False
+        if self.done:
+            return []
+        lines = self._read_available(max_bytes)
+        if self.more:
+            return lines
+        try:
+            st = os.stat(self.path)
+            if (st.st_dev, st.st_ino) != (self.dev, self.ino):
+                new_file = open(self.path, 'rb', buffering=0)
+            else:
+                new_file = None
+        except FileNotFoundError:
+            return lines # Rotated away and not recreated yet; keep the old file
+
+        if new_file is not None:
+            # Rotated: finish the old file (a last line may lack its newline),
+            # then start the new one from the beginning.
+            lines.extend(self._read_available())
+            if self._partial:
+                lines.append(self._partial.decode('utf-8', 'replace'))
+            self.close()
+            if self.known is not None and self.known(st.st_dev, st.st_ino):
+                new_file.close()
+                self.done = True
+                return lines
+            self._attach(new_file, from_start=True)
+            lines.extend(self._read_available())
+        elif st.st_size < self._read_pos:
+            # Truncated in place: everything after the truncation point is new.
+            self._file.seek(0)
+            self._read_pos = 0
+            self._partial = b''
+            self.last_line = b''
+            lines.extend(self._read_available())
+        return lines
+
+class InotifyWatcher:
+    """Blocks until something changes in the watched files' directories (Linux)."""
+
+    def __init__(self):
+        self._libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+        self._fd = self._libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self._fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        self._directories = {}
+
+    def add(self, path):
+        directory = os.path.dirname(os.path.abspath(path))
+        if directory in self._directories.values():
+            return
+        wd = self._libc.inotify_add_watch(self._fd, directory.encode(), DIRECTORY_EVENTS)
+        if wd < 0:
+            raise OSError(ctypes.get_errno(), f"inotify_add_watch failed for '{directory}'")
+        self._directories[wd] = directory
+
+    def fileno(self):
+        return self._fd
+
+    def read_events(self):
+        """Drains pending events; returns the set of paths they name."""
+        paths = set()
+        while True:
+            try:
+                data = os.read(self._fd, 64 * 1024)
+            except BlockingIOError:
+                return paths
+            pos = 0
+            while pos < len(data):
+                wd, _mask, _cookie, length = _EVENT_HEADER.unpack_from(data, pos)
+                name = data[pos + _EVENT_HEADER.size:pos + _EVENT_HEADER.size + length].rstrip(b'\0')
+                pos += _EVENT_HEADER.size + length
+                if wd in self._directories:
+                    paths.add(os.path.join(self._directories[wd], os.fsdecode(name)))
+
+    def wait(self, timeout):
+        """Waits up to `timeout` seconds for events; returns the changed paths."""
+        ready, _, _ = select.select([self._fd], [], [], timeout)
+        return self.read_events() if ready else set()
+
+    def activity(self, had_data):
+        pass
+
+    def close(self):
+        os.close(self._fd)
+
+class PollingWatcher:
+    """
+    Portable fallback: sleeps between checks, backing off exponentially
+    while files are idle and snapping back as soon as data arrives.
+    """
+
+    def __init__(self, min_interval=0.01, max_interval=1.0):
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.interval = min_interval
+
+    def add(self, path):
+        pass
+
+    def fileno(self):
+        return None
+
+    def backoff(self):
+        """Returns how long to sleep now and doubles the next interval."""
+        interval = self.interval
+        self.interval = min(self.interval * 2, self.max_interval)
+        return interval
+
+    def wait(self, timeout):
+        time.sleep(min(self.backoff(), timeout))
+        return None # Unknown; callers re-check every file
+
+    def activity(self, had_data):
+        if had_data:
+            self.interval = self.min_interval
+
+    def close(self):
+        pass
+
+def make_watcher():
+    """Returns an InotifyWatcher on Linux, else a PollingWatcher."""
+    if sys.platform.startswith('linux'):
+        try:
+            return InotifyWatcher()
+        except (OSError, AttributeError):
+            pass
+    return PollingWatcher()
+
+async def tail_many(patterns, on_lines, from_start=False, recheck_interval=5.0, turn_bytes=TURN_BYTES,
+                    checkpoints=None):
+    """
+    Tails every file matching `patterns` (paths or globs) from one asyncio
+    loop and calls on_lines(path, lines) as lines arrive. The inotify
+    descriptor is registered with loop.add_reader(), so an idle agent sleeps
+    in the event loop. Ready files are served round-robin, at most
+    `turn_bytes` each per turn. Files that later appear under a glob are
+    picked up and read from the start. Files are told apart by (st_dev,
+    st_ino), so a rotated copy of a tailed log (auth.log.1 under auth.log*)
+    is never read a second time; compressed rotations are skipped. Returns
+    if no file matches at all. With a CheckpointStore, files resume from
+    their checkpoints and each file's position is recorded after
+    on_lines() returns for it.
+    """
+    loop = asyncio.get_running_loop()
+    watcher = make_watcher()
+    globs = [os.path.abspath(p) for p in patterns if glob.has_magic(p)]
+    tailers, ready = {}, set()
+    # (st_dev, st_ino) of every file a tailer has opened, rotated ones included.
+    seen = set()
+
+    def known(dev, ino):
+        return (dev, ino) in seen
+    wakeup = asyncio.Event()
+    last_discover = loop.time()
+
+    def discover(new_files_from_start):
+        for pattern in patterns:
+            matches = sorted(glob.glob(pattern)) if glob.has_magic(pattern) else [pattern]
+            for path in matches:
+                key = os.path.abspath(path)
+                if key in tailers or path.endswith(COMPRESSED_SUFFIXES):
+                    continue
+                try:
+                    st = os.stat(path)
+                except OSError:
+                    continue
+                if not stat.S_ISREG(st.st_mode) or (st.st_dev, st.st_ino) in seen:
+                    continue
+                try:
+                    checkpoint = checkpoints.get(key) if checkpoints else None
+                    tailer = LogTailer(path, new_files_from_start, checkpoint, known)
+                except OSError:
+                    continue # Unreadable (or gone already); retried on the next recheck
+                tailers[key] = tailer
+                seen.add((tailer.dev, tailer.ino))
+                watcher.add(path)
+                ready.add(key)
+        # Watch glob directories even before anything in them matches.
+        for pattern in globs:
+            if not glob.has_magic(os.path.dirname(pattern)) and os.path.isdir(os.path.dirname(pattern)):
+                watcher.add(pattern)
+
+    def on_events():
+        changed = watcher.read_events()
+        ready.update(path for path in changed if path in tailers)
+        if any(path not in tailers and any(fnmatch.fnmatch(path, g) for g in globs) for path in changed):
+            discover(True)
+        if ready:
+            wakeup.set()
+
+    discover(from_start)
+    if not tailers:
+        watcher.close()
+        return
+    fd = watcher.fileno()
+    if fd is not None:
+        loop.add_reader(fd, on_events)
+    try:
+        while True:
+            if not ready:
+                wakeup.clear()
+                timeout = recheck_interval
+                if checkpoints:
+                    checkpoints.maybe_flush()
+                    due = checkpoints.due_in()
+                    if due is not None:
+                        timeout = min(timeout, due)
+                if fd is None:
+                    await asyncio.sleep(min(watcher.backoff(), timeout))
+                    ready.update(tailers)
+                    if loop.time() - last_discover >= recheck_interval:
+                        last_discover = loop.time()
+                        discover(True)
+                else:
+                    try:
+                        await asyncio.wait_for(wakeup.wait(), timeout)
+                    except asyncio.TimeoutError:
+                        # Safety net for missed events (e.g. NFS); also finds new files.
+                        ready.update(tailers)
+                        discover(True)
+                continue
+
+            had_data = False
+            for key in sorted(ready):
+                tailer = tailers[key]
+                lines = tailer.read_lines(turn_bytes)
+                seen.add((tailer.dev, tailer.ino))
+                if not tailer.more:
+                    ready.discard(key)
+                if lines:
+                    had_data = True
+                    on_lines(tailer.path, lines)
+                    if checkpoints:
+                        checkpoints.record(tailer)
+                if tailer.done:
+                    # Its path now holds a file another tailer has read.
+                    tailer.close()
+                    del tailers[key]
+                    if checkpoints:
+                        checkpoints.forget(key)
+                # Let the loop handle inotify events between files.
+                await asyncio.sleep(0)
+            watcher.activity(had_data)
+            if checkpoints:
+                checkpoints.maybe_flush()
+    finally:
+        if fd is not None:
+            loop.remove_reader(fd)
+        for tailer in tailers.values():
+            tailer.close()
+        watcher.close()
+        if checkpoints:
+            checkpoints.flush()
@@ -0,0 +1,83 @@
+import os
+import time
+
+from flask import Response, g, request
+from prometheus_client import (
+    CONTENT_TYPE_LATEST, CollectorRegistry, Counter, Gauge, Histogram, REGISTRY, generate_latest,
+)
+from prometheus_client import multiprocess
+
+# With PROMETHEUS_MULTIPROC_DIR set (see gunicorn.conf.py), every worker
+# writes its samples to mmap'd files in that directory and /metrics merges
+# them, so a scrape that lands on any worker sees the whole pod.
+MULTIPROCESS = 'PROMETHEUS_MULTIPROC_DIR' in os.environ
+
+LATENCY_BUCKETS = (.0005, .001, .0025, .005, .01, .025, .05, .1, .25, .5, 1, 2.5, 5, 10)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216)
+
+REQUESTS = Counter(
+    'train_schedule_http_requests_total', 'HTTP requests handled.',
+    ['method', 'route', 'status'],
+)
+IN_PROGRESS = Gauge(
+    'train_schedule_http_requests_in_progress', 'HTTP requests currently being handled.',
+    multiprocess_mode='livesum',
+)
+LATENCY = Histogram(
+    'train_schedule_http_request_duration_seconds', 'Time to produce the response (first byte for streams).',
+    ['route', 'status'], buckets=LATENCY_BUCKETS,
+)
+RESPONSE_SIZE = Histogram(
+    'train_schedule_http_response_size_bytes', 'Response body size (streamed responses excluded).',
+    ['route', 'status'], buckets=SIZE_BUCKETS,
+)
+CACHE_LOOKUPS = Counter(
+    'train_schedule_cache_lookups_total', 'Cache lookups by result.',
+    ['cache', 'result'],
+)
+
+def cache_lookup_recorder(cache_name):
+    """Returns an on_lookup callback for ResponseCache that counts hits and misses."""
+    hit = CACHE_LOOKUPS.labels(cache_name, 'hit')
+    miss = CACHE_LOOKUPS.labels(cache_name, 'miss')
+    return lambda found: (hit if found else miss).inc()
+
+def _route():
+    # Label by the matched rule, never the raw path, to bound cardinality.
+    rule = request.url_rule
+    return rule.rule if rule is not None else 'unmatched'
+
+def _before_request():
+    g.metrics_start = time.perf_counter()
+    g.metrics_in_progress = True
+    IN_PROGRESS.inc()
+
+def _after_request(response):
+    start = g.pop('metrics_start', None)
+    if start is None:
+        return response
+    route, status = _route(), str(response.status_code)
+    REQUESTS.labels(request.method, route, status).inc()
+    LATENCY.labels(route, status).observe(time.perf_counter() - start)
+    if not response.is_streamed and response.content_length is not None:
+        RESPONSE_SIZE.labels(route, status).observe(response.content_length)
+    return response
+
+def _teardown_request(exc):
+    if g.pop('metrics_in_progress', False):
+        IN_PROGRESS.dec()
+
+def metrics_view():
+    if MULTIPROCESS:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return Response(generate_latest(registry), content_type=CONTENT_TYPE_LATEST)
+
+def init_app(app):
+    """Instruments every request on `app` and serves /metrics."""
+    app.before_request(_before_request)
+    app.after_request(_after_request)
+    app.teardown_request(_teardown_request)
+    app.add_url_rule('/metrics', 'metrics', metrics_view)
@@ -0,0 +1,294 @@
+import argparse
+import json
+import logging
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from aws_rate_limit import call_with_backoff, client_config
+
+DEFAULT_WORKERS = 32
+# One suffix-range GET of this many bytes usually holds a file's whole
+# footer; larger footers take a second ranged GET.
+TAIL_BYTES = 64 * 1024
+PARQUET_MAGIC = b'PAR1'
+# Checks queued per worker; listing waits for results beyond this, so a
+# huge export never holds a future for every file at once.
+QUEUED_PER_WORKER = 4
+# A table's data files may differ from the manifest's sizeGB by this
+# fraction, and always by SIZE_SLACK_BYTES (sizeGB is rounded).
+SIZE_TOLERANCE = 0.1
+SIZE_SLACK_BYTES = 16 * 1024 * 1024
+
+# An RDS snapshot export under s3://bucket/[prefix/]<export task id>/:
+#   export_info_<id>.json                        the task summary
+#   export_tables_info_<id>_from_<a>_to_<b>.json "perTableStatus": [{"target":
+#                                                "db.schema.table", "status", ...}]
+#   <database>/<schema.table or db.table>/<partition>/part-*.parquet
+# Data files are checked as the listing pages arrive; nothing is ever
+# downloaded beyond the manifests and each file's footer.
+
+# Thrift compact protocol types (Parquet footers are FileMetaData structs).
+_BOOL_TRUE, _BOOL_FALSE, _BYTE, _I16, _I32, _I64, _DOUBLE, _BINARY, _LIST, _SET, _MAP, _STRUCT = range(1, 13)
+
+class _CompactReader:
+    def __init__(self, data):
+        self.data = data
+        self.pos = 0
+
+    def varint(self):
+        result = shift = 0
+        while True:
+            byte = self.data[self.pos]
+            self.pos += 1
+            result |= (byte & 0x7f) << shift
+            if not byte & 0x80:
+                return result
+            shift += 7
+
+    def zigzag(self):
+        n = self.varint()
+        return (n >> 1) ^ -(n & 1)
+
+    def fields(self):
+        """Yields (field id, type) of a struct; the caller reads or skip()s each value."""
+        field_id = 0
+        while True:
+            header = self.data[self.pos]
+            self.pos += 1
+            if header == 0:
+                return
+            delta, field_type = header >> 4, header & 0x0f
+            field_id = field_id + delta if delta else self.zigzag()
+            yield field_id, field_type
+
+    def list_header(self):
+        header = self.data[self.pos]
+        self.pos += 1
+        size = header >> 4
+        if size == 15:
+            size = self.varint()
+        return size, header & 0x0f
+
+    def skip(self, value_type, in_collection=False):
+        if value_type in (_BOOL_TRUE, _BOOL_FALSE):
+            self.pos += 1 if in_collection else 0
+        elif value_type == _BYTE:
+            self.pos += 1
+        elif value_type in (_I16, _I32, _I64):
+            self.varint()
+        elif value_type == _DOUBLE:
+            self.pos += 8
+        elif value_type == _BINARY:
+            length = self.varint()
+            self.pos += length
+        elif value_type in (_LIST, _SET):
+            size, element_type = self.list_header()
+            for _ in range(size):
+                self.skip(element_type, True)
+        elif value_type == _MAP:
+            size = self.varint()
+            if size:
+                types = self.data[self.pos]
+                self.pos += 1
+                for _ in range(size):
+                    self.skip(types >> 4, True)
+                    self.skip(types & 0x0f, True)
+        elif value_type == _STRUCT:
+            for _, field_type in self.fields():
+                self.skip(field_type)
+        else:
+            raise ValueError(f"unknown thrift type {value_type}")
+
+def parquet_footer_rows(footer):
+    """Returns (num_rows, [num_rows of each row group]) from a serialized FileMetaData."""
+    reader = _CompactReader(footer)
+    num_rows, group_rows = None, []
+    for field_id, field_type in reader.fields():
+        if field_id == 3 and field_type == _I64:
+            num_rows = reader.zigzag()
+        elif field_id == 4 and field_type == _LIST:
+            size, _ = reader.list_header()
+            for _ in range(size):
+                rows = None
+                for group_field, group_type in reader.fields():
+                    if group_field == 3 and group_type == _I64:
+                        rows = reader.zigzag()
+                    else:
+                        reader.skip(group_type)
+                group_rows.append(rows)
+        else:
+            reader.skip(field_type)
+    return num_rows, group_rows
+
+def _ranged_get(s3_client, bucket, key, byte_range):
+    response = call_with_backoff(s3_client.get_object, Bucket=bucket, Key=key, Range=f"bytes={byte_range}")
+    return response['Body'].read()
+
+def check_parquet_object(s3_client, bucket, key, size):
+    """Checks one data file from its footer alone; returns {key, bytes, rows, seconds, problems}."""
+    started = time.monotonic()
+    result = {'key': key, 'bytes': size, 'rows': None, 'problems': []}
+    try:
+        if size < 2 * len(PARQUET_MAGIC) + 4:
+            result['problems'].append(f"too small to be Parquet ({size} bytes)")
+            return result
+        tail = _ranged_get(s3_client, bucket, key, f"-{min(size, TAIL_BYTES)}")
+        footer_length = int.from_bytes(tail[-8:-4], 'little')
+        if tail[-4:] != PARQUET_MAGIC:
+            result['problems'].append("missing the PAR1 trailer")
+        elif footer_length + 8 + len(PARQUET_MAGIC) > size:
+            result['problems'].append(f"footer length {footer_length} exceeds the file")
+        else:
+            if footer_length + 8 <= len(tail):
+                footer = tail[-8 - footer_length:-8]
+            else:
+                footer = _ranged_get(s3_client, bucket, key, f"{size - 8 - footer_length}-{size - 9}")
+            rows, group_rows = parquet_footer_rows(footer)
+            result['rows'] = rows
+            if rows is None or rows < 0:
+                result['problems'].append(f"invalid row count {rows}")
+            elif None in group_rows or sum(group_rows) != rows:
+                result['problems'].append(f"row groups hold {sum(r or 0 for r in group_rows)} rows, "
+                                          f"footer says {rows}")
+    except (IndexError, ValueError) as e:
+        result['problems'].append(f"unreadable footer: {e}")
+    except Exception as e:
+        result['problems'].append(f"could not read: {e}")
+    finally:
+        result['seconds'] = time.monotonic() - started
+    return result
+
+def list_export(s3_client, bucket, root):
+    """Yields {Key, Size} of every object under `root`, one list_objects_v2 page at a time."""
+    request = {'Bucket': bucket, 'Prefix': root}
+    while True:
+        response = call_with_backoff(s3_client.list_objects_v2, **request)
+        yield from response.get('Contents', [])
+        if not response.get('IsTruncated'):
+            return
+        request['ContinuationToken'] = response['NextContinuationToken']
+
+def _table_dir(root, key):
+    """'<database>/<table dir>' of a data file key, or None for files outside one."""
+    parts = key[len(root):].split('/')
+    return '/'.join(parts[:2]) if len(parts) >= 3 else None
+
+def _manifest_dirs(target):
+    database, _, rest = target.partition('.')
+    # PostgreSQL exports use <db>/<schema.table>, MySQL ones <db>/<db.table>.
+    return (f"{database}/{rest}", f"{database}/{target}")
+
+def verify_export(s3_client, bucket, export_task_identifier, s3_prefix='', workers=DEFAULT_WORKERS):
+    """
+    Checks an export's files against its manifest: every table the
+    manifest reports is COMPLETE and has data files, every data file is
+    readable Parquet whose row groups add up to its row count, each
+    table's files add up to its sizeGB, and no table appears that the
+    manifest does not list. Files are checked on `workers` threads sharing
+    `s3_client`, with at most QUEUED_PER_WORKER checks per worker in
+    flight. Returns the report dict.
+    """
+    started = time.monotonic()
+    root = f"{s3_prefix.strip('/')}/{export_task_identifier}/".lstrip('/')
+    manifests, files, pending = [], [], set()
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        for obj in list_export(s3_client, bucket, root):
+            name = obj['Key'][len(root):]
+            if '/' not in name and name.startswith('export_tables_info_') and name.endswith('.json'):
+                manifests.append(obj['Key'])
+            elif name.endswith('.parquet'):
+                if len(pending) >= workers * QUEUED_PER_WORKER:
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    files.extend(future.result() for future in done)
+                pending.add(pool.submit(check_parquet_object, s3_client, bucket, obj['Key'], obj['Size']))
+        files.extend(future.result() for future in wait(pending).done)
+    files.sort(key=lambda result: result['key'])
+
+    by_dir = {}
+    for result in files:
+        by_dir.setdefault(_table_dir(root, result['key']), []).append(result)
+    problems, tables = [], []
+    if not manifests:
+        problems.append(f"no export_tables_info manifest under s3://{bucket}/{root}")
+    for key in sorted(manifests):
+        body = call_with_backoff(s3_client.get_object, Bucket=bucket, Key=key)['Body'].read()
+        for entry in json.loads(body).get('perTableStatus', []):
+            size_gb = entry.get('sizeGB')
+            table = {'target': entry['target'], 'status': entry.get('status'), 'files': 0, 'bytes': 0,
+                     'manifest_bytes': round(size_gb * 2 ** 30) if isinstance(size_gb, (int, float)) else None,
+                     'rows': 0, 'seconds': 0.0, 'problems': []}
+            table_files = []
+            for directory in _manifest_dirs(entry['target']):
+                table_files.extend(by_dir.pop(directory, []))
+            if table['status'] != 'COMPLETE':
+                table['problems'].append(f"manifest status is {table['status']}")
+            if not table_files and entry.get('sizeGB', 0):
+                table['problems'].append("no data files")
+            for result in table_files:
+                table['files'] += 1
+                table['bytes'] += result['bytes']
+                table['rows'] += result['rows'] or 0
+                table['seconds'] += result['seconds']
+                table['problems'].extend(f"{result['key']}: {problem}" for problem in result['problems'])
+            expected = table['manifest_bytes']
+            if (table_files and expected is not None
+                    and abs(table['bytes'] - expected) > max(expected * SIZE_TOLERANCE, SIZE_SLACK_BYTES)):
+                table['problems'].append(f"data files hold {table['bytes']} bytes, manifest says "
+                                         f"{entry['sizeGB']} GB ({expected} bytes)")
+            table['seconds'] = round(table['seconds'], 3)
+            tables.append(table)
+    for directory, stray in sorted(by_dir.items(), key=lambda item: item[0] or ''):
+        where = f"{directory}/" if directory else "outside any table directory"
+        problems.append(f"{len(stray)} data file(s) in {where} not listed in the manifest")
+
+    return {
+        'export_task_identifier': export_task_identifier,
+        'location': f"s3://{bucket}/{root}",
+        'ok': not problems and all(not table['problems'] for table in tables),
+        'files': len(files),
+        'bytes': sum(result['bytes'] for result in files),
+        'rows': sum(result['rows'] or 0 for result in files),
+        'seconds': round(time.monotonic() - started, 3),
+        'problems': problems,
+        'tables': tables,
+    }
+
+def log_verification(report):
+    for table in report['tables']:
+        outcome = 'ok' if not table['problems'] else f"{len(table['problems'])} problem(s)"
+        logging.info(f"  {table['target']}: {table['files']} file(s), {table['bytes']} bytes, "
+                     f"{table['rows']} rows, {table['seconds']:.1f}s of checks, {outcome}")
+        for problem in table['problems'][:5]:
+            logging.error(f"    {problem}")
+    for problem in report['problems']:
+        logging.error(f"  {problem}")
+    verdict = "verified" if report['ok'] else "FAILED verification"
+    logging.info(f"Export '{report['export_task_identifier']}' {verdict}: {len(report['tables'])} table(s), "
+                 f"{report['files']} file(s), {report['bytes']} bytes in {report['seconds']:.1f}s.")
+
+def main():
+    parser = argparse.ArgumentParser(description="Verify the files of an RDS snapshot export in S3.")
+    parser.add_argument("--region", help="AWS region of the bucket")
+    parser.add_argument("--s3-bucket-name", required=True, help="Bucket the snapshot was exported to")
+    parser.add_argument("--export-task-identifier", required=True, help="The export task to verify")
+    parser.add_argument("--s3-prefix", default="", help="S3Prefix the export task was started with, if any")
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS,
+                        help=f"Files checked in parallel (default: {DEFAULT_WORKERS})")
+    parser.add_argument("--report", help="Also write the JSON report to this file")
+    args = parser.parse_args()
+
+    import boto3
+    s3_client = boto3.client('s3', region_name=args.region, config=client_config(args.workers))
+    report = verify_export(s3_client, args.s3_bucket_name, args.export_task_identifier, args.s3_prefix, args.workers)
+    log_verification(report)
+    if args.report:
+        with open(args.report, 'w') as f:
+            json.dump(report, f, indent=2)
+        logging.info(f"Verification report written to {args.report}")
+    if not report['ok']:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    main()
@@ -1,150 +1,73 @@
-# Automated Database Backup: AWS RDS to S3
-
-This project provides a Python script and detailed instructions to automate the process of taking an AWS RDS snapshot and then exporting it to an S3 bucket for long-term retention, analytics, or disaster recovery.
-
-## Table of Contents
-
-- [Introduction](#introduction)
-- [Architecture Overview](#architecture-overview)
-- [Detailed Workflow](#detailed-workflow)
-- [Prerequisites](#prerequisites)
-- [IAM Role Setup for RDS Export](#iam-role-setup-for-rds-export)
-- [KMS Key Policy (if using KMS)](#kms-key-policy-if-using-kms)
-- [Python Script (`rds_s3_backup.py`)](#python-script-rds_s3_backup.py)
-- [How to Use](#how-to-use)
-- [Diagrams](#diagrams)
-- [Contributing](#contributing)
-- [License](#license)
-
-## Introduction
-
-Regular database backups are critical for data recovery and business continuity. AWS RDS provides automated backups and manual snapshots. For long-term archival, cross-region replication, or integration with other data lakes, exporting these snapshots to S3 is a common and highly recommended practice. This solution automates that export process.
-
-## Architecture Overview
-
-*(Diagram Placeholder: A high-level diagram showing the flow. Nodes: RDS DB Instance, AWS Lambda (running the Python script), S3 Bucket, KMS Key, IAM Role. Arrows: Lambda triggers RDS snapshot, RDS exports snapshot to S3 using IAM Role and KMS Key.)*
-
-## Detailed Workflow
-
-*(Diagram Placeholder: A more detailed sequence diagram or flowchart showing the steps.)*
-
-**Description of Diagram:**
-
-1.  **Trigger:** The Python script (executed by Lambda/Cron) is initiated.
-2.  **Script calls RDS API:** The script sends a request to RDS to create a manual snapshot of the specified DB instance.
-3.  **RDS creates Snapshot:** RDS performs the snapshot operation.
-4.  **Script polls Snapshot Status:** The script continuously checks the status of the snapshot until it becomes `available`.
-5.  **Script calls RDS Export API:** Once the snapshot is `available`, the script initiates an export task from RDS to S3, specifying the S3 bucket, IAM role, and KMS key.
-6.  **RDS exports to S3:** RDS streams the snapshot data to the designated S3 bucket, encrypted using the KMS key.
-7.  **Script monitors Export Status:** The script monitors the export task until it completes (`COMPLETED` or `FAILED`).
-8.  **Completion/Failure:** The script logs the outcome.
-
-## Prerequisites
-
-1.  **AWS Account:** An active AWS account.
-2.  **AWS CLI Configured:** Ensure your AWS CLI is configured with credentials that have permissions to create/manage RDS snapshots, S3 buckets, IAM roles, and KMS keys.
-3.  **`boto3`:** The AWS SDK for Python. Install it: `pip install boto3`.
-4.  **Existing RDS DB Instance:** The database you wish to back up.
-5.  **Existing S3 Bucket:** The S3 bucket where snapshots will be exported.
-6.  **AWS KMS Key (Optional but Recommended):** A Customer Master Key (CMK) in AWS KMS for encrypting the exported data in S3.
-7.  **IAM Role for RDS Export:** A dedicated IAM role that RDS can assume to perform the export.
-
-## IAM Role Setup for RDS Export
-
-This is crucial. RDS needs permission to write to your S3 bucket and use your KMS key.
-
-1.  **Create IAM Policy (`rds-s3-export-policy.json`):**
-    ```json
-    {
-        "Version": "2012-10-17",
-        "Statement": [
-            {
-                "Effect": "Allow",
-                "Action": [
-                    "s3:PutObject",
-                    "s3:ListBucket",
-                    "s3:GetObject",
-                    "s3:DeleteObject"
-                ],
-                "Resource": [
-                    "arn:aws:s3:::your-backup-bucket-name",
-                    "arn:aws:s3:::your-backup-bucket-name/*"
-                ]
-            },
-            {
-                "Effect": "Allow",
-                "Action": [
-                    "kms:Encrypt",
-                    "kms:Decrypt",
-                    "kms:ReEncrypt*",
-                    "kms:GenerateDataKey*",
-                    "kms:DescribeKey"
-                ],
-                "Resource": "arn:aws:kms:your-region:your-account-id:key/your-kms-key-id"
-            }
-        ]
-    }
-    ```
-    *   Replace `your-backup-bucket-name`, `your-region`, `your-account-id`, and `your-kms-key-id` with your actual values.
-2.  **Create IAM Role:**
-    *   Go to AWS IAM Console -> Roles -> Create role.
-    *   **Trusted entity type:** `AWS service`.
-    *   **Use case:** `RDS`.
-    *   **Permissions:** Attach the policy you just created.
-    *   **Role name:** `RDS-S3-Export-Role` (or a descriptive name).
-    *   Note down the **Role ARN**.
-
-## KMS Key Policy (if using KMS)
-
-If you use a KMS key, its key policy must allow the `rds.amazonaws.com` service principal to use it for encryption.
-
-1.  Go to AWS KMS Console -> Customer managed keys.
-2.  Select your key.
-3.  Go to the **Key policy** tab.
-4.  Add a statement similar to this (replace `your-account-id` and `your-kms-key-id`):
-    ```json
-    {
-        "Sid": "Allow RDS to use KMS key for S3 export",
-        "Effect": "Allow",
-        "Principal": {
-            "Service": "rds.amazonaws.com"
-        },
-        "Action": [
-            "kms:Encrypt",
-            "kms:Decrypt",
-            "kms:ReEncrypt*",
-            "kms:GenerateDataKey*",
-            "kms:DescribeKey"
-        ],
-        "Resource": "arn:aws:kms:your-region:your-account-id:key/your-kms-key-id"
-    }
-    ```
-
-## Python Script (`rds_s3_backup.py`)
-
-```python
-import boto3
 import datetime
 import time
 import argparse
+import json
 import logging
+import os
+import random
 import sys
 
+from botocore.exceptions import BotoCoreError, ClientError
+
+from aws_rate_limit import TokenBucket, call_with_backoff, client_config
+
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
-def get_rds_client(region):
+SNAPSHOT_TIMESTAMP_FORMAT = "%Y%m%d-%H%M%S"
+SNAPSHOT_PENDING_STATES = ['creating', 'backing-up', 'restoring', 'modifying']
+# describe_export_tasks reports COMPLETE; COMPLETED is accepted as well.
+EXPORT_DONE_STATES = ['COMPLETE', 'COMPLETED']
+EXPORT_PENDING_STATES = ['CREATING', 'STARTING', 'IN_PROGRESS', 'CANCELING', 'CANCELLING']
+
+# Multi-instance mode (backup_instances). RDS allows five snapshot exports
+# in progress per account; manual snapshots count against an account quota
+# read from describe_account_attributes.
+MAX_CONCURRENT_EXPORTS = 5
+DEFAULT_MAX_CONCURRENT_SNAPSHOTS = 10
+RDS_API_TPS = 5
+# Identifiers per describe_* filter, and records per page.
+STATUS_FILTER_BATCH = 50
+DESCRIBE_PAGE_SIZE = 100
+POLL_MIN_INTERVAL = 15 # seconds
+POLL_MAX_INTERVAL = 300
+
+# Clients and the account ID live for the whole process, which in Lambda
+# means across the invocations a warm container serves. boto3 is imported
+# on first use rather than at module load, keeping the cold-start init short.
+_clients = {}
+_account_id = None
+
+def get_client(service, region=None, config=None):
+    """Returns the cached client for (service, region); `config` applies when it is first created."""
+    key = (service, region)
+    if key not in _clients:
+        import boto3
+        _clients[key] = boto3.client(service, region_name=region, config=config)
+    return _clients[key]
+
+def get_account_id():
+    global _account_id
+    if _account_id is None:
+        _account_id = get_client('sts').get_caller_identity()['Account']
+    return _account_id
+
+def get_rds_client(region, config=None):
     """Initializes and returns an RDS client."""
     try:
-        return boto3.client('rds', region_name=region)
+        return get_client('rds', region, config)
     except Exception as e:
         logging.error(f"Failed to initialize RDS client: {e}")
         sys.exit(1)
 
+def snapshot_identifier_for(snapshot_id_prefix, now=None):
+    """Returns '{prefix}-{timestamp}', the identifier of a snapshot taken `now`."""
+    timestamp = (now or datetime.datetime.now()).strftime(SNAPSHOT_TIMESTAMP_FORMAT)
+    return f"{snapshot_id_prefix}-{timestamp}"
+
 def create_rds_snapshot(rds_client, db_instance_identifier, snapshot_id_prefix):
     """ Creates a manual RDS snapshot and returns its ARN. """
-    timestamp = datetime.datetime.now().strftime("%Y%m%d-%H%M%S")
-    snapshot_identifier = f"{snapshot_id_prefix}-{timestamp}"
+    snapshot_identifier = snapshot_identifier_for(snapshot_id_prefix)
     logging.info(f"Attempting to create snapshot '{snapshot_identifier}' for DB instance '{db_instance_identifier}'...")
 
     try:
@@ -177,7 +100,7 @@ def wait_for_snapshot_available(rds_client, snapshot_identifier, timeout_minutes
             if status == 'available':
                 logging.info(f"Snapshot '{snapshot_identifier}' is now available.")
                 return True
-            elif status in ['creating', 'backing-up', 'restoring', 'modifying']:
+            elif status in SNAPSHOT_PENDING_STATES:
                 time.sleep(poll_interval_seconds)
             else:
                 logging.error(f"Snapshot '{snapshot_identifier}' entered an unexpected state: {status}")
@@ -189,22 +112,32 @@ def wait_for_snapshot_available(rds_client, snapshot_identifier, timeout_minutes
             logging.error(f"Error describing snapshot '{snapshot_identifier}': {e}")
             sys.exit(1)
 
+def export_task_params(region, account_id, snapshot_identifier, s3_bucket_name, iam_role_arn, kms_key_arn=None):
+    """Returns the start_export_task parameters for exporting one snapshot."""
+    params = {
+        'ExportTaskIdentifier': f"export-{snapshot_identifier}",
+        'SourceArn': f"arn:aws:rds:{region}:{account_id}:snapshot:{snapshot_identifier}",
+        'S3BucketName': s3_bucket_name,
+        'IamRoleArn': iam_role_arn,
+    }
+    if kms_key_arn:
+        params['KmsKeyId'] = kms_key_arn # Otherwise S3 encryption or the bucket default applies
+    return params
+
 def export_snapshot_to_s3(rds_client, snapshot_identifier, s3_bucket_name, iam_role_arn, kms_key_arn=None):
     """ Exports an RDS snapshot to an S3 bucket. """
     export_task_identifier = f"export-{snapshot_identifier}"
     logging.info(f"Attempting to export snapshot '{snapshot_identifier}' to S3 bucket '{s3_bucket_name}'...")
 
     try:
-        params = {
-            'ExportTaskIdentifier': export_task_identifier,
-            'SourceArn': f"arn:aws:rds:{rds_client.meta.region_name}:{boto3.client('sts').get_caller_identity()['Account']}:snapshot:{snapshot_identifier}",
-            'S3BucketName': s3_bucket_name,
-            'IamRoleArn': iam_role_arn,
-            'KmsKeyId': kms_key_arn if kms_key_arn else 'aws/rds' # Use default RDS KMS if not specified
-        }
-        if not kms_key_arn:
-            del params['KmsKeyId'] # Remove if not provided to use default S3 encryption or bucket default
-
+        params = export_task_params(
+            rds_client.meta.region_name,
+            get_account_id(),
+            snapshot_identifier,
+            s3_bucket_name,
+            iam_role_arn,
+            kms_key_arn
+        )
         response = rds_client.start_export_task(**params)
         logging.info(f"Export task '{export_task_identifier}' initiated. Status: {response['Status']}")
         return export_task_identifier
@@ -227,14 +160,14 @@ def wait_for_export_completion(rds_client, export_task_identifier, timeout_minut
             response = rds_client.describe_export_tasks(ExportTaskIdentifier=export_task_identifier)
             status = response['ExportTasks'][0]['Status']
             logging.info(f"Export task '{export_task_identifier}' status: {status}")
-            if status == 'COMPLETED':
+            if status in EXPORT_DONE_STATES:
                 logging.info(f"Export task '{export_task_identifier}' completed successfully.")
                 return True
             elif status == 'FAILED':
                 failure_cause = response['ExportTasks'][0].get('FailureCause', 'Unknown')
                 logging.error(f"Export task '{export_task_identifier}' failed. Cause: {failure_cause}")
                 sys.exit(1)
-            elif status in ['CREATING', 'STARTING', 'IN_PROGRESS', 'CANCELLING']:
+            elif status in EXPORT_PENDING_STATES:
                 time.sleep(poll_interval_seconds)
             else:
                 logging.error(f"Export task '{export_task_identifier}' entered an unexpected state: {status}")
@@ -246,13 +179,476 @@ def wait_for_export_completion(rds_client, export_task_identifier, timeout_minut
             logging.error(f"Error describing export task '{export_task_identifier}': {e}")
             sys.exit(1)
 
+class BackupJob:
+    """
+    One instance's progress in backup_instances(): pending -> snapshotting
+    -> snapshot_ready -> exporting -> completed, or failed (with `error`)
+    from any of them. Each waiting state has a deadline; snapshot_ready's
+    is how long the job may wait for an export slot.
+    """
+
+    def __init__(self, db_instance_identifier, snapshot_identifier):
+        self.db_instance_identifier = db_instance_identifier
+        self.snapshot_identifier = snapshot_identifier
+        self.export_task_identifier = f"export-{snapshot_identifier}"
+        self.state = 'pending'
+        self.error = None
+        self.deadline = None
+        self.started = None
+        self.finished = None
+
+    def advance(self, state, now, timeout_minutes=None):
+        logging.info(f"[{self.db_instance_identifier}] {self.state} -> {state}")
+        self.state = state
+        self.deadline = now + timeout_minutes * 60 if timeout_minutes else None
+        if state == 'completed':
+            self.finished = now
+
+    def fail(self, error, now):
+        logging.error(f"[{self.db_instance_identifier}] Backup failed while {self.state}: {error}")
+        self.state, self.error, self.finished = 'failed', str(error), now
+
+    def summary(self):
+        return {
+            'db_instance_identifier': self.db_instance_identifier,
+            'snapshot_identifier': self.snapshot_identifier,
+            'export_task_identifier': self.export_task_identifier,
+            'state': self.state,
+            'error': self.error,
+            'seconds': round(self.finished - self.started, 1) if self.started and self.finished else None,
+        }
+
+def describe_all(method, key, bucket=None, **kwargs):
+    """Returns the `key` items of every page of an RDS describe_* call, following Marker."""
+    items = []
+    while True:
+        response = call_with_backoff(method, bucket, MaxRecords=DESCRIBE_PAGE_SIZE, **kwargs)
+        items.extend(response[key])
+        if not response.get('Marker'):
+            return items
+        kwargs['Marker'] = response['Marker']
+
+def describe_filtered(method, key, filter_name, values, bucket=None, **kwargs):
+    """describe_all() filtered on `values`, STATUS_FILTER_BATCH of them per call."""
+    items = []
+    for start in range(0, len(values), STATUS_FILTER_BATCH):
+        batch = values[start:start + STATUS_FILTER_BATCH]
+        items.extend(describe_all(method, key, bucket, Filters=[{'Name': filter_name, 'Values': batch}], **kwargs))
+    return items
+
+def active_exports(rds_client, bucket=None):
+    """Number of exports in progress in the account, ours included."""
+    tasks = describe_filtered(rds_client.describe_export_tasks, 'ExportTasks', 'status',
+                              ['starting', 'in_progress'], bucket)
+    return sum(1 for task in tasks if task['Status'].upper() in ('STARTING', 'IN_PROGRESS'))
+
+class StatusPoller:
+    """
+    Status checks for every in-flight snapshot and export of a
+    backup_instances() run: one filtered, paginated describe call per
+    STATUS_FILTER_BATCH identifiers, however many instances are in flight.
+    next_wait() adapts the polling interval: back to `min_interval` after a
+    poll that saw a status change, 1.5x longer (up to `max_interval`) after
+    one that did not, with +-20% jitter so that concurrent runs spread out.
+    """
+
+    def __init__(self, rds_client, bucket=None, min_interval=POLL_MIN_INTERVAL, max_interval=POLL_MAX_INTERVAL,
+                 rng=random):
+        self.rds_client = rds_client
+        self.bucket = bucket
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.interval = min_interval
+        self.rng = rng
+
+    def _filtered(self, method, key, filter_name, values):
+        return describe_filtered(method, key, filter_name, values, self.bucket)
+
+    def snapshot_statuses(self, snapshot_identifiers):
+        """Returns {snapshot identifier: status}; snapshots not found yet are left out."""
+        snapshots = self._filtered(self.rds_client.describe_db_snapshots, 'DBSnapshots', 'db-snapshot-id',
+                                   snapshot_identifiers)
+        return {snapshot['DBSnapshotIdentifier']: snapshot['Status'] for snapshot in snapshots}
+
+    def export_tasks(self, export_task_identifiers):
+        """Returns {export task identifier: task description}."""
+        tasks = self._filtered(self.rds_client.describe_export_tasks, 'ExportTasks', 'export-task-identifier',
+                               export_task_identifiers)
+        return {task['ExportTaskIdentifier']: task for task in tasks}
+
+    def active_exports(self):
+        return active_exports(self.rds_client, self.bucket)
+
+    def next_wait(self, changed):
+        if changed:
+            self.interval = self.min_interval
+        else:
+            self.interval = min(self.max_interval, self.interval * 1.5)
+        return self.interval * self.rng.uniform(0.8, 1.2)
+
+def manual_snapshot_headroom(rds_client, bucket=None):
+    """How many more manual snapshots the account quota allows, or None if it cannot be read."""
+    try:
+        response = call_with_backoff(rds_client.describe_account_attributes, bucket)
+    except (ClientError, BotoCoreError) as e:
+        logging.warning(f"Could not read the manual snapshot quota: {e}")
+        return None
+    for quota in response['AccountQuotas']:
+        if quota['AccountQuotaName'] == 'ManualSnapshots':
+            return max(0, quota['Max'] - quota['Used'])
+    return None
+
+def _start_snapshot(rds_client, bucket, job, now, timeout_minutes):
+    try:
+        call_with_backoff(rds_client.create_db_snapshot, bucket,
+                          DBInstanceIdentifier=job.db_instance_identifier,
+                          DBSnapshotIdentifier=job.snapshot_identifier)
+    except rds_client.exceptions.DBSnapshotAlreadyExistsFault:
+        logging.warning(f"[{job.db_instance_identifier}] Snapshot '{job.snapshot_identifier}' already exists.")
+    except (ClientError, BotoCoreError) as e:
+        job.fail(e, now)
+        return
+    job.started = now
+    job.advance('snapshotting', now, timeout_minutes)
+
+def _start_export(rds_client, bucket, job, now, timeout_minutes, account_id, s3_bucket_name, iam_role_arn,
+                  kms_key_arn):
+    params = export_task_params(rds_client.meta.region_name, account_id, job.snapshot_identifier,
+                                s3_bucket_name, iam_role_arn, kms_key_arn)
+    try:
+        call_with_backoff(rds_client.start_export_task, bucket, **params)
+    except rds_client.exceptions.ExportTaskAlreadyExistsFault:
+        logging.warning(f"[{job.db_instance_identifier}] Export task '{job.export_task_identifier}' already exists.")
+    except (ClientError, BotoCoreError) as e:
+        job.fail(e, now)
+        return
+    job.advance('exporting', now, timeout_minutes)
+
+def _poll(describe, identifiers, what):
+    """describe(identifiers), or {} after logging an error; the jobs are checked again next round."""
+    try:
+        return describe(identifiers)
+    except (ClientError, BotoCoreError) as e:
+        logging.warning(f"Could not check {len(identifiers)} {what}(s); retrying next round: {e}")
+        return {}
+
+def _apply_statuses(poller, jobs, now, export_wait_minutes=None):
+    """
+    Moves jobs along from one round of status checks; returns whether any
+    changed state. A failed status check leaves its jobs as they are: they
+    only fail by their own deadlines. Jobs whose snapshot became available
+    may wait `export_wait_minutes` for an export slot.
+    """
+    changed = False
+    snapshotting = [job for job in jobs if job.state == 'snapshotting']
+    if snapshotting:
+        statuses = _poll(poller.snapshot_statuses, [job.snapshot_identifier for job in snapshotting], 'snapshot')
+        for job in snapshotting:
+            status = statuses.get(job.snapshot_identifier)
+            if status == 'available':
+                job.advance('snapshot_ready', now, export_wait_minutes)
+                changed = True
+            elif status is not None and status not in SNAPSHOT_PENDING_STATES:
+                job.fail(f"snapshot '{job.snapshot_identifier}' entered an unexpected state: {status}", now)
+                changed = True
+    exporting = [job for job in jobs if job.state == 'exporting']
+    if exporting:
+        tasks = _poll(poller.export_tasks, [job.export_task_identifier for job in exporting], 'export task')
+        for job in exporting:
+            task = tasks.get(job.export_task_identifier)
+            status = task['Status'].upper() if task else None
+            if status in EXPORT_DONE_STATES:
+                job.advance('completed', now)
+                changed = True
+            elif status == 'FAILED':
+                job.fail(f"export task failed. Cause: {task.get('FailureCause', 'Unknown')}", now)
+                changed = True
+            elif status is not None and status not in EXPORT_PENDING_STATES:
+                job.fail(f"export task '{job.export_task_identifier}' entered an unexpected state: {status}", now)
+                changed = True
+    for job in jobs:
+        waiting = job.state in ('snapshotting', 'snapshot_ready', 'exporting')
+        if waiting and job.deadline is not None and now > job.deadline:
+            job.fail("timed out", now)
+            changed = True
+    return changed
+
+def backup_instances(rds_client, db_instance_identifiers, snapshot_id_prefix, s3_bucket_name, iam_role_arn,
+                     kms_key_arn=None, account_id=None, max_snapshots=DEFAULT_MAX_CONCURRENT_SNAPSHOTS,
+                     max_exports=MAX_CONCURRENT_EXPORTS, snapshot_timeout_minutes=60, export_timeout_minutes=180,
+                     poller=None, clock=time.monotonic, sleep=time.sleep):
+    """
+    Snapshots and exports many instances concurrently: at most
+    `max_snapshots` snapshots are being created at once, no more than the
+    manual snapshot quota has room for, and exports start while fewer than
+    `max_exports` are in progress in the account. A snapshot waits for an
+    export slot up to `export_timeout_minutes`, as long as the exports
+    ahead of it may take. Each instance gets the snapshot
+    '{prefix}-{instance}-{timestamp}'. One StatusPoller follows all of
+    them. A failing instance is reported in its job and does not stop the
+    others. Returns the BackupJobs.
+    """
+    bucket = TokenBucket(RDS_API_TPS)
+    poller = poller or StatusPoller(rds_client, bucket)
+    account_id = account_id or get_account_id()
+    jobs = [BackupJob(db, snapshot_identifier_for(f"{snapshot_id_prefix}-{db}")) for db in db_instance_identifiers]
+
+    headroom = manual_snapshot_headroom(rds_client, bucket)
+    if headroom is not None:
+        for job in jobs[headroom:]:
+            job.fail(f"the manual snapshot quota only has room for {headroom} more snapshot(s)", clock())
+
+    changed = True
+    while True:
+        now = clock()
+        snapshotting = sum(1 for job in jobs if job.state == 'snapshotting')
+        for job in jobs:
+            if job.state == 'pending' and snapshotting < max_snapshots:
+                _start_snapshot(rds_client, bucket, job, now, snapshot_timeout_minutes)
+                if job.state == 'snapshotting':
+                    snapshotting += 1
+
+        ready = [job for job in jobs if job.state == 'snapshot_ready']
+        if ready:
+            try:
+                active = poller.active_exports()
+            except (ClientError, BotoCoreError) as e:
+                logging.warning(f"Could not count the exports in progress; starting none this round: {e}")
+                active = max_exports
+            for job in ready:
+                if active >= max_exports:
+                    break
+                _start_export(rds_client, bucket, job, now, export_timeout_minutes, account_id,
+                              s3_bucket_name, iam_role_arn, kms_key_arn)
+                if job.state == 'exporting':
+                    active += 1
+
+        if all(job.state in ('completed', 'failed') for job in jobs):
+            return jobs
+        sleep(poller.next_wait(changed))
+        changed = _apply_statuses(poller, jobs, clock(), export_timeout_minutes)
+
+def log_backup_summary(jobs):
+    for job in jobs:
+        summary = job.summary()
+        outcome = f"failed: {job.error}" if job.state == 'failed' else job.state
+        duration = f" in {summary['seconds']:.0f}s" if summary['seconds'] is not None else ""
+        logging.info(f"{job.db_instance_identifier}: {outcome}{duration}")
+    failed = sum(1 for job in jobs if job.state == 'failed')
+    logging.info(f"{len(jobs) - failed} of {len(jobs)} backup(s) completed, {failed} failed.")
+
+# Step mode (lambda_handler, --step): one instance's backup as a persisted
+# state machine that each invocation advances without waiting:
+#   snapshot_requested -> snapshot_available -> export_started -> completed
+# or failed (AWS reported a failure, or the snapshot/export timeout passed).
+# A backup stays in snapshot_available, for up to the export timeout, while
+# the account already has MAX_CONCURRENT_EXPORTS exports in progress.
+# A state is saved before the request that acts on it, so a request an
+# interrupted invocation never made is made by the next one, and one it did
+# make comes back as an AlreadyExists fault. The state of each instance is
+# one JSON document, {location}/{instance}.json, where location is a local
+# directory or s3://bucket/prefix.
+TERMINAL_STATES = ('completed', 'failed')
+
+class BackupStateStore:
+    def __init__(self, location, region=None):
+        self.location = location.rstrip('/')
+        self.region = region
+
+    def _s3_location(self, db_instance_identifier):
+        bucket, _, prefix = self.location[len('s3://'):].partition('/')
+        return bucket, f"{prefix}/{db_instance_identifier}.json" if prefix else f"{db_instance_identifier}.json"
+
+    def load(self, db_instance_identifier):
+        if self.location.startswith('s3://'):
+            bucket, key = self._s3_location(db_instance_identifier)
+            s3_client = get_client('s3', self.region)
+            try:
+                return json.loads(s3_client.get_object(Bucket=bucket, Key=key)['Body'].read())
+            except s3_client.exceptions.NoSuchKey:
+                return None
+        try:
+            with open(os.path.join(self.location, f"{db_instance_identifier}.json")) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+    def save(self, state):
+        body = json.dumps(state, indent=2)
+        if self.location.startswith('s3://'):
+            bucket, key = self._s3_location(state['db_instance_identifier'])
+            get_client('s3', self.region).put_object(Bucket=bucket, Key=key, Body=body.encode(),
+                                                     ContentType='application/json')
+            return
+        os.makedirs(self.location, exist_ok=True)
+        path = os.path.join(self.location, f"{state['db_instance_identifier']}.json")
+        with open(f"{path}.tmp", 'w') as f:
+            f.write(body)
+        os.replace(f"{path}.tmp", path)
+
+def _enter(state, name, now, timeout_minutes=None, error=None):
+    logging.info(f"[{state['db_instance_identifier']}] {state['state']} -> {name}")
+    state['state'] = name
+    state['deadline'] = now + timeout_minutes * 60 if timeout_minutes else None
+    state['error'] = error
+    state['history'].append({'state': name, 'at': round(now)})
+
+def _step(rds_client, state, s3_bucket_name, iam_role_arn, kms_key_arn, now,
+          snapshot_timeout_minutes, export_timeout_minutes, max_exports):
+    """Makes the one request the current state calls for, and moves to the next state if it is reached."""
+    db, snapshot_identifier = state['db_instance_identifier'], state['snapshot_identifier']
+    if state['deadline'] is not None and now > state['deadline']:
+        _enter(state, 'failed', now, error=f"timed out in {state['state']}")
+        return
+
+    if state['state'] == 'snapshot_requested':
+        snapshots = call_with_backoff(rds_client.describe_db_snapshots, Filters=[
+            {'Name': 'db-snapshot-id', 'Values': [snapshot_identifier]}])['DBSnapshots']
+        if not snapshots:
+            try:
+                call_with_backoff(rds_client.create_db_snapshot, DBInstanceIdentifier=db,
+                                  DBSnapshotIdentifier=snapshot_identifier)
+                logging.info(f"[{db}] Snapshot '{snapshot_identifier}' requested.")
+            except rds_client.exceptions.DBSnapshotAlreadyExistsFault:
+                pass
+        elif snapshots[0]['Status'] == 'available':
+            _enter(state, 'snapshot_available', now, export_timeout_minutes)
+        elif snapshots[0]['Status'] not in SNAPSHOT_PENDING_STATES:
+            _enter(state, 'failed', now, error=f"snapshot entered an unexpected state: {snapshots[0]['Status']}")
+
+    elif state['state'] == 'snapshot_available':
+        if active_exports(rds_client) < max_exports:
+            _enter(state, 'export_started', now, export_timeout_minutes)
+        else:
+            logging.info(f"[{db}] {max_exports} exports already in progress; waiting for a slot.")
+
+    elif state['state'] == 'export_started':
+        tasks = call_with_backoff(rds_client.describe_export_tasks, Filters=[
+            {'Name': 'export-task-identifier', 'Values': [state['export_task_identifier']]}])['ExportTasks']
+        if not tasks:
+            params = export_task_params(rds_client.meta.region_name, get_account_id(), snapshot_identifier,
+                                        s3_bucket_name, iam_role_arn, kms_key_arn)
+            try:
+                call_with_backoff(rds_client.start_export_task, **params)
+                logging.info(f"[{db}] Export task '{state['export_task_identifier']}' started.")
+            except rds_client.exceptions.ExportTaskAlreadyExistsFault:
+                pass
+        else:
+            status = tasks[0]['Status'].upper()
+            if status in EXPORT_DONE_STATES:
+                _enter(state, 'completed', now)
+            elif status == 'FAILED':
+                _enter(state, 'failed', now, error=f"export task failed. Cause: {tasks[0].get('FailureCause', 'Unknown')}")
+            elif status not in EXPORT_PENDING_STATES:
+                _enter(state, 'failed', now, error=f"export task entered an unexpected state: {status}")
+
+def advance_backup(rds_client, store, db_instance_identifier, snapshot_id_prefix, s3_bucket_name, iam_role_arn,
+                   kms_key_arn=None, start=False, snapshot_timeout_minutes=60, export_timeout_minutes=180,
+                   max_exports=MAX_CONCURRENT_EXPORTS, now=None):
+    """
+    Advances the backup of one instance as far as it can go without
+    waiting, saving each state reached, and returns the state. When its
+    last backup has finished (or there is none), a new one, of snapshot
+    '{prefix}-{instance}-{timestamp}', begins only if `start` is set.
+    """
+    now = now or time.time()
+    state = store.load(db_instance_identifier)
+    if state is None or state['state'] in TERMINAL_STATES:
+        if not start:
+            return state
+        snapshot_identifier = snapshot_identifier_for(f"{snapshot_id_prefix}-{db_instance_identifier}",
+                                                      datetime.datetime.fromtimestamp(now))
+        state = {
+            'db_instance_identifier': db_instance_identifier,
+            'snapshot_identifier': snapshot_identifier,
+            'export_task_identifier': f"export-{snapshot_identifier}",
+            'state': None,
+            'deadline': None,
+            'error': None,
+            'history': [],
+        }
+        _enter(state, 'snapshot_requested', now, snapshot_timeout_minutes)
+        store.save(state)
+    while state['state'] not in TERMINAL_STATES:
+        previous = state['state']
+        _step(rds_client, state, s3_bucket_name, iam_role_arn, kms_key_arn, now,
+              snapshot_timeout_minutes, export_timeout_minutes, max_exports)
+        if state['state'] == previous:
+            break
+        store.save(state)
+    return state
+
+def lambda_handler(event, context=None):
+    """
+    AWS Lambda entry point: advances the backup of each instance once and
+    returns their states. Settings come from the event, else from the
+    environment: DB_INSTANCE_IDENTIFIERS (comma-separated), SNAPSHOT_ID_PREFIX,
+    S3_BUCKET_NAME, IAM_ROLE_ARN, KMS_KEY_ARN, STATE_LOCATION. Only an
+    event with "start": true (e.g. a daily schedule) begins new backups;
+    other events (a schedule every few minutes, RDS events) advance the
+    ones in progress. An instance whose AWS calls fail is reported with
+    its error and retried on the next invocation.
+    """
+    def setting(name, default=None):
+        return event.get(name.lower(), os.environ.get(name, default))
+
+    instances = setting('DB_INSTANCE_IDENTIFIERS', '')
+    if isinstance(instances, str):
+        instances = [db for db in instances.split(',') if db]
+    missing = [name for name in ('STATE_LOCATION', 'S3_BUCKET_NAME', 'IAM_ROLE_ARN') if not setting(name)]
+    if missing:
+        raise ValueError(f"Set {', '.join(missing)} in the event or the environment; STATE_LOCATION is a "
+                         f"directory or s3://bucket/prefix where backup progress is kept between invocations.")
+    region = setting('AWS_REGION')
+    rds_client = get_client('rds', region, client_config())
+    store = BackupStateStore(setting('STATE_LOCATION'), region)
+    results = []
+    for db in instances:
+        try:
+            state = advance_backup(rds_client, store, db, setting('SNAPSHOT_ID_PREFIX', 'manual-backup'),
+                                   setting('S3_BUCKET_NAME'), setting('IAM_ROLE_ARN'), setting('KMS_KEY_ARN'),
+                                   start=bool(event.get('start')))
+        except (ClientError, BotoCoreError) as e:
+            logging.error(f"[{db}] Could not advance the backup: {e}")
+            try:
+                state = store.load(db)
+            except (ClientError, BotoCoreError):
+                state = None # The state store is what failed
+            state = dict(state or {'db_instance_identifier': db, 'state': None}, error=str(e))
+        results.append(state or {'db_instance_identifier': db, 'state': None, 'error': None})
+    return {'backups': results}
+
+def verify_exports(region, s3_bucket_name, export_task_identifiers, report_path=None):
+    """Checks the S3 output of finished exports (see rds_export_verify); returns whether all passed."""
+    import boto3
+    from rds_export_verify import DEFAULT_WORKERS, log_verification, verify_export
+    # Not get_client(): the cached S3 client may already exist (the state store
+    # creates one) without a pool sized for the workers or retries turned off.
+    s3_client = boto3.client('s3', region_name=region, config=client_config(DEFAULT_WORKERS))
+    reports = []
+    for export_task_identifier in export_task_identifiers:
+        report = verify_export(s3_client, s3_bucket_name, export_task_identifier)
+        log_verification(report)
+        reports.append(report)
+    if report_path:
+        with open(report_path, 'w') as f:
+            json.dump(reports, f, indent=2)
+        logging.info(f"Verification report written to {report_path}")
+    return all(report['ok'] for report in reports)
+
 def main():
+    if sys.argv[1:2] == ['lifecycle']:
+        from rds_snapshot_lifecycle import main as lifecycle_main
+        return lifecycle_main(sys.argv[2:])
+
     parser = argparse.ArgumentParser(
-        description="Automate AWS RDS snapshot creation and export to S3."
+        description="Automate AWS RDS snapshot creation and export to S3. "
+                    "Run 'rds_s3_backup.py lifecycle --help' for snapshot retention and DR copies."
     )
     parser.add_argument("--region", required=True, help="AWS region (e.g., us-east-1)")
-    parser.add_argument("--db-instance-identifier", required=True,
-                        help="The DB instance identifier of the RDS database to backup.")
+    parser.add_argument("--db-instance-identifier", required=True, nargs="+",
+                        help="The DB instance identifier of the RDS database to backup. Several may be "
+                             "given to back them up concurrently.")
     parser.add_argument("--snapshot-id-prefix", default="manual-backup",
                         help="Prefix for the generated snapshot identifier (e.g., 'my-app-daily-backup').")
     parser.add_argument("--s3-bucket-name", required=True,
@@ -261,13 +657,75 @@ def main():
                         help="The ARN of the IAM role that grants RDS permission to export to S3 and use KMS.")
     parser.add_argument("--kms-key-arn",
                         help="The ARN of the KMS key to use for encrypting the exported data in S3 (optional).")
+    parser.add_argument("--max-concurrent-snapshots", type=int, default=DEFAULT_MAX_CONCURRENT_SNAPSHOTS,
+                        help="With several instances: snapshots being created at once "
+                             f"(default: {DEFAULT_MAX_CONCURRENT_SNAPSHOTS})")
+    parser.add_argument("--max-concurrent-exports", type=int, default=MAX_CONCURRENT_EXPORTS,
+                        help="With several instances: exports in progress in the account at once "
+                             f"(default and RDS limit: {MAX_CONCURRENT_EXPORTS})")
+    parser.add_argument("--summary-json", help="With several instances: also write the per-instance results here")
+    parser.add_argument("--step", action="store_true",
+                        help="Advance each instance's backup once without waiting, as the Lambda handler does; "
+                             "needs --state-location")
+    parser.add_argument("--start", action="store_true",
+                        help="With --step: begin a new backup of instances whose last one has finished")
+    parser.add_argument("--state-location",
+                        help="With --step: directory or s3://bucket/prefix holding each instance's backup state")
+    parser.add_argument("--verify", action="store_true",
+                        help="After an export completes, check its files in S3 against the export manifest")
+    parser.add_argument("--verify-report", help="With --verify: also write the JSON verification report here")
 
     args = parser.parse_args()
 
+    if args.step:
+        if not args.state_location:
+            parser.error("--step needs --state-location")
+        result = lambda_handler({
+            'db_instance_identifiers': args.db_instance_identifier,
+            'snapshot_id_prefix': args.snapshot_id_prefix,
+            's3_bucket_name': args.s3_bucket_name,
+            'iam_role_arn': args.iam_role_arn,
+            'kms_key_arn': args.kms_key_arn,
+            'state_location': args.state_location,
+            'aws_region': args.region,
+            'start': args.start,
+        })
+        for state in result['backups']:
+            logging.info(f"{state['db_instance_identifier']}: {state['state'] or 'no backup'}"
+                         + (f" ({state['error']})" if state.get('error') else ""))
+        if any(state['state'] == 'failed' for state in result['backups']):
+            sys.exit(1)
+        return
+
+    if len(args.db_instance_identifier) > 1:
+        rds_client = get_rds_client(args.region, client_config())
+        jobs = backup_instances(
+            rds_client,
+            args.db_instance_identifier,
+            args.snapshot_id_prefix,
+            args.s3_bucket_name,
+            args.iam_role_arn,
+            args.kms_key_arn,
+            max_snapshots=args.max_concurrent_snapshots,
+            max_exports=min(args.max_concurrent_exports, MAX_CONCURRENT_EXPORTS)
+        )
+        log_backup_summary(jobs)
+        if args.summary_json:
+            with open(args.summary_json, 'w') as f:
+                json.dump([job.summary() for job in jobs], f, indent=2)
+            logging.info(f"Per-instance results written to {args.summary_json}")
+        verified = True
+        if args.verify:
+            completed = [job.export_task_identifier for job in jobs if job.state == 'completed']
+            verified = verify_exports(args.region, args.s3_bucket_name, completed, args.verify_report)
+        if any(job.state == 'failed' for job in jobs) or not verified:
+            sys.exit(1)
+        return
+
     rds_client = get_rds_client(args.region)
 
     # 1. Create RDS Snapshot
-    snapshot_identifier, _ = create_rds_snapshot(rds_client, args.db_instance_identifier, args.snapshot_id_prefix)
+    snapshot_identifier, _ = create_rds_snapshot(rds_client, args.db_instance_identifier[0], args.snapshot_id_prefix)
     if not snapshot_identifier: # If snapshot already existed and was skipped
         logging.info("Using existing snapshot for export.")
     else:
@@ -288,7 +746,12 @@ def main():
     else:
         logging.info("No new export task initiated (possibly already running or completed).")
 
+    # 4. Verify the Exported Files
+    if args.verify and export_task_identifier:
+        if not verify_exports(args.region, args.s3_bucket_name, [export_task_identifier], args.verify_report):
+            sys.exit(1)
+
     logging.info("RDS to S3 backup process completed.")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,226 @@
+import argparse
+import datetime
+import json
+import logging
+import re
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from botocore.exceptions import ClientError
+
+from aws_rate_limit import TokenBucket, call_with_backoff, client_config
+from rds_s3_backup import RDS_API_TPS, SNAPSHOT_TIMESTAMP_FORMAT, describe_filtered, get_client
+
+DEFAULT_WORKERS = 8
+# RDS allows 20 snapshot copies in progress into one destination region.
+MAX_CROSS_REGION_COPIES = 20
+
+# Grandfather-father-son retention: per instance, the newest snapshot of
+# each of the `daily` most recent days that have one is kept, likewise the
+# newest of each of the `weekly` most recent ISO weeks and `monthly` most
+# recent months. Managed snapshots are the manual ones named by this
+# script, '{prefix}-{timestamp}' or '{prefix}-{instance}-{timestamp}';
+# others are never touched. The DR region gets the same retention.
+PERIODS = {
+    'daily': lambda taken: taken.date(),
+    'weekly': lambda taken: taken.isocalendar()[:2],
+    'monthly': lambda taken: (taken.year, taken.month),
+}
+
+def _managed_pattern(snapshot_id_prefix):
+    return re.compile(rf"^{re.escape(snapshot_id_prefix)}-(?:.+-)?(\d{{8}}-\d{{6}})$")
+
+def inventory(rds_client, db_instance_identifiers, snapshot_id_prefix, bucket=None):
+    """Returns {instance: [snapshot dicts]} of the managed snapshots in the client's region."""
+    pattern = _managed_pattern(snapshot_id_prefix)
+    snapshots = {db: [] for db in db_instance_identifiers}
+    for snapshot in describe_filtered(rds_client.describe_db_snapshots, 'DBSnapshots', 'db-instance-id',
+                                      list(db_instance_identifiers), bucket, SnapshotType='manual'):
+        match = pattern.match(snapshot['DBSnapshotIdentifier'])
+        if not match or snapshot['DBInstanceIdentifier'] not in snapshots:
+            continue
+        snapshots[snapshot['DBInstanceIdentifier']].append({
+            'id': snapshot['DBSnapshotIdentifier'],
+            'arn': snapshot['DBSnapshotArn'],
+            'instance': snapshot['DBInstanceIdentifier'],
+            'taken': datetime.datetime.strptime(match.group(1), SNAPSHOT_TIMESTAMP_FORMAT),
+            'status': snapshot['Status'],
+            'gib': snapshot.get('AllocatedStorage', 0),
+            'encrypted': snapshot.get('Encrypted', False),
+        })
+    return snapshots
+
+def retained(snapshots, retention):
+    """
+    Returns the ids of the available snapshots GFS `retention` ({'daily': 7,
+    'weekly': 4, 'monthly': 12}) keeps. Snapshots still being created or
+    copied do not fill a period, so they cannot push out a usable one;
+    callers keep them regardless.
+    """
+    keep = set()
+    available = [snapshot for snapshot in snapshots if snapshot['status'] == 'available']
+    newest_first = sorted(available, key=lambda snapshot: snapshot['taken'], reverse=True)
+    for period, count in retention.items():
+        seen = set()
+        for snapshot in newest_first:
+            key = PERIODS[period](snapshot['taken'])
+            if key in seen:
+                continue
+            if len(seen) == count:
+                break
+            seen.add(key)
+            keep.add(snapshot['id'])
+    return keep
+
+def plan_lifecycle(source, retention, dr=None, dr_kms_key_id=None):
+    """
+    Works out what to do from the inventories of the source and (if any)
+    DR region: delete the expired available snapshots in each region, and
+    copy the source survivors missing from the DR region, as many as the
+    in-progress copy limit leaves room for; the rest are deferred to the
+    next run. Snapshots still being created or copied are left alone.
+    """
+    plan = {'keep': [], 'delete': [], 'copy': [], 'deferred': [], 'skipped': []}
+    dr_ids, copying = set(), 0
+    for snapshots in (dr or {}).values():
+        kept = retained(snapshots, retention)
+        for snapshot in snapshots:
+            dr_ids.add(snapshot['id'])
+            if snapshot['status'] != 'available':
+                copying += 1
+            elif snapshot['id'] not in kept:
+                plan['delete'].append(('dr', snapshot))
+    room = MAX_CROSS_REGION_COPIES - copying
+    for snapshots in source.values():
+        kept = retained(snapshots, retention)
+        for snapshot in sorted(snapshots, key=lambda s: s['taken'], reverse=True):
+            if snapshot['status'] != 'available':
+                plan['keep'].append(snapshot)
+            elif snapshot['id'] not in kept:
+                plan['delete'].append(('source', snapshot))
+            else:
+                plan['keep'].append(snapshot)
+                if dr is None or snapshot['id'] in dr_ids:
+                    continue
+                if snapshot['encrypted'] and not dr_kms_key_id:
+                    plan['skipped'].append((snapshot, "encrypted; copying needs --dr-kms-key-id"))
+                elif room > 0:
+                    plan['copy'].append(snapshot)
+                    room -= 1
+                else:
+                    plan['deferred'].append(snapshot)
+    return plan
+
+def log_plan(plan, region, dr_region=None):
+    for where, snapshot in plan['delete']:
+        logging.info(f"DELETE {region if where == 'source' else dr_region} {snapshot['id']} "
+                     f"(taken {snapshot['taken']:%Y-%m-%d %H:%M}, {snapshot['gib']} GiB)")
+    for snapshot in plan['copy']:
+        logging.info(f"COPY   {snapshot['id']} {region} -> {dr_region}")
+    for snapshot in plan['deferred']:
+        logging.info(f"DEFER  {snapshot['id']} (copy limit of {MAX_CROSS_REGION_COPIES} reached; next run)")
+    for snapshot, reason in plan['skipped']:
+        logging.warning(f"SKIP   {snapshot['id']}: {reason}")
+    logging.info(f"Plan: keep {len(plan['keep'])}, delete {len(plan['delete'])}, copy {len(plan['copy'])}, "
+                 f"defer {len(plan['deferred'])} snapshot(s).")
+
+def _timed(action, region, snapshot, method, bucket, **kwargs):
+    result = {'action': action, 'region': region, 'snapshot': snapshot['id'], 'gib': snapshot['gib'],
+              'ok': True, 'error': None, 'seconds': 0.0}
+
+    # Only time spent in the API counts, not waits for the rate limit or backoff.
+    def timed_method(**params):
+        started = time.monotonic()
+        try:
+            return method(**params)
+        finally:
+            result['seconds'] += time.monotonic() - started
+
+    try:
+        call_with_backoff(timed_method, bucket, **kwargs)
+    except ClientError as e:
+        result['ok'], result['error'] = False, str(e)
+        logging.error(f"Could not {action} '{snapshot['id']}' in {region}: {e}")
+    result['seconds'] = round(result['seconds'], 3)
+    return result
+
+def apply_plan(plan, region, rds_client, dr_region=None, dr_client=None, dr_kms_key_id=None,
+               workers=DEFAULT_WORKERS):
+    """Deletes and copies on `workers` threads, each region under its own rate limit; returns per-action results."""
+    buckets = {'source': TokenBucket(RDS_API_TPS), 'dr': TokenBucket(RDS_API_TPS)}
+    clients = {'source': (region, rds_client), 'dr': (dr_region, dr_client)}
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = []
+        for where, snapshot in plan['delete']:
+            where_region, client = clients[where]
+            futures.append(pool.submit(_timed, 'delete', where_region, snapshot, client.delete_db_snapshot,
+                                       buckets[where], DBSnapshotIdentifier=snapshot['id']))
+        for snapshot in plan['copy']:
+            params = {'SourceDBSnapshotIdentifier': snapshot['arn'], 'TargetDBSnapshotIdentifier': snapshot['id'],
+                      'SourceRegion': region, 'CopyTags': True}
+            if dr_kms_key_id:
+                params['KmsKeyId'] = dr_kms_key_id
+            futures.append(pool.submit(_timed, 'copy', dr_region, snapshot, dr_client.copy_db_snapshot,
+                                       buckets['dr'], **params))
+        return [future.result() for future in futures]
+
+def log_lifecycle_summary(results, wall_seconds, workers):
+    deleted = [result for result in results if result['action'] == 'delete' and result['ok']]
+    copied = [result for result in results if result['action'] == 'copy' and result['ok']]
+    failed = sum(1 for result in results if not result['ok'])
+    api_seconds = sum(result['seconds'] for result in results)
+    # Snapshots are incremental, so allocated storage is an upper bound on what deleting them frees.
+    logging.info(f"Deleted {len(deleted)} snapshot(s) (up to {sum(r['gib'] for r in deleted)} GiB allocated), "
+                 f"started {len(copied)} DR copy(ies), {failed} failed.")
+    logging.info(f"{len(results)} request(s) spent {api_seconds:.1f}s in the API and took {wall_seconds:.1f}s "
+                 f"with {workers} worker(s): {max(0.0, api_seconds - wall_seconds):.1f}s saved over one at a time.")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="rds_s3_backup.py lifecycle",
+        description="Apply GFS retention to the manual snapshots taken by rds_s3_backup.py and copy the "
+                    "survivors to a DR region."
+    )
+    parser.add_argument("--region", required=True, help="AWS region of the snapshots (e.g., us-east-1)")
+    parser.add_argument("--db-instance-identifier", required=True, nargs="+",
+                        help="The DB instance(s) whose snapshots to manage")
+    parser.add_argument("--snapshot-id-prefix", default="manual-backup",
+                        help="Prefix the snapshots were created with; others are left alone")
+    parser.add_argument("--daily", type=int, default=7, help="Daily snapshots to keep (default: 7)")
+    parser.add_argument("--weekly", type=int, default=4, help="Weekly snapshots to keep (default: 4)")
+    parser.add_argument("--monthly", type=int, default=12, help="Monthly snapshots to keep (default: 12)")
+    parser.add_argument("--dr-region", help="Also copy surviving snapshots to this region (same retention there)")
+    parser.add_argument("--dr-kms-key-id", help="KMS key in the DR region for copies of encrypted snapshots")
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS,
+                        help=f"Deletes and copies requested in parallel (default: {DEFAULT_WORKERS})")
+    parser.add_argument("--dry-run", action="store_true", help="Print the plan without changing anything")
+    parser.add_argument("--summary-json", help="Also write the per-snapshot results to this JSON file")
+    args = parser.parse_args(argv)
+
+    retention = {'daily': args.daily, 'weekly': args.weekly, 'monthly': args.monthly}
+    config = client_config(args.workers)
+    rds_client = get_client('rds', args.region, config)
+    source = inventory(rds_client, args.db_instance_identifier, args.snapshot_id_prefix)
+    dr_client, dr = None, None
+    if args.dr_region:
+        dr_client = get_client('rds', args.dr_region, config)
+        dr = inventory(dr_client, args.db_instance_identifier, args.snapshot_id_prefix)
+    plan = plan_lifecycle(source, retention, dr, args.dr_kms_key_id)
+    log_plan(plan, args.region, args.dr_region)
+    if args.dry_run:
+        return
+
+    started = time.monotonic()
+    results = apply_plan(plan, args.region, rds_client, args.dr_region, dr_client, args.dr_kms_key_id,
+                         args.workers)
+    log_lifecycle_summary(results, time.monotonic() - started, args.workers)
+    if args.summary_json:
+        with open(args.summary_json, 'w') as f:
+            json.dump(results, f, indent=2)
+        logging.info(f"Per-snapshot results written to {args.summary_json}")
+    if any(not result['ok'] for result in results):
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,164 @@
+import functools
+import gzip
+import hashlib
+import threading
+import time
+import zlib
+from collections import OrderedDict, namedtuple
+
+from flask import request, make_response
+
+# Bodies smaller than this are not worth compressing.
+MIN_COMPRESS_BYTES = 256
+
+CachedResponse = namedtuple('CachedResponse', ['etag', 'mimetype', 'headers', 'bodies', 'size', 'expires'])
+
+# Headers recomputed for every response rather than replayed from the cache.
+_PER_RESPONSE_HEADERS = {'content-type', 'content-length', 'content-encoding', 'etag', 'vary'}
+
+def _etag_for(body):
+    return hashlib.sha256(body).hexdigest()[:32]
+
+def _build_entry(response, ttl):
+    """Serializes a body once, together with its compressed variants."""
+    body = response.get_data()
+    headers = [(k, v) for k, v in response.headers.items() if k.lower() not in _PER_RESPONSE_HEADERS]
+    bodies = {'identity': body}
+    if len(body) >= MIN_COMPRESS_BYTES:
+        for coding, compress in (('gzip', lambda b: gzip.compress(b, mtime=0)), ('deflate', zlib.compress)):
+            compressed = compress(body)
+            if len(compressed) < len(body):
+                bodies[coding] = compressed
+    expires = time.monotonic() + ttl if ttl else None
+    size = sum(len(b) for b in bodies.values())
+    return CachedResponse(_etag_for(body), response.mimetype, headers, bodies, size, expires)
+
+def _parse_accept_encoding(header):
+    """Returns the codings the client accepts (q > 0)."""
+    accepted = set()
+    for part in header.split(','):
+        coding, _, params = part.strip().partition(';')
+        coding = coding.strip().lower()
+        q = 1.0
+        params = params.strip()
+        if params.startswith('q='):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        if coding and q > 0:
+            accepted.add(coding)
+    return accepted
+
+def _etags_match(header, etag):
+    """Weak comparison of an If-None-Match header against our entity tag."""
+    for tag in header.split(','):
+        tag = tag.strip()
+        if tag == '*':
+            return True
+        if tag.startswith('W/'):
+            tag = tag[2:]
+        # Compressed variants carry a suffix on the same opaque tag.
+        if tag.strip('"').split('-', 1)[0] == etag:
+            return True
+    return False
+
+class ResponseCache:
+    """
+    Byte-bounded LRU cache of pre-serialized responses.
+    Entries are keyed by (route, normalized query string, data version) and
+    hold the identity body plus gzip/deflate variants compressed once.
+    """
+
+    def __init__(self, max_bytes=64 * 1024 * 1024, on_lookup=None):
+        self.max_bytes = max_bytes
+        # Optional callback(found) for external hit/miss accounting.
+        self.on_lookup = on_lookup
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry.expires is not None and entry.expires <= time.monotonic():
+                self._discard(key)
+                entry = None
+            if entry is None:
+                self.misses += 1
+            else:
+                self._entries.move_to_end(key)
+                self.hits += 1
+        if self.on_lookup is not None:
+            self.on_lookup(entry is not None)
+        return entry
+
+    def put(self, key, entry):
+        if entry.size > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._discard(key)
+            self._entries[key] = entry
+            self.size += entry.size
+            while self.size > self.max_bytes:
+                self._discard(next(iter(self._entries)))
+
+    def clear(self):
+        """Drops every entry; called whenever the schedule data changes."""
+        with self._lock:
+            self._entries.clear()
+            self.size = 0
+
+    def _discard(self, key):
+        self.size -= self._entries.pop(key).size
+
+    def cached(self, version=lambda: None, ttl=None):
+        """
+        Decorator for Flask views whose 200 responses depend only on the
+        route, the query string and `version()`. Adds strong ETags,
+        If-None-Match -> 304 handling and pre-compressed Content-Encoding.
+        A response is not cached if the version changed while the view ran,
+        since it may have been built from either version's data.
+        """
+        def decorator(view):
+            @functools.wraps(view)
+            def wrapper(*args, **kwargs):
+                query = tuple(sorted(request.args.items(multi=True)))
+                current = version()
+                key = (request.path, query, current)
+                entry = self.get(key)
+                if entry is None:
+                    response = make_response(view(*args, **kwargs))
+                    if response.status_code != 200 or response.is_streamed:
+                        return response
+                    entry = _build_entry(response, ttl)
+                    if version() == current:
+                        self.put(key, entry)
+                return _respond(entry)
+            return wrapper
+        return decorator
+
+def _respond(entry):
+    """Builds a response for the client's validators and accepted codings."""
+    accepted = _parse_accept_encoding(request.headers.get('Accept-Encoding', ''))
+    coding = next((c for c in ('gzip', 'deflate') if c in accepted and c in entry.bodies), 'identity')
+    etag = entry.etag if coding == 'identity' else f"{entry.etag}-{coding}"
+
+    if_none_match = request.headers.get('If-None-Match')
+    if if_none_match and _etags_match(if_none_match, entry.etag):
+        response = make_response('', 304)
+    else:
+        response = make_response(entry.bodies[coding])
+        response.mimetype = entry.mimetype
+        if coding != 'identity':
+            response.headers['Content-Encoding'] = coding
+    response.headers.extend(entry.headers)
+    response.headers['ETag'] = f'"{etag}"'
+    response.headers['Vary'] = 'Accept-Encoding'
+    return response
@@ -0,0 +1,224 @@
+import json
+import logging
+import os
+import queue
+import threading
+from array import array
+
+from schedule_store import MAX_MINUTES, ScheduleStore, parse_time
+
+# Schedule deltas are JSON objects, one per line in the delta log:
+#   {"op": "add", "trip": {"train_id": ..., "origin": ..., "destination": ...,
+#                          "departure_time": "HH:MM", "arrival_time": "HH:MM"}}
+#   {"op": "cancel", "train_id": "T101"}                      # whole run
+#   {"op": "cancel", "train_id": "T101", "origin": "Station A"}  # one stop
+#   {"op": "delay", "train_id": "T101", "minutes": 5}         # optional "origin"
+# Delays apply to the matching rows' departure and arrival times.
+OPS = ('add', 'cancel', 'delay')
+
+def validate_delta(delta):
+    """Raises ValueError if `delta` is not a well-formed schedule delta."""
+    if not isinstance(delta, dict) or delta.get('op') not in OPS:
+        raise ValueError(f"Invalid delta {delta!r}: 'op' must be one of {', '.join(OPS)}.")
+    if delta['op'] == 'add':
+        trip = delta.get('trip')
+        fields = ('train_id', 'origin', 'destination', 'departure_time', 'arrival_time')
+        if not isinstance(trip, dict) or any(not isinstance(trip.get(f), str) for f in fields):
+            raise ValueError(f"Invalid add delta {delta!r}: 'trip' needs string fields {', '.join(fields)}.")
+        parse_time(trip['departure_time'])
+        parse_time(trip['arrival_time'])
+        return
+    if not isinstance(delta.get('train_id'), str):
+        raise ValueError(f"Invalid {delta['op']} delta {delta!r}: 'train_id' is required.")
+    if 'origin' in delta and not isinstance(delta['origin'], str):
+        raise ValueError(f"Invalid {delta['op']} delta {delta!r}: 'origin' must be a station name.")
+    minutes = delta.get('minutes')
+    if delta['op'] == 'delay' and (not isinstance(minutes, int) or isinstance(minutes, bool)):
+        raise ValueError(f"Invalid delay delta {delta!r}: 'minutes' must be an integer.")
+
+def apply_deltas(store, deltas):
+    """
+    Returns a new ScheduleStore with `deltas` applied in order; `store` is
+    left untouched. Works on the integer columns, so nothing is re-parsed.
+    Invalid deltas are logged and skipped so one bad line cannot wedge the
+    delta log.
+    """
+    stations, train_ids = list(store.stations), list(store.train_ids)
+    station_ids = {name: i for i, name in enumerate(stations)}
+    train_index = {name: i for i, name in enumerate(train_ids)}
+
+    def intern(table, ids, name):
+        if name not in ids:
+            ids[name] = len(table)
+            table.append(name)
+        return ids[name]
+
+    # Rows as (departure, train, origin, destination, arrival); None = cancelled.
+    rows = list(zip(store.departure, store.train, store.origin, store.destination, store.arrival))
+    by_train = {}
+    for i, row in enumerate(rows):
+        by_train.setdefault(row[1], []).append(i)
+
+    def apply_one(delta):
+        if delta['op'] == 'add':
+            trip = delta['trip']
+            train = intern(train_ids, train_index, trip['train_id'])
+            by_train.setdefault(train, []).append(len(rows))
+            rows.append((
+                parse_time(trip['departure_time']),
+                train,
+                intern(stations, station_ids, trip['origin']),
+                intern(stations, station_ids, trip['destination']),
+                parse_time(trip['arrival_time']),
+            ))
+            return
+
+        train = train_index.get(delta['train_id'])
+        origin = station_ids.get(delta['origin']) if 'origin' in delta else None
+        matches = [i for i in by_train.get(train, ()) if rows[i] is not None
+                   and ('origin' not in delta or rows[i][2] == origin)]
+        if delta['op'] == 'cancel':
+            for i in matches:
+                rows[i] = None
+            return
+
+        shift = delta['minutes']
+        if any(not 0 <= rows[i][0] + shift or rows[i][4] + shift > MAX_MINUTES for i in matches):
+            logging.warning(f"Skipping schedule delta {delta!r}: delay moves a trip out of range.")
+            return
+        for i in matches:
+            row = rows[i]
+            rows[i] = (row[0] + shift,) + row[1:4] + (row[4] + shift,)
+
+    for delta in deltas:
+        # A delta that does not apply is skipped alone; the rest of the batch still applies.
+        try:
+            validate_delta(delta)
+            apply_one(delta)
+        except (ValueError, TypeError, KeyError) as e:
+            logging.warning(f"Skipping schedule delta {delta!r}: {e}")
+
+    # Ids of names interned above are out of name order, so sort by the names (see ScheduleStore.sort_key).
+    rows = sorted((row for row in rows if row is not None),
+                  key=lambda r: (r[0], train_ids[r[1]], stations[r[2]], stations[r[3]], r[4]))
+    return ScheduleStore.from_columns(
+        stations,
+        train_ids,
+        array('I', (r[1] for r in rows)),
+        array('I', (r[2] for r in rows)),
+        array('I', (r[3] for r in rows)),
+        array('H', (r[0] for r in rows)),
+        array('H', (r[4] for r in rows)),
+    )
+
+class ScheduleReloader:
+    """
+    Applies schedule deltas in a background thread and publishes each result
+    as a new immutable store through `on_swap(store)`.
+    Deltas come from submit() and, if `delta_path` is set, from new complete
+    lines appended to that file. Every delta that arrives while a store is
+    being built is folded into the next build, so bursts cost one rebuild.
+    """
+
+    def __init__(self, base_store, on_swap, delta_path=None, poll_interval=1.0):
+        self.base_store = base_store
+        self.store = base_store
+        self.on_swap = on_swap
+        self.delta_path = delta_path
+        self.poll_interval = poll_interval
+        self._pending = queue.Queue()
+        self._file_id = None
+        self._offset = 0
+        self._wake = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name='schedule-reloader', daemon=True)
+            self._thread.start()
+
+    def submit(self, deltas):
+        for delta in deltas:
+            validate_delta(delta)
+        for delta in deltas:
+            self._pending.put(delta)
+        self._wake.set()
+
+    def wake(self):
+        self._wake.set()
+
+    def _run(self):
+        while True:
+            self._wake.wait(self.poll_interval)
+            self._wake.clear()
+            try:
+                self.reload_once()
+            except Exception as e:
+                logging.error(f"Schedule reload failed: {e}")
+
+    def reload_once(self):
+        """Builds and publishes a new store if any deltas are waiting."""
+        store, deltas = self.store, []
+        if self.delta_path:
+            restart, deltas = self._read_delta_file()
+            if restart:
+                store = self.base_store
+        while True:
+            try:
+                deltas.append(self._pending.get_nowait())
+            except queue.Empty:
+                break
+        if not deltas and store is self.store:
+            return False
+
+        store = apply_deltas(store, deltas)
+        self.store = store
+        self.on_swap(store)
+        logging.info(f"Applied {len(deltas)} schedule deltas; now serving version {store.version} "
+                     f"({len(store)} trips).")
+        return True
+
+    def _read_delta_file(self):
+        """
+        Returns (restart, deltas) for lines appended since the last read.
+        A replaced or truncated file means the log restarted, so it is
+        replayed from the beginning on top of the base store.
+        """
+        try:
+            st = os.stat(self.delta_path)
+        except FileNotFoundError:
+            return False, []
+        restart = False
+        if (st.st_dev, st.st_ino) != self._file_id or st.st_size < self._offset:
+            restart = self._file_id is not None
+            self._file_id, self._offset = (st.st_dev, st.st_ino), 0
+        if st.st_size == self._offset:
+            return restart, []
+
+        with open(self.delta_path, 'rb') as f:
+            f.seek(self._offset)
+            data = f.read(st.st_size - self._offset)
+        complete = data[:data.rfind(b'\n') + 1]  # Leave a partial last line for later
+        self._offset += len(complete)
+
+        deltas = []
+        for line in complete.splitlines():
+            if not line.strip():
+                continue
+            try:
+                delta = json.loads(line)
+                validate_delta(delta)
+            except ValueError as e:
+                logging.warning(f"Skipping invalid line in '{self.delta_path}': {e}")
+                continue
+            deltas.append(delta)
+        return restart, deltas
+
+def append_deltas(path, deltas):
+    """Appends deltas to a delta log in a single O_APPEND write."""
+    data = ''.join(json.dumps(delta, separators=(',', ':')) + '\n' for delta in deltas).encode('utf-8')
+    fd = os.open(path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+    try:
+        os.write(fd, data)
+    finally:
+        os.close(fd)
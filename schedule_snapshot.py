@@ -0,0 +1,146 @@
+import argparse
+import csv
+import json
+import mmap
+import os
+import sys
+from array import array
+
+from schedule_store import ScheduleStore
+
+# File layout: MAGIC, a little-endian uint32 header length, a JSON header,
+# then 8-byte aligned sections. The header lists each section's typecode,
+# byte offset and byte length, so a loader can map them without parsing rows.
+MAGIC = b'TSNAP001'
+ALIGNMENT = 8
+
+COLUMNS = ('train', 'origin', 'destination', 'departure', 'arrival')
+
+class StringTable:
+    """Read-only sequence of strings decoded on demand from a mapped blob."""
+
+    def __init__(self, blob, offsets):
+        self._blob = blob
+        self._offsets = offsets
+
+    def __len__(self):
+        return len(self._offsets) - 1
+
+    def __getitem__(self, i):
+        if not 0 <= i < len(self):
+            raise IndexError(i)
+        return str(self._blob[self._offsets[i]:self._offsets[i + 1]], 'utf-8')
+
+    def __iter__(self):
+        return (self[i] for i in range(len(self)))
+
+def _string_sections(strings):
+    encoded = [s.encode('utf-8') for s in strings]
+    offsets = array('I', [0])
+    for item in encoded:
+        offsets.append(offsets[-1] + len(item))
+    return b''.join(encoded), offsets
+
+def write_snapshot(store, path):
+    """Writes a store to `path` atomically (readers keep their old mapping)."""
+    sections = {name: getattr(store, name) for name in COLUMNS}
+    for name, (keys, order) in store.indexes.items():
+        sections[f'{name}_keys'] = keys
+        sections[f'{name}_order'] = order
+    for name in ('stations', 'train_ids'):
+        blob, offsets = _string_sections(getattr(store, name))
+        sections[f'{name}_blob'] = blob
+        sections[f'{name}_offsets'] = offsets
+
+    layout, chunks, offset = {}, [], 0
+    for name, data in sections.items():
+        # Columns of a store loaded from a snapshot are memoryviews, not arrays.
+        if isinstance(data, array):
+            typecode = data.typecode
+        elif isinstance(data, memoryview):
+            typecode = data.format
+        else:
+            typecode = 'B'
+        payload = bytes(data)
+        layout[name] = {"typecode": typecode, "offset": offset, "length": len(payload)}
+        padding = -len(payload) % ALIGNMENT
+        chunks.append(payload + b'\0' * padding)
+        offset += len(payload) + padding
+
+    header = json.dumps({
+        "byteorder": sys.byteorder,
+        "rows": len(store),
+        "version": store.version,
+        "sections": layout,
+    }).encode('utf-8')
+    header += b' ' * (-(len(MAGIC) + 4 + len(header)) % ALIGNMENT)
+
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(MAGIC)
+        f.write(len(header).to_bytes(4, 'little'))
+        f.write(header)
+        for chunk in chunks:
+            f.write(chunk)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+def load_snapshot(path):
+    """
+    Maps a snapshot read-only and returns a ScheduleStore whose columns and
+    indexes are memoryviews over the mapping. Pages are shared between every
+    process that maps the same file.
+    """
+    with open(path, 'rb') as f:
+        mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    view = memoryview(mapped)
+    if bytes(view[:len(MAGIC)]) != MAGIC:
+        raise ValueError(f"'{path}' is not a schedule snapshot.")
+    header_length = int.from_bytes(view[len(MAGIC):len(MAGIC) + 4], 'little')
+    data_start = len(MAGIC) + 4 + header_length
+    header = json.loads(bytes(view[len(MAGIC) + 4:data_start]))
+    if header["byteorder"] != sys.byteorder:
+        raise ValueError(f"Snapshot '{path}' was built on a {header['byteorder']}-endian host.")
+
+    def section(name):
+        info = header["sections"][name]
+        start = data_start + info["offset"]
+        data = view[start:start + info["length"]]
+        return data if info["typecode"] == 'B' else data.cast(info["typecode"])
+
+    stations = list(StringTable(section('stations_blob'), section('stations_offsets')))
+    train_ids = StringTable(section('train_ids_blob'), section('train_ids_offsets'))
+    indexes = {name: (section(f'{name}_keys'), section(f'{name}_order')) for name in ScheduleStore.INDEXES}
+    store = ScheduleStore(stations, train_ids, *(section(name) for name in COLUMNS), indexes,
+                          version=header["version"])
+    store.mapping = mapped  # Keeps the mapping alive as long as the store
+    return store
+
+def read_trips(path):
+    """Reads trips from a CSV (with a header row) or JSON timetable."""
+    with open(path, newline='') as f:
+        if path.endswith('.json'):
+            return json.load(f)
+        return list(csv.DictReader(f))
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Build a memory-mappable schedule snapshot from a CSV or JSON timetable."
+    )
+    parser.add_argument("source", help="Timetable file: .json (list of trips) or .csv with columns "
+                                       "train_id,origin,destination,departure_time,arrival_time.")
+    parser.add_argument("output", help="Path of the snapshot to write (e.g., schedule.snap).")
+    args = parser.parse_args()
+
+    try:
+        store = ScheduleStore.from_trips(read_trips(args.source))
+    except (OSError, KeyError, ValueError) as e:
+        print(f"Error reading timetable '{args.source}': {e}")
+        sys.exit(1)
+    write_snapshot(store, args.output)
+    print(f"Wrote {len(store)} trips across {len(store.stations)} stations to {args.output} "
+          f"(version {store.version}).")
+
+if __name__ == "__main__":
+    main()
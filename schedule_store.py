@@ -0,0 +1,183 @@
+import hashlib
+from array import array
+from bisect import bisect_left, bisect_right
+
+# Departure times are packed into the low bits of the composite index keys,
+# so they must fit in 16 bits (minutes since midnight, overnight runs allowed).
+TIME_BITS = 16
+MAX_MINUTES = (1 << TIME_BITS) - 1
+
+def parse_time(value):
+    """Converts an 'HH:MM' string to minutes since midnight."""
+    try:
+        hours, minutes = value.split(':')
+        hours, minutes = int(hours), int(minutes)
+    except (AttributeError, ValueError):
+        raise ValueError(f"Invalid time '{value}', expected HH:MM.")
+    total = hours * 60 + minutes
+    if hours < 0 or not 0 <= minutes < 60 or total > MAX_MINUTES:
+        raise ValueError(f"Invalid time '{value}', expected HH:MM.")
+    return total
+
+def format_time(minutes):
+    """Converts minutes since midnight back to an 'HH:MM' string."""
+    return f"{minutes // 60:02d}:{minutes % 60:02d}"
+
+class _SortKeys:
+    """Read-only sequence of the sort keys of `rows`, so bisect can search them."""
+
+    def __init__(self, store, rows):
+        self.store = store
+        self.rows = rows
+
+    def __len__(self):
+        return len(self.rows)
+
+    def __getitem__(self, i):
+        return self.store.sort_key(self.rows[i])
+
+class ScheduleStore:
+    """
+    Immutable, indexed view of the train schedule.
+    Trips are stored column-wise in sort_key() order: by departure, then
+    train id, origin, destination and arrival. Each secondary index is a
+    pair of parallel arrays: composite keys ((group << TIME_BITS) | departure)
+    in ascending order, and the row number each key points at. A filtered
+    query is two bisects plus a slice, i.e. O(log n + k). Columns may be
+    arrays or memoryviews over a mapped snapshot (see schedule_snapshot.py).
+    """
+
+    INDEXES = ('origin', 'destination', 'route')
+
+    def __init__(self, stations, train_ids, train, origin, destination, departure, arrival, indexes,
+                 version=None):
+        self.stations = stations
+        self.train_ids = train_ids
+        self.train = train
+        self.origin = origin
+        self.destination = destination
+        self.departure = departure
+        self.arrival = arrival
+        self.indexes = indexes
+        self._station_ids = {name: i for i, name in enumerate(stations)}
+        self.version = version or self._content_hash()
+
+    @classmethod
+    def from_trips(cls, trips):
+        """Builds a store from an iterable of trip dicts (the /schedule format)."""
+        rows = sorted(
+            (parse_time(t['departure_time']), t['train_id'], t['origin'], t['destination'],
+             parse_time(t['arrival_time']))
+            for t in trips
+        )
+        stations = sorted({r[2] for r in rows} | {r[3] for r in rows})
+        train_ids = sorted({r[1] for r in rows})
+        return cls.from_columns(
+            stations,
+            train_ids,
+            *cls._encode(rows, stations, train_ids),
+        )
+
+    @classmethod
+    def from_columns(cls, stations, train_ids, train, origin, destination, departure, arrival):
+        """Builds the secondary indexes over columns already in sort_key() order."""
+        station_count = len(stations)
+        group_keys = {
+            'origin': origin,
+            'destination': destination,
+            'route': array('q', (o * station_count + d for o, d in zip(origin, destination))),
+        }
+        indexes = {}
+        for name in cls.INDEXES:
+            group = group_keys[name]
+            # Rows are already in sort_key() order and sorted() is stable, so
+            # sorting by group alone keeps each group in that order too.
+            order = array('I', sorted(range(len(departure)), key=group.__getitem__))
+            keys = array('q', ((group[r] << TIME_BITS) | departure[r] for r in order))
+            indexes[name] = (keys, order)
+        return cls(stations, train_ids, train, origin, destination, departure, arrival, indexes)
+
+    @staticmethod
+    def _encode(rows, stations, train_ids):
+        station_ids = {name: i for i, name in enumerate(stations)}
+        train_index = {name: i for i, name in enumerate(train_ids)}
+        return (
+            array('I', (train_index[r[1]] for r in rows)),
+            array('I', (station_ids[r[2]] for r in rows)),
+            array('I', (station_ids[r[3]] for r in rows)),
+            array('H', (r[0] for r in rows)),
+            array('H', (r[4] for r in rows)),
+        )
+
+    def _content_hash(self):
+        """Identifies the timetable contents, e.g. for cache keys."""
+        digest = hashlib.sha1()
+        for strings in (self.stations, self.train_ids):
+            digest.update('\0'.join(strings).encode('utf-8'))
+            digest.update(b'\1')
+        for column in (self.train, self.origin, self.destination, self.departure, self.arrival):
+            digest.update(bytes(column))
+        return digest.hexdigest()[:16]
+
+    def __len__(self):
+        return len(self.departure)
+
+    def station_id(self, name):
+        """Returns the interned id of a station name, or None if unknown."""
+        return self._station_ids.get(name)
+
+    def sort_key(self, row):
+        """(departure, train id, origin, destination, arrival) of a row; rows ascend by it."""
+        return (self.departure[row], self.train_ids[self.train[row]], self.stations[self.origin[row]],
+                self.stations[self.destination[row]], self.arrival[row])
+
+    def trip(self, row):
+        """Returns the trip at the given row in the /schedule dict format."""
+        return {
+            "train_id": self.train_ids[self.train[row]],
+            "origin": self.stations[self.origin[row]],
+            "destination": self.stations[self.destination[row]],
+            "departure_time": format_time(self.departure[row]),
+            "arrival_time": format_time(self.arrival[row]),
+        }
+
+    def query(self, origin=None, destination=None, depart_from=None, depart_to=None, limit=None,
+              after=None):
+        """
+        Returns the matching row numbers in departure order.
+        origin/destination are station names; depart_from/depart_to are an
+        inclusive window in minutes since midnight. `after` is a keyset
+        cursor, a sort_key() value: only rows that sort after it are
+        returned. It stays valid in a store with other contents.
+        """
+        low = 0 if depart_from is None else depart_from
+        high = MAX_MINUTES if depart_to is None else depart_to
+        if low > high:
+            return []
+
+        if origin is None and destination is None:
+            keys, order, group = self.departure, None, 0
+        else:
+            group_ids = [self.station_id(s) for s in (origin, destination) if s is not None]
+            if None in group_ids:
+                return []
+            if origin is not None and destination is not None:
+                name, group = 'route', group_ids[0] * len(self.stations) + group_ids[1]
+            else:
+                name, group = ('origin' if origin is not None else 'destination'), group_ids[0]
+            keys, order = self.indexes[name]
+            group <<= TIME_BITS
+
+        start = bisect_left(keys, group | low)
+        end = bisect_right(keys, group | high)
+        if after is not None:
+            # Within one group, rows are in sort_key() order as well.
+            rows = range(len(self)) if order is None else order
+            start = bisect_right(_SortKeys(self, rows), tuple(after), start, end)
+        if limit is not None:
+            end = max(start, min(end, start + limit))
+        return range(start, end) if order is None else memoryview(order)[start:end]
+
+    def trips(self, rows):
+        """Expands row numbers into /schedule trip dicts."""
+        return [self.trip(row) for row in rows]
@@ -0,0 +1,85 @@
+import re
+import unittest
+
+import app
+from schedule_deltas import apply_deltas
+from schedule_store import ScheduleStore
+
+def trips(count):
+    """`count` trips, several per departure minute, over three stations."""
+    return [{'train_id': f"T{i % 7}{i:03d}", 'origin': f"Station {i % 3}", 'destination': f"Station {(i + 1) % 3}",
+             'departure_time': f"{8 + i % 4:02d}:{i * 7 % 60:02d}", 'arrival_time': '23:00'} for i in range(count)]
+
+def next_link(response):
+    match = re.match(r'<(.*)>; rel="next"', response.headers.get('Link', ''))
+    return match.group(1) if match else None
+
+class AppTestCase(unittest.TestCase):
+    def setUp(self):
+        self.client = app.app.test_client()
+        self.addCleanup(app.set_schedule_store, app.schedule_store)
+
+    def use(self, store):
+        app.set_schedule_store(store)
+        return store
+
+class ScheduleRouteTest(AppTestCase):
+    def test_filters(self):
+        store = self.use(ScheduleStore.from_trips(trips(60)))
+        served = self.client.get('/schedule?origin=Station+1&from=09:00&to=10:30').get_json()
+        expected = [t for t in store.trips(range(len(store)))
+                    if t['origin'] == 'Station 1' and '09:00' <= t['departure_time'] <= '10:30']
+        self.assertEqual(served, expected)
+        self.assertEqual(len(self.client.get('/schedule?destination=Station+2&limit=3').get_json()), 3)
+        self.assertEqual(self.client.get('/schedule?origin=Nowhere').get_json(), [])
+
+    def test_invalid_arguments(self):
+        for query in ('from=8', 'to=09:60', 'limit=-1', 'page_size=0'):
+            with self.subTest(query):
+                response = self.client.get(f"/schedule?{query}")
+                self.assertEqual(response.status_code, 400)
+                self.assertIn('error', response.get_json())
+
+class PaginationTest(AppTestCase):
+    def walk(self, url, between_pages=None):
+        served = []
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200, response.get_data(as_text=True))
+            served += response.get_json()
+            url = next_link(response)
+            if url and between_pages:
+                between_pages()
+        return served
+
+    def test_pages_cover_the_query_once(self):
+        store = self.use(ScheduleStore.from_trips(trips(60)))
+        for query, page_size in (('', 7), ('origin=Station+1', 4), ('origin=Station+2&from=09:00', 3)):
+            with self.subTest(query):
+                unpaged = self.client.get(f"/schedule?{query}").get_json()
+                self.assertEqual(self.walk(f"/schedule?{query}&page_size={page_size}"), unpaged)
+        self.assertEqual(len(self.walk('/schedule?page_size=7')), len(store))
+
+    def test_cursor_survives_a_timetable_swap(self):
+        self.use(ScheduleStore.from_trips(trips(40)))
+        added = [{'op': 'add', 'trip': {'train_id': train_id, 'origin': 'Station 1', 'destination': 'Station 0',
+                                        'departure_time': departure, 'arrival_time': '23:50'}}
+                 for train_id, departure in (('AA', '07:00'), ('ZZ', '23:30'))]
+        swapped = []
+
+        def swap_once():
+            if not swapped:
+                swapped.append(self.use(apply_deltas(app.schedule_store, added)))
+        served = self.walk('/schedule?page_size=5&origin=Station+1', between_pages=swap_once)
+        expected = [t for t in swapped[0].trips(range(len(swapped[0])))
+                    if t['origin'] == 'Station 1' and t['train_id'] != 'AA'] # AA sorts before the first page
+        self.assertEqual(served, expected)
+        self.assertEqual(served[-1]['train_id'], 'ZZ')
+
+    def test_invalid_cursors(self):
+        for cursor in ('not-base64!', 'WzEsMl0', 'eyJhIjoxfQ'): # [1,2] and {"a":1}
+            with self.subTest(cursor):
+                self.assertEqual(self.client.get(f"/schedule?after={cursor}").status_code, 400)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,47 @@
+import unittest
+
+from aws_alarm_backtest import replay_alarm
+
+def alarm(operator='GreaterThanThreshold', threshold=3, periods=2):
+    return {'AlarmName': 'EC2-i-1-HighCPU', 'Period': 60, 'EvaluationPeriods': periods,
+            'Threshold': threshold, 'ComparisonOperator': operator}
+
+def series(values, start=0, period=60):
+    """One datapoint per period from `start`; None leaves that period missing."""
+    points = [(start + i * period, v) for i, v in enumerate(values) if v is not None]
+    return {'timestamps': [t for t, _ in points], 'values': [v for _, v in points]}
+
+class ReplayAlarmTest(unittest.TestCase):
+    def test_fires_on_consecutive_breaches(self):
+        result = replay_alarm(alarm(), series([1, 5, 5, 1, 5, 5, 5, 1, None, None]), 0, 600)
+        self.assertEqual(result['datapoints'], 8)
+        self.assertEqual(result['fires'], 2)
+        self.assertEqual(result['alarm_fraction'], 0.3)
+        # In ALARM from the end of the second breaching period.
+        self.assertEqual(result['first_fire'], 180)
+
+    def test_isolated_breaches_and_missing_data_do_not_fire(self):
+        result = replay_alarm(alarm(), series([5, 1, 5, None, 5, 1]), 0, 360)
+        self.assertEqual(result['fires'], 0)
+        self.assertIsNone(result['first_fire'])
+        self.assertEqual(result['alarm_fraction'], 0.0)
+
+    def test_points_outside_the_range_are_ignored(self):
+        data = series([5, 5, 5, 5], start=-120)
+        result = replay_alarm(alarm(periods=1), data, 0, 120)
+        self.assertEqual(result['datapoints'], 2)
+        self.assertEqual(result['fires'], 1)
+        self.assertEqual(result['alarm_fraction'], 1.0)
+
+    def test_less_than_operator(self):
+        result = replay_alarm(alarm('LessThanOrEqualToThreshold', threshold=10, periods=1),
+                              series([20, 10, 30]), 0, 180)
+        self.assertEqual(result['fires'], 1)
+        self.assertEqual(result['first_fire'], 120)
+
+    def test_empty_range(self):
+        result = replay_alarm(alarm(), series([]), 0, 30)
+        self.assertEqual((result['datapoints'], result['fires'], result['alarm_fraction']), (0, 0, 0.0))
+
+if __name__ == '__main__':
+    unittest.main()
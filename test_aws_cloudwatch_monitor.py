@@ -0,0 +1,94 @@
+import unittest
+
+from botocore.exceptions import ClientError
+
+from aws_alarm_templates import alarm_definition
+from aws_cloudwatch_monitor import alarm_request, diff_alarms, fetch_alarms
+
+TOPIC = 'arn:aws:sns:us-east-1:123456789012:alerts'
+PREFIXES = ['EC2-', 'RDS-']
+
+def cpu_alarm(instance_id, threshold=80):
+    return alarm_definition(f"EC2-{instance_id}-HighCPU", 'CPUUtilization', 'AWS/EC2', 'Average', 300, 2,
+                            threshold, 'GreaterThanThreshold', 'CPU above threshold',
+                            [{'Name': 'InstanceId', 'Value': instance_id}])
+
+def existing(*alarms, topic=TOPIC):
+    """describe_alarms output for `alarms` as currently put."""
+    return {alarm['AlarmName']: dict(alarm_request(alarm, topic), Threshold=float(alarm['Threshold']))
+            for alarm in alarms}
+
+class DiffAlarmsTest(unittest.TestCase):
+    def test_creates_missing_and_leaves_identical(self):
+        plan = diff_alarms([cpu_alarm('i-1'), cpu_alarm('i-2')], existing(cpu_alarm('i-1')), TOPIC, PREFIXES)
+        self.assertEqual([request['AlarmName'] for request in plan['create']], ['EC2-i-2-HighCPU'])
+        self.assertEqual(plan['create'][0]['AlarmActions'], [TOPIC])
+        self.assertEqual(plan['unchanged'], ['EC2-i-1-HighCPU'])
+        self.assertEqual(plan['update'], [])
+        self.assertEqual(plan['delete'], [])
+
+    def test_updates_changed_fields_only(self):
+        current = existing(cpu_alarm('i-1'))
+        current['EC2-i-1-HighCPU']['Dimensions'] = [{'Value': 'i-1', 'Name': 'InstanceId'}]
+        plan = diff_alarms([cpu_alarm('i-1', threshold=90)], current, TOPIC, PREFIXES)
+        self.assertEqual([request['AlarmName'] for request in plan['update']], ['EC2-i-1-HighCPU'])
+        self.assertEqual(plan['changed'], {'EC2-i-1-HighCPU': ['Threshold']})
+
+    def test_deletes_only_managed_orphans_notifying_our_topic(self):
+        current = existing(cpu_alarm('i-1'), cpu_alarm('gone'))
+        current.update(existing(cpu_alarm('other'), topic='arn:aws:sns:us-east-1:123456789012:someone-else'))
+        hand_made = dict(cpu_alarm('x'), AlarmName='Custom-HighCPU')
+        current.update(existing(hand_made))
+        plan = diff_alarms([cpu_alarm('i-1')], current, TOPIC, PREFIXES)
+        self.assertEqual(plan['delete'], ['EC2-gone-HighCPU'])
+
+    def test_scope_limits_deletes_to_its_resources(self):
+        current = existing(cpu_alarm('i-1'), cpu_alarm('i-2'))
+        rds = dict(cpu_alarm('db'), AlarmName='RDS-db-HighCPU', Dimensions=[{'Name': 'DBInstanceIdentifier',
+                                                                             'Value': 'db'}])
+        current.update(existing(rds))
+        # A tag-filtered or listed subset: only i-1 is known, so i-2 is left alone.
+        plan = diff_alarms([], current, TOPIC, PREFIXES, scope={('InstanceId', 'i-1')})
+        self.assertEqual(plan['delete'], ['EC2-i-1-HighCPU'])
+        # Every EC2 instance was discovered: any EC2 orphan goes, RDS ones stay.
+        plan = diff_alarms([], current, TOPIC, PREFIXES, scope={('InstanceId', None)})
+        self.assertEqual(plan['delete'], ['EC2-i-1-HighCPU', 'EC2-i-2-HighCPU'])
+        self.assertEqual(diff_alarms([], current, TOPIC, PREFIXES, scope=set())['delete'], [])
+
+class FakeCloudWatch:
+    """describe_alarms over `alarms`, two per page, failing once with each of `errors` first."""
+
+    def __init__(self, alarms, errors=()):
+        self.alarms = sorted(alarms, key=lambda alarm: alarm['AlarmName'])
+        self.errors = list(errors)
+        self.calls = []
+
+    def describe_alarms(self, AlarmNamePrefix, AlarmTypes, MaxRecords, NextToken=None):
+        self.calls.append(NextToken)
+        if self.errors:
+            raise self.errors.pop(0)
+        matching = [alarm for alarm in self.alarms if alarm['AlarmName'].startswith(AlarmNamePrefix)]
+        start = int(NextToken or 0)
+        page = {'MetricAlarms': matching[start:start + 2]}
+        if start + 2 < len(matching):
+            page['NextToken'] = str(start + 2)
+        return page
+
+class FetchAlarmsTest(unittest.TestCase):
+    def test_follows_next_token_per_prefix(self):
+        alarms = [cpu_alarm(f"i-{i}") for i in range(5)]
+        client = FakeCloudWatch(alarms + [dict(cpu_alarm('db'), AlarmName='RDS-db-HighCPU')])
+        fetched = fetch_alarms(client, PREFIXES, sleep=lambda seconds: None)
+        self.assertEqual(sorted(fetched), sorted(alarm['AlarmName'] for alarm in alarms) + ['RDS-db-HighCPU'])
+        self.assertEqual(client.calls, [None, '2', '4', None])
+
+    def test_retries_throttled_and_failed_pages(self):
+        errors = [ClientError({'Error': {'Code': 'Throttling'}}, 'DescribeAlarms'),
+                  ClientError({'Error': {'Code': 'InternalFailure'}, 'ResponseMetadata': {'HTTPStatusCode': 500}},
+                              'DescribeAlarms')]
+        client = FakeCloudWatch([cpu_alarm('i-1')], errors)
+        self.assertEqual(list(fetch_alarms(client, ['EC2-'], sleep=lambda seconds: None)), ['EC2-i-1-HighCPU'])
+        self.assertEqual(len(client.calls), 3)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,135 @@
+import unittest
+
+import boto3
+from botocore.awsrequest import AWSResponse
+from botocore.exceptions import ClientError, EndpointConnectionError, NoCredentialsError
+
+from aws_rate_limit import TokenBucket, call_with_backoff, client_config
+
+def client_error(code, status=400):
+    return ClientError({'Error': {'Code': code, 'Message': code},
+                        'ResponseMetadata': {'HTTPStatusCode': status}}, 'Operation')
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+        self.sleeps = []
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+def failing(*errors, result='ok'):
+    """A method that raises `errors` in turn, then returns `result`."""
+    calls = []
+
+    def method(**kwargs):
+        calls.append(kwargs)
+        if len(calls) <= len(errors):
+            raise errors[len(calls) - 1]
+        return result
+    method.calls = calls
+    return method
+
+class CallWithBackoffTest(unittest.TestCase):
+    def test_retries_throttling_with_capped_jitter(self):
+        method = failing(client_error('Throttling'), client_error('RequestLimitExceeded'))
+        sleeps, retries = [], []
+        result = call_with_backoff(method, base_delay=1.0, max_delay=3.0, sleep=sleeps.append,
+                                   on_retry=lambda attempt, error, delay: retries.append(attempt), Key='k')
+        self.assertEqual(result, 'ok')
+        self.assertEqual(method.calls, [{'Key': 'k'}] * 3)
+        self.assertEqual(retries, [1, 2])
+        self.assertTrue(0 <= sleeps[0] <= 2.0 and 0 <= sleeps[1] <= 3.0)
+
+    def test_gives_up_after_max_attempts(self):
+        method = failing(*[client_error('Throttling')] * 3)
+        with self.assertRaises(ClientError):
+            call_with_backoff(method, max_attempts=3, sleep=lambda seconds: None)
+        self.assertEqual(len(method.calls), 3)
+
+    def test_other_errors_are_not_retried(self):
+        for error in (client_error('ValidationError'), NoCredentialsError()):
+            method = failing(error)
+            with self.assertRaises(type(error)):
+                call_with_backoff(method, sleep=lambda seconds: None)
+            self.assertEqual(len(method.calls), 1)
+
+    def test_server_and_connection_errors_are_retried_without_slowing_the_bucket(self):
+        clock = FakeClock()
+        bucket = TokenBucket(10, clock=clock, sleep=clock.sleep)
+        method = failing(client_error('InternalFailure', 500), client_error('ServiceUnavailable', 503),
+                         EndpointConnectionError(endpoint_url='https://rds.us-east-1.amazonaws.com'))
+        self.assertEqual(call_with_backoff(method, bucket, sleep=clock.sleep), 'ok')
+        self.assertEqual(len(method.calls), 4)
+        self.assertEqual(bucket.rate, 10)
+
+    def test_throttling_slows_the_bucket(self):
+        clock = FakeClock()
+        bucket = TokenBucket(10, clock=clock, sleep=clock.sleep)
+        call_with_backoff(failing(client_error('Throttling')), bucket, sleep=clock.sleep)
+        self.assertEqual(bucket.rate, 5 + 0.5) # halved, then one success wins back a twentieth
+
+class EmptyBody:
+    def stream(self):
+        return iter([b''])
+
+class ClientConfigTest(unittest.TestCase):
+    def test_botocore_does_not_retry(self):
+        client = boto3.client('cloudwatch', region_name='us-east-1', aws_access_key_id='testing',
+                              aws_secret_access_key='testing', config=client_config())
+        sent = []
+
+        def unavailable(request, **kwargs):
+            sent.append(request)
+            return AWSResponse(request.url, 503, {}, EmptyBody())
+        client.meta.events.register('before-send', unavailable)
+        with self.assertRaises(ClientError):
+            client.describe_alarms()
+        self.assertEqual(len(sent), 1)
+
+class TokenBucketTest(unittest.TestCase):
+    def setUp(self):
+        self.clock = FakeClock()
+
+    def bucket(self, *args, **kwargs):
+        return TokenBucket(*args, clock=self.clock, sleep=self.clock.sleep, **kwargs)
+
+    def test_burst_then_rate(self):
+        bucket = self.bucket(2, burst=2)
+        for _ in range(6):
+            bucket.acquire()
+        # Two calls go straight through, the other four wait half a second each.
+        self.assertEqual(self.clock.sleeps, [0.5] * 4)
+        self.assertAlmostEqual(self.clock.now, 2.0)
+
+    def test_refills_while_idle_up_to_burst(self):
+        bucket = self.bucket(1, burst=3)
+        for _ in range(3):
+            bucket.acquire()
+        self.clock.now += 100
+        for _ in range(3):
+            bucket.acquire()
+        self.assertEqual(self.clock.sleeps, [])
+        bucket.acquire()
+        self.assertAlmostEqual(self.clock.sleeps[-1], 1.0)
+
+    def test_throttled_halves_down_to_min_rate(self):
+        bucket = self.bucket(8, min_rate=3)
+        bucket.throttled()
+        self.assertEqual(bucket.rate, 4)
+        bucket.throttled()
+        self.assertEqual(bucket.rate, 3)
+
+    def test_succeeded_recovers_up_to_max_rate(self):
+        bucket = self.bucket(20)
+        bucket.throttled()
+        for _ in range(30):
+            bucket.succeeded()
+        self.assertEqual(bucket.rate, 20)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,64 @@
+import unittest
+
+from journey_planner import describe_journey, earliest_arrival
+from schedule_store import ScheduleStore, parse_time
+
+def trip(train_id, origin, destination, departure_time, arrival_time):
+    return {'train_id': train_id, 'origin': origin, 'destination': destination,
+            'departure_time': departure_time, 'arrival_time': arrival_time}
+
+TRIPS = [
+    # T1 runs A -> B -> C; staying aboard at B is not a transfer.
+    trip('T1', 'A', 'B', '08:00', '08:30'),
+    trip('T1', 'B', 'C', '08:35', '09:00'),
+    trip('T2', 'A', 'C', '08:10', '09:30'), # direct, but later
+    trip('T3', 'B', 'D', '08:33', '08:50'), # 3 minutes after T1 reaches B
+    trip('T4', 'B', 'D', '09:00', '09:20'),
+    trip('T5', 'D', 'E', '09:10', '09:40'),
+    trip('T6', 'E', 'F', '07:00', '07:30'), # only before anything reaches E
+]
+
+def legs(store, journey):
+    return [(leg['train_id'], leg['origin'], leg['destination']) for leg in describe_journey(store, journey)['legs']]
+
+class EarliestArrivalTest(unittest.TestCase):
+    def setUp(self):
+        self.store = ScheduleStore.from_trips(TRIPS)
+
+    def plan(self, origin, destination, depart_after='00:00', **kwargs):
+        return earliest_arrival(self.store, origin, destination, parse_time(depart_after), **kwargs)
+
+    def test_staying_aboard_beats_a_slower_direct_train(self):
+        journey = self.plan('A', 'C')
+        self.assertEqual(legs(self.store, journey), [('T1', 'A', 'C')])
+        described = describe_journey(self.store, journey)
+        self.assertEqual((described['departure_time'], described['arrival_time'], described['transfers']),
+                         ('08:00', '09:00', 0))
+
+    def test_depart_after_skips_earlier_trains(self):
+        self.assertEqual(legs(self.store, self.plan('A', 'C', '08:05')), [('T2', 'A', 'C')])
+
+    def test_transfers_are_reconstructed_leg_by_leg(self):
+        journey = self.plan('A', 'E')
+        self.assertEqual(legs(self.store, journey), [('T1', 'A', 'B'), ('T3', 'B', 'D'), ('T5', 'D', 'E')])
+        described = describe_journey(self.store, journey)
+        self.assertEqual((described['arrival_time'], described['transfers']), ('09:40', 2))
+
+    def test_minimum_transfer_time(self):
+        self.assertEqual(legs(self.store, self.plan('A', 'D', min_transfer_minutes=5)),
+                         [('T1', 'A', 'B'), ('T4', 'B', 'D')])
+
+    def test_transfer_limit(self):
+        self.assertEqual(len(self.plan('A', 'D', max_transfers=1)), 2)
+        self.assertIsNone(self.plan('A', 'D', max_transfers=0))
+        self.assertIsNone(self.plan('A', 'E', max_transfers=1))
+
+    def test_unreachable_destinations(self):
+        self.assertIsNone(self.plan('A', 'F')) # T6 leaves E before we can get there
+        self.assertIsNone(self.plan('C', 'A')) # no trains back
+        self.assertIsNone(self.plan('A', 'B', '08:01'))
+        self.assertIsNone(self.plan('A', 'Nowhere'))
+        self.assertIsNone(self.plan('A', 'A'))
+
+if __name__ == '__main__':
+    unittest.main()
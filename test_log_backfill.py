@@ -0,0 +1,98 @@
+import datetime
+import gzip
+import io
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+import log_backfill
+from log_backfill import _read_lines, backfill, parse_timestamp, plan_units
+
+RULES = [
+    {"id": "failed", "pattern": r"failed password", "message": "Failed login", "level": "WARNING"},
+    {"id": "sudo", "pattern": r"sudo:", "message": "sudo", "level": "LOW"},
+]
+
+def iso_line(second, text):
+    return f"2026-03-01T10:{second // 60:02d}:{second % 60:02d} host {text}"
+
+class ReadLinesTest(unittest.TestCase):
+    CONTENTS = [
+        b'one\ntwo\nthree\n',
+        b'one\ntwo\nno newline at the end',
+        b'\n\nempty lines\n\n\nbetween\n',
+        b'a\nbb\nccc\ndddd\neeeee\nffffff\n',
+        b'x',
+        b'\n',
+    ]
+
+    def test_every_split_yields_each_line_once(self):
+        for contents in self.CONTENTS:
+            expected = contents.split(b'\n')
+            if contents.endswith(b'\n'):
+                expected.pop()
+            for split_size in range(1, len(contents) + 1):
+                for block_size in (1, 2, 5, 64):
+                    with self.subTest(contents=contents, split_size=split_size, block_size=block_size), \
+                            mock.patch.object(log_backfill, 'BLOCK_SIZE', block_size):
+                        lines = []
+                        for start in range(0, len(contents), split_size):
+                            end = start + split_size
+                            lines += _read_lines(io.BytesIO(contents), start, end if end < len(contents) else None)
+                        self.assertEqual(lines, expected)
+
+class TempDirTestCase(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+
+    def write(self, name, lines, opener=open):
+        path = os.path.join(self.directory, name)
+        with opener(path, 'wb') as f:
+            f.write(''.join(line + '\n' for line in lines).encode())
+        return path
+
+class PlanUnitsTest(TempDirTestCase):
+    def test_units(self):
+        plain = self.write('big.log', ['x' * 99] * 10) # 1000 bytes
+        small = self.write('small.log', ['x'])
+        packed = self.write('big.log.1.gz', ['x' * 99] * 100, gzip.open)
+        self.assertEqual(plan_units([plain, small, packed], split_size=300), [
+            (plain, 0, 300), (plain, 300, 600), (plain, 600, 900), (plain, 900, None),
+            (small, 0, None), (packed, 0, None),
+        ])
+        self.assertEqual(plan_units([plain], split_size=1000), [(plain, 0, None)])
+
+class BackfillTest(TempDirTestCase):
+    def test_merges_units_in_timestamp_order(self):
+        # Two files with interleaved timestamps, one gzipped, the plain one split into many units.
+        plain = [iso_line(s, f"sshd: failed password for user{s}") for s in range(0, 200, 2)]
+        packed = [iso_line(s, f"sudo: user{s} : COMMAND=/bin/ls") for s in range(1, 200, 2)]
+        noise = [iso_line(s, "cron: nothing") for s in range(200)]
+        self.write('auth.log', [line for pair in zip(plain, noise) for line in pair])
+        self.write('auth.log.2.gz', packed, gzip.open)
+
+        results = list(backfill([os.path.join(self.directory, 'auth.log*')], RULES, workers=2, split_size=500))
+        self.assertGreater(len(plan_units([os.path.join(self.directory, 'auth.log')], 500)), 10)
+        self.assertEqual([line for _, _, _, line in results], [line for pair in zip(plain, packed) for line in pair])
+        timestamps = [timestamp for timestamp, _, _, _ in results]
+        self.assertEqual(timestamps, sorted(timestamps))
+        self.assertEqual({(os.path.basename(path), rule['id']) for _, path, rule, _ in results},
+                         {('auth.log', 'failed'), ('auth.log.2.gz', 'sudo')})
+
+class ParseTimestampTest(unittest.TestCase):
+    def test_formats(self):
+        self.assertEqual(parse_timestamp('2026-03-01 10:00:05 x', (2026, 3)),
+                         datetime.datetime(2026, 3, 1, 10, 0, 5).timestamp())
+        # Syslog lines have no year: months after the file's last write are last year's.
+        self.assertEqual(parse_timestamp('Dec 31 23:59:59 host x', (2026, 1)),
+                         datetime.datetime(2025, 12, 31, 23, 59, 59).timestamp())
+        self.assertEqual(parse_timestamp('Jan  2 00:00:00 host x', (2026, 1)),
+                         datetime.datetime(2026, 1, 2).timestamp())
+        self.assertIsNone(parse_timestamp('Feb 30 00:00:00 host x', (2026, 3)))
+        self.assertIsNone(parse_timestamp('no timestamp', (2026, 3)))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,149 @@
+import json
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+import log_checkpoint
+from log_checkpoint import CheckpointStore, last_line_before
+from log_tailer import LogTailer
+
+class TempDirTestCase(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+
+    def path(self, name):
+        return os.path.join(self.directory, name)
+
+    def append(self, name, data, mode='ab'):
+        with open(self.path(name), mode) as f:
+            f.write(data)
+
+    def tailer(self, name, **kwargs):
+        tailer = LogTailer(self.path(name), **kwargs)
+        self.addCleanup(tailer.close)
+        return tailer
+
+class CheckpointStoreTest(TempDirTestCase):
+    def setUp(self):
+        super().setUp()
+        self.append('app.log', b'one\ntwo\n')
+
+    def store(self, **kwargs):
+        return CheckpointStore(self.path('checkpoints.json'), **kwargs)
+
+    def test_save_and_load(self):
+        store = self.store()
+        tailer = self.tailer('app.log', from_start=True)
+        tailer.read_lines()
+        store.record(tailer)
+        self.assertTrue(store.dirty)
+        store.flush()
+        self.assertFalse(store.dirty)
+        self.assertEqual(sorted(os.listdir(self.directory)), ['app.log', 'checkpoints.json']) # no .tmp left
+
+        entry = self.store().get(self.path('app.log'))
+        st = os.stat(self.path('app.log'))
+        self.assertEqual(entry, {"dev": st.st_dev, "ino": st.st_ino, "offset": 8,
+                                 "hash": log_checkpoint.line_hash(b'two')})
+        # Recording the same position again is not a change.
+        store.record(tailer)
+        self.assertFalse(store.dirty)
+        store.forget(self.path('app.log'))
+        store.flush()
+        self.assertIsNone(self.store().get(self.path('app.log')))
+
+    def test_failed_write_keeps_the_previous_file(self):
+        store = self.store()
+        store.record(self.tailer('app.log', from_start=True))
+        store.flush()
+        with open(self.path('checkpoints.json')) as f:
+            saved = f.read()
+        tailer = self.tailer('app.log', from_start=True)
+        tailer.read_lines()
+        store.record(tailer)
+        with mock.patch.object(log_checkpoint.os, 'replace', side_effect=OSError(28, 'No space left on device')):
+            with self.assertRaises(OSError):
+                store.flush()
+        with open(self.path('checkpoints.json')) as f:
+            self.assertEqual(f.read(), saved)
+        self.assertTrue(store.dirty)
+
+    def test_unreadable_file_starts_empty(self):
+        self.append('checkpoints.json', b'{"files": ', mode='wb')
+        with mock.patch('builtins.print') as printed:
+            self.assertEqual(self.store().entries, {})
+        self.assertIn('ignoring unreadable checkpoint file', printed.call_args[0][0])
+
+    def test_flush_interval(self):
+        flushed = []
+        with mock.patch.object(log_checkpoint.time, 'monotonic', return_value=100.0):
+            store = self.store(flush_interval=5, before_flush=lambda: flushed.append(True))
+            self.assertIsNone(store.due_in())
+            store.record(self.tailer('app.log'))
+        with mock.patch.object(log_checkpoint.time, 'monotonic', return_value=103.0):
+            self.assertEqual(store.due_in(), 2.0)
+            store.maybe_flush()
+            self.assertEqual(flushed, [])
+        with mock.patch.object(log_checkpoint.time, 'monotonic', return_value=105.0):
+            store.maybe_flush()
+        self.assertEqual(flushed, [True])
+        with open(self.path('checkpoints.json')) as f:
+            self.assertIn(self.path('app.log'), json.load(f)["files"])
+
+class ResumeTest(TempDirTestCase):
+    def setUp(self):
+        super().setUp()
+        self.append('app.log', b'one\ntwo\n')
+        tailer = LogTailer(self.path('app.log'), from_start=True)
+        self.assertEqual(tailer.read_lines(), ['one', 'two'])
+        store = CheckpointStore(self.path('checkpoints.json'))
+        store.record(tailer)
+        store.flush()
+        tailer.close()
+
+    def resume(self):
+        """A tailer started the way a restarted agent starts one: not from the start."""
+        checkpoint = CheckpointStore(self.path('checkpoints.json')).get(self.path('app.log'))
+        return self.tailer('app.log', checkpoint=checkpoint).read_lines()
+
+    def test_resumes_after_the_last_processed_line(self):
+        self.append('app.log', b'three\n')
+        self.assertEqual(self.resume(), ['three'])
+
+    def test_rotated_while_down(self):
+        self.append('app.log', b'three\n')
+        os.rename(self.path('app.log'), self.path('app.log.1'))
+        self.append('app.log', b'four\n', mode='wb')
+        self.assertEqual(self.resume(), ['three', 'four'])
+
+    def test_replaced_file_is_read_from_the_start(self):
+        # Another inode at the path, and the old one gone.
+        os.remove(self.path('app.log'))
+        self.append('app.log', b'new one\nnew two\nnew three\n', mode='wb')
+        self.assertEqual(self.resume(), ['new one', 'new two', 'new three'])
+
+    def test_truncated_file_is_read_from_the_start(self):
+        self.append('app.log', b'x\n', mode='wb')
+        self.assertEqual(self.resume(), ['x'])
+
+    def test_rewritten_file_is_read_from_the_start(self):
+        # Same inode and size, but the checkpointed line is no longer there.
+        self.append('app.log', b'uno\ndos\n', mode='r+b')
+        self.assertEqual(self.resume(), ['uno', 'dos'])
+
+class LastLineBeforeTest(TempDirTestCase):
+    def test_last_line_before(self):
+        self.append('app.log', b'one\ntwo\npartial')
+        with open(self.path('app.log'), 'rb') as f:
+            self.assertEqual(last_line_before(f, 0), b'')
+            self.assertEqual(last_line_before(f, 4), b'one')
+            self.assertEqual(last_line_before(f, 8), b'two')
+            self.assertIsNone(last_line_before(f, 7)) # not a line end
+            self.assertIsNone(last_line_before(f, 100)) # past the end
+            self.assertIsNone(last_line_before(f, 8, max_length=2))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,125 @@
+import unittest
+
+from log_correlation import BoundedState, Correlator
+
+FAILED = {"id": "ssh_failed", "pattern": r"Failed password for (?P<user>\S+) from (?P<ip>[\d.]+)",
+          "message": "Failed login", "level": "WARNING", "key": ["ip"],
+          "threshold": {"count": 3, "window": 60}}
+ACCEPTED = {"id": "ssh_accepted", "pattern": r"Accepted password for (?P<user>\S+) from (?P<ip>[\d.]+)",
+            "message": "Login", "level": "LOW", "key": "ip", "cooldown": 30}
+BRUTE_FORCE = {"id": "brute_force_success", "sequence": ["ssh_failed", "ssh_accepted"], "key": ["ip"],
+               "window": 300, "message": "Login after failures", "level": "HIGH"}
+
+def failed(ip, user='root'):
+    return f"sshd[1]: Failed password for {user} from {ip} port 22 ssh2"
+
+def accepted(ip, user='root'):
+    return f"sshd[1]: Accepted password for {user} from {ip} port 22 ssh2"
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def advance(self, seconds):
+        self.now += seconds
+
+class CorrelatorTestCase(unittest.TestCase):
+    def setUp(self):
+        self.clock = FakeClock()
+
+    def build(self, rules=(FAILED, ACCEPTED), correlations=(), **kwargs):
+        self.correlator = Correlator(rules, correlations, **kwargs)
+
+    def observe(self, rule, line, after=0):
+        self.clock.advance(after)
+        return [(alert.get("id"), detail) for alert, _, detail in self.correlator.observe(rule, line, self.clock.now)]
+
+class ThresholdTest(CorrelatorTestCase):
+    def setUp(self):
+        super().setUp()
+        self.build()
+
+    def test_alerts_once_the_count_is_reached_then_cools_down(self):
+        self.assertEqual(self.observe(FAILED, failed('10.0.0.1')), [])
+        self.assertEqual(self.observe(FAILED, failed('10.0.0.2')), []) # another key
+        self.assertEqual(self.observe(FAILED, failed('10.0.0.1'), after=10), [])
+        self.assertEqual(self.observe(FAILED, failed('10.0.0.1'), after=10),
+                         [('ssh_failed', '3 matches in 60s for ip=10.0.0.1')])
+        # The cooldown defaults to the window.
+        self.assertEqual(self.observe(FAILED, failed('10.0.0.1'), after=30), [])
+        self.assertEqual(self.observe(FAILED, failed('10.0.0.1'), after=10), [])
+        self.assertEqual(self.observe(FAILED, failed('10.0.0.1'), after=21),
+                         [('ssh_failed', '3 matches in 60s for ip=10.0.0.1')])
+
+    def test_matches_leave_the_window(self):
+        for _ in range(2):
+            self.assertEqual(self.observe(FAILED, failed('10.0.0.1'), after=1), [])
+        self.assertEqual(self.observe(FAILED, failed('10.0.0.1'), after=70), [])
+        self.assertEqual(self.observe(FAILED, failed('10.0.0.1'), after=1), [])
+        self.assertEqual(len(self.observe(FAILED, failed('10.0.0.1'), after=1)), 1)
+
+    def test_plain_rule_cooldown(self):
+        self.assertEqual(self.observe(ACCEPTED, accepted('10.0.0.1')), [('ssh_accepted', None)])
+        self.assertEqual(self.observe(ACCEPTED, accepted('10.0.0.1'), after=29), [])
+        self.assertEqual(self.observe(ACCEPTED, accepted('10.0.0.2')), [('ssh_accepted', None)])
+        self.assertEqual(self.observe(ACCEPTED, accepted('10.0.0.1'), after=1), [('ssh_accepted', None)])
+
+    def test_every_match_alerts_without_a_cooldown(self):
+        rule = {"pattern": r"sudo:", "message": "sudo", "level": "LOW"}
+        self.build([rule])
+        self.assertEqual([self.observe(rule, "sudo: x") for _ in range(3)], [[(None, None)]] * 3)
+
+class SequenceTest(CorrelatorTestCase):
+    def setUp(self):
+        super().setUp()
+        self.build(correlations=[BRUTE_FORCE])
+
+    def alerts(self, rule, line, after=0):
+        return [alert for alert in self.observe(rule, line, after) if alert[0] == 'brute_force_success']
+
+    def test_sequence_for_the_same_key(self):
+        self.assertEqual(self.alerts(FAILED, failed('10.0.0.1')), [])
+        self.assertEqual(self.alerts(ACCEPTED, accepted('10.0.0.2'), after=10), [])
+        self.assertEqual(self.alerts(ACCEPTED, accepted('10.0.0.1'), after=10),
+                         [('brute_force_success', 'ssh_failed -> ssh_accepted within 300s for ip=10.0.0.1')])
+        # Completing a sequence starts it over.
+        self.assertEqual(self.alerts(ACCEPTED, accepted('10.0.0.1'), after=40), [])
+
+    def test_out_of_order_or_too_late(self):
+        self.assertEqual(self.alerts(ACCEPTED, accepted('10.0.0.1')), [])
+        self.assertEqual(self.alerts(FAILED, failed('10.0.0.1'), after=1), [])
+        self.assertEqual(self.alerts(ACCEPTED, accepted('10.0.0.1'), after=301), [])
+
+class BoundedStateTest(CorrelatorTestCase):
+    def test_lru_eviction(self):
+        state = BoundedState(2)
+        state.touch('a', 1)
+        state.touch('b', 2)
+        state.touch('a', 3) # now the most recent
+        state.touch('c', 4)
+        self.assertEqual(list(state.items()), [('a', 3), ('c', 4)])
+
+    def test_per_key_state_stays_bounded(self):
+        rule = dict(FAILED, threshold={"count": 2, "window": 60})
+        self.build([rule], max_keys=2)
+        for ip in ('10.0.0.1', '10.0.0.2', '10.0.0.3'):
+            self.assertEqual(self.observe(rule, failed(ip), after=1), [])
+        self.assertEqual(len(self.correlator._counters), 2)
+        # 10.0.0.1 was evicted, so its count starts over; 10.0.0.3 was kept.
+        self.assertEqual(self.observe(rule, failed('10.0.0.1'), after=1), [])
+        self.assertEqual(len(self.observe(rule, failed('10.0.0.3'), after=1)), 1)
+
+class ValidateTest(unittest.TestCase):
+    def test_rejects_unusable_settings(self):
+        for rules, correlations in (
+                ([dict(FAILED, key=["host"])], []),
+                ([dict(FAILED, threshold={"count": 0, "window": 60})], []),
+                ([dict(ACCEPTED, cooldown=-1)], []),
+                ([FAILED], [BRUTE_FORCE]), # ssh_accepted is unknown
+                ([FAILED, ACCEPTED], [dict(BRUTE_FORCE, window=0)]),
+                ([FAILED, ACCEPTED], [dict(BRUTE_FORCE, key=["port"])])):
+            with self.subTest(rules=rules, correlations=correlations), self.assertRaises(ValueError):
+                Correlator(rules, correlations)
+
+if __name__ == '__main__':
+    unittest.main()
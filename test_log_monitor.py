@@ -0,0 +1,94 @@
+import random
+import re
+import unittest
+
+from log_monitor import SECURITY_PATTERNS, RuleSet, _required_keywords, sre_parse
+
+# Rules the prefilter cannot derive a keyword for, so they must run on every line.
+NO_KEYWORD_RULES = [
+    {"id": "ip_only", "pattern": r"\b\d{1,3}(?:\.\d{1,3}){3}\b", "message": "IP", "level": "LOW"},
+    {"id": "short_literal", "pattern": r"rm|su\b", "message": "Short", "level": "LOW"},
+    {"id": "optional_word", "pattern": r"(?:error)?\s*\d{2,}", "message": "Number", "level": "LOW"},
+]
+
+LINES = [
+    "Jan 1 00:00:01 host sshd[1]: Failed password for root from 10.0.0.5 port 22 ssh2",
+    "Jan 1 00:00:02 host sshd[1]: pam_unix(sshd:auth): authentication failure; rhost=192.168.1.9",
+    "Jan 1 00:00:03 host sshd[1]: FAILED PASSWORD for admin",
+    "Jan 1 00:00:04 host sudo:   alice : TTY=pts/0 ; PWD=/ ; USER=root ; COMMAND=/bin/bash",
+    "Jan 1 00:00:05 host sudo: bob : COMMAND=/bin/sh -c id",
+    "Jan 1 00:00:06 host useradd[7]: new user: name=mallory, UID=1001",
+    "Jan 1 00:00:07 host usermod[8]: change user 'eve' password",
+    "Jan 1 00:00:08 host sshd: session opened for user root by (uid=0)",
+    "Jan 1 00:00:09 host bash: rm -rf /tmp/x; chmod 777 /etc/passwd; chown root /bin/x",
+    "Jan 1 00:00:10 host CRON[9]: (root) CMD (run-parts /etc/cron.hourly)",
+    "Jan 1 00:00:11 host CRON (root) CMD (backup)",
+    "Jan 1 00:00:12 host kernel: nothing to see here, error code=42",
+    "Jan 1 00:00:13 host su: pam_unix(su:session): session opened",
+    "",
+]
+
+def naive_matches(rules, line):
+    """Every rule's regex run on its own, in rule order."""
+    results = []
+    for rule in rules:
+        found = re.compile(rule["pattern"], re.IGNORECASE).search(line)
+        if found:
+            results.append((rule["id"], found.span(), found.groupdict()))
+    return results
+
+def single_pass_matches(rule_set, line):
+    return [(rule["id"], found.span(), found.groupdict()) for rule, found in rule_set.match(line)]
+
+def shuffled_lines(count, seed=3):
+    """Lines spliced together from LINES, with random case, to hit keywords in odd places."""
+    rng = random.Random(seed)
+    lines = []
+    for _ in range(count):
+        parts = [rng.choice(LINES) for _ in range(rng.randrange(1, 3))]
+        line = ' '.join(part[rng.randrange(len(part) + 1):] for part in parts)
+        lines.append(''.join(c.upper() if rng.random() < 0.3 else c for c in line))
+    return lines
+
+class RuleSetTest(unittest.TestCase):
+    def assertEquivalent(self, rules, lines):
+        rule_set = RuleSet(rules)
+        for line in lines:
+            with self.subTest(line=line):
+                self.assertEqual(single_pass_matches(rule_set, line), naive_matches(rules, line))
+
+    def test_security_patterns_match_like_separate_regexes(self):
+        rule_set = RuleSet(SECURITY_PATTERNS)
+        self.assertEqual(rule_set.always, [])
+        self.assertEquivalent(SECURITY_PATTERNS, LINES + shuffled_lines(500))
+
+    def test_rules_without_keywords_run_on_every_line(self):
+        rules = SECURITY_PATTERNS + NO_KEYWORD_RULES
+        rule_set = RuleSet(rules)
+        self.assertEqual([rules[i]["id"] for i in rule_set.always], [rule["id"] for rule in NO_KEYWORD_RULES])
+        self.assertEquivalent(rules, LINES + shuffled_lines(500, seed=4))
+
+    def test_only_keyword_free_rules(self):
+        self.assertIsNone(RuleSet(NO_KEYWORD_RULES).prefilter)
+        self.assertEquivalent(NO_KEYWORD_RULES, LINES)
+
+class RequiredKeywordsTest(unittest.TestCase):
+    def keywords(self, pattern):
+        return _required_keywords(sre_parse.parse(pattern, re.IGNORECASE))
+
+    def test_keywords(self):
+        self.assertEqual(self.keywords(r"sshd: session opened"), {"sshd: session opened"})
+        self.assertEqual(self.keywords(r"(?:groupadd|useradd)\s+x"), {"groupadd", "useradd"})
+        # The parser factors out common prefixes, which are required keywords too.
+        self.assertEqual(self.keywords(r"useradd|usermod"), {"user"})
+        self.assertEqual(self.keywords(r"rm -rf|chmod 777|chown root"), {"rm -rf", "chmod 777", "chown root"})
+        # The longest run that every match must contain wins.
+        self.assertEqual(self.keywords(r"CRON \(root\) CMD"), {"cron (root) cmd"})
+
+    def test_no_keywords(self):
+        for pattern in (r"\d+", r"ab", r"rm|su", r"(?:error)?\d", r"[abc]+", r"error|\d+"):
+            with self.subTest(pattern):
+                self.assertIsNone(self.keywords(pattern))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,101 @@
+import contextlib
+import copy
+import io
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+from log_rules import RuleFile, parse_rule_file, yaml
+
+RULES = {
+    'rules': [
+        {'id': 'ssh_fail', 'pattern': r'Failed password for \S+ from (?P<ip>\S+)', 'message': 'SSH failure',
+         'level': 'WARNING', 'key': ['ip'], 'threshold': {'count': 5, 'window': 60}, 'cooldown': 300},
+        {'id': 'ssh_ok', 'pattern': r'Accepted password for \S+ from (?P<ip>\S+)', 'message': 'SSH login',
+         'level': 'INFO', 'key': 'ip', 'sources': ['*/auth.log']},
+    ],
+    'correlations': [
+        {'id': 'brute_force_success', 'sequence': ['ssh_fail', 'ssh_ok'], 'key': 'ip', 'window': 600,
+         'message': 'Login after repeated failures', 'level': 'CRITICAL', 'cooldown': 60},
+    ],
+}
+
+def encoded(document):
+    return json.dumps(document).encode('utf-8')
+
+def edited(path, value):
+    """RULES with the field at `path` (e.g. ('rules', 0, 'cooldown')) set to `value`."""
+    document = copy.deepcopy(RULES)
+    target = document
+    for step in path[:-1]:
+        target = target[step]
+    target[path[-1]] = value
+    return document
+
+class ParseRuleFileTest(unittest.TestCase):
+    def test_json(self):
+        rules, correlations = parse_rule_file('rules.json', encoded(RULES))
+        self.assertEqual([rule['id'] for rule in rules], ['ssh_fail', 'ssh_ok'])
+        self.assertEqual(correlations[0]['sequence'], ['ssh_fail', 'ssh_ok'])
+
+    @unittest.skipIf(yaml is None, "PyYAML is not installed")
+    def test_yaml(self):
+        rules, correlations = parse_rule_file('rules.yml', yaml.safe_dump(RULES).encode('utf-8'))
+        self.assertEqual(rules, RULES['rules'])
+        self.assertEqual(correlations, RULES['correlations'])
+
+    def test_invalid_files(self):
+        cases = {
+            'not JSON': b'{"rules": [',
+            'no rules list': encoded({'rules': {}}),
+            'missing message': encoded(edited(('rules', 0, 'message'), None)),
+            'bad pattern': encoded(edited(('rules', 0, 'pattern'), '(unclosed')),
+            'sources not a list': encoded(edited(('rules', 1, 'sources'), '*/auth.log')),
+            'string cooldown': encoded(edited(('rules', 0, 'cooldown'), '60')),
+            'boolean cooldown': encoded(edited(('rules', 0, 'cooldown'), True)),
+            'negative cooldown': encoded(edited(('correlations', 0, 'cooldown'), -1)),
+            'list id': encoded(edited(('rules', 0, 'id'), ['ssh_fail'])),
+            'numeric key': encoded(edited(('rules', 0, 'key'), 1)),
+            'key list with a number': encoded(edited(('rules', 0, 'key'), ['ip', 2])),
+            'key not a group': encoded(edited(('rules', 0, 'key'), ['user'])),
+            'duplicate id': encoded(edited(('rules', 1, 'id'), 'ssh_fail')),
+            'zero threshold': encoded(edited(('rules', 0, 'threshold'), {'count': 0, 'window': 60})),
+            'unknown sequence step': encoded(edited(('correlations', 0, 'sequence'), ['ssh_fail', 'nope'])),
+            'correlation list id': encoded(edited(('correlations', 0, 'id'), ['x'])),
+            'correlation without window': encoded(edited(('correlations', 0, 'window'), None)),
+        }
+        for name, data in cases.items():
+            with self.subTest(name), self.assertRaises(ValueError):
+                parse_rule_file('rules.json', data)
+
+class RuleFileTest(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        self.path = os.path.join(directory, 'rules.json')
+        self.write(RULES)
+        self.rule_file = RuleFile(self.path, check_interval=0)
+
+    def write(self, document):
+        with open(self.path, 'wb') as f:
+            f.write(encoded(document))
+        # Make sure the change is seen even within the mtime granularity.
+        os.utime(self.path, ns=(0, os.stat(self.path).st_mtime_ns + 1_000_000_000))
+
+    def test_reloads_changed_rules(self):
+        self.write(edited(('rules', 0, 'cooldown'), 30))
+        self.assertTrue(self.rule_file.reload_if_changed())
+        self.assertEqual(self.rule_file.rules[0]['cooldown'], 30)
+        self.assertFalse(self.rule_file.reload_if_changed())
+
+    def test_bad_edit_keeps_current_rules(self):
+        self.write(edited(('rules', 0, 'id'), ['ssh_fail']))
+        with contextlib.redirect_stdout(io.StringIO()) as output:
+            self.assertFalse(self.rule_file.reload_if_changed())
+        self.assertIn('keeping current rules', output.getvalue())
+        self.assertEqual(self.rule_file.rules[0]['id'], 'ssh_fail')
+
+if __name__ == '__main__':
+    unittest.main()
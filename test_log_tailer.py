@@ -0,0 +1,169 @@
+import asyncio
+import gzip
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+import log_tailer
+from log_tailer import InotifyWatcher, LogTailer, PollingWatcher, make_watcher, tail_many
+
+class TempDirTestCase(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+
+    def path(self, name):
+        return os.path.join(self.directory, name)
+
+    def append(self, name, data, mode='ab'):
+        with open(self.path(name), mode) as f:
+            f.write(data)
+
+class LogTailerTest(TempDirTestCase):
+    def setUp(self):
+        super().setUp()
+        self.append('app.log', b'old\n')
+
+    def tailer(self, **kwargs):
+        tailer = LogTailer(self.path('app.log'), **kwargs)
+        self.addCleanup(tailer.close)
+        return tailer
+
+    def test_complete_lines_only(self):
+        tailer = self.tailer()
+        self.assertEqual(tailer.read_lines(), []) # starts at the end
+        self.append('app.log', b'one\ntw')
+        self.assertEqual(tailer.read_lines(), ['one'])
+        self.append('app.log', b'o\nthree\n')
+        self.assertEqual(tailer.read_lines(), ['two', 'three'])
+        self.assertEqual(tailer.offset, os.path.getsize(self.path('app.log')))
+        self.assertEqual(self.tailer(from_start=True).read_lines(), ['old', 'one', 'two', 'three'])
+
+    def test_rename_rotation_drains_the_old_file(self):
+        tailer = self.tailer()
+        self.append('app.log', b'before\nunterminated')
+        os.rename(self.path('app.log'), self.path('app.log.1'))
+        self.append('app.log.1', b' tail\n') # written by a process still holding the old file
+        self.append('app.log', b'new\n', mode='wb')
+        self.assertEqual(tailer.read_lines(), ['before', 'unterminated tail', 'new'])
+        self.append('app.log', b'newer\n')
+        self.assertEqual(tailer.read_lines(), ['newer'])
+
+    def test_keeps_the_old_file_until_the_path_is_recreated(self):
+        tailer = self.tailer()
+        os.rename(self.path('app.log'), self.path('app.log.1'))
+        self.append('app.log.1', b'late\n')
+        self.assertEqual(tailer.read_lines(), ['late'])
+        self.append('app.log', b'fresh\n', mode='wb')
+        self.assertEqual(tailer.read_lines(), ['fresh'])
+
+    def test_truncation_restarts_at_the_beginning(self):
+        tailer = self.tailer()
+        self.append('app.log', b'one\ntwo\n')
+        self.assertEqual(tailer.read_lines(), ['one', 'two'])
+        self.append('app.log', b'x\n', mode='wb') # copytruncate, then a shorter write
+        self.assertEqual(tailer.read_lines(), ['x'])
+        self.assertEqual(tailer.offset, 2)
+
+    def test_max_bytes_sets_more(self):
+        tailer = self.tailer()
+        self.append('app.log', b''.join(b'line %d\n' % i for i in range(30000)))
+        lines = tailer.read_lines(max_bytes=log_tailer.READ_SIZE)
+        self.assertTrue(tailer.more)
+        while tailer.more:
+            lines += tailer.read_lines(max_bytes=log_tailer.READ_SIZE)
+        self.assertEqual(lines, [f"line {i}" for i in range(30000)])
+
+class TailManyTest(TempDirTestCase):
+    def tail(self, patterns, steps, **kwargs):
+        """
+        Runs tail_many() as a task. Each step is (action, expected): the
+        action runs, then we wait until the lines seen so far equal expected.
+        Returns the (file name, line) pairs seen, in order.
+        """
+        seen = []
+
+        def on_lines(path, lines):
+            seen.extend((os.path.basename(path), line) for line in lines)
+
+        async def run():
+            task = asyncio.ensure_future(tail_many(patterns, on_lines, recheck_interval=0.05, **kwargs))
+            try:
+                for action, expected in steps:
+                    action()
+                    for _ in range(200):
+                        if sorted(seen) == sorted(expected) or task.done():
+                            break
+                        await asyncio.sleep(0.01)
+                    self.assertEqual(sorted(seen), sorted(expected))
+                await asyncio.sleep(0.2) # nothing more turns up
+            finally:
+                task.cancel()
+                await asyncio.gather(task, return_exceptions=True)
+
+        asyncio.run(run())
+        return seen
+
+    def test_glob_expansion_skips_compressed_files(self):
+        self.append('a.log', b'a1\n')
+        self.append('b.log', b'b1\n')
+        # Stored uncompressed, so the raw bytes hold newlines too.
+        with gzip.open(self.path('a.log.1.gz'), 'wb', compresslevel=0) as f:
+            f.write(b'compressed\n' * 10)
+        first = [('a.log', 'a1'), ('b.log', 'b1')]
+        seen = self.tail([self.path('*.log*')], [
+            (lambda: None, first),
+            # Files that appear later under the glob are read from the start.
+            (lambda: self.append('c.log', b'c1\nc2\n'), first + [('c.log', 'c1'), ('c.log', 'c2')]),
+            (lambda: self.append('a.log', b'a2\n'), first + [('c.log', 'c1'), ('c.log', 'c2'), ('a.log', 'a2')]),
+        ], from_start=True)
+        self.assertEqual([line for name, line in seen if name == 'c.log'], ['c1', 'c2'])
+
+    def test_rotated_copy_is_not_read_again(self):
+        self.append('auth.log', b'one\ntwo\n')
+
+        def rotate():
+            os.rename(self.path('auth.log'), self.path('auth.log.1'))
+            self.append('auth.log', b'three\n', mode='wb')
+
+        seen = self.tail([self.path('auth.log*')], [
+            (lambda: None, [('auth.log', 'one'), ('auth.log', 'two')]),
+            (rotate, [('auth.log', 'one'), ('auth.log', 'two'), ('auth.log', 'three')]),
+        ], from_start=True)
+        self.assertEqual([line for _, line in seen], ['one', 'two', 'three'])
+
+    def test_returns_when_nothing_matches(self):
+        self.assertEqual(self.tail([self.path('*.log'), self.path('missing.log')], []), [])
+
+class WatcherTest(TempDirTestCase):
+    def test_falls_back_to_polling(self):
+        with mock.patch.object(log_tailer, 'InotifyWatcher', side_effect=OSError(24, 'Too many open files')):
+            self.assertIsInstance(make_watcher(), PollingWatcher)
+        with mock.patch.object(sys, 'platform', 'darwin'):
+            self.assertIsInstance(make_watcher(), PollingWatcher)
+
+    def test_polling_backs_off_while_idle(self):
+        watcher = PollingWatcher(min_interval=0.01, max_interval=0.05)
+        self.assertEqual([watcher.backoff() for _ in range(5)], [0.01, 0.02, 0.04, 0.05, 0.05])
+        watcher.activity(False)
+        self.assertEqual(watcher.interval, 0.05)
+        watcher.activity(True)
+        self.assertEqual(watcher.interval, 0.01)
+        self.assertIsNone(watcher.wait(0))
+
+    @unittest.skipUnless(sys.platform.startswith('linux'), "inotify is Linux-only")
+    def test_inotify_reports_writes_and_renames(self):
+        self.append('app.log', b'')
+        watcher = InotifyWatcher()
+        self.addCleanup(watcher.close)
+        watcher.add(self.path('app.log'))
+        self.assertEqual(watcher.wait(0), set())
+        self.append('app.log', b'line\n')
+        os.rename(self.path('app.log'), self.path('app.log.1'))
+        self.assertEqual(watcher.wait(1), {self.path('app.log'), self.path('app.log.1')})
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,177 @@
+import io
+import json
+import threading
+import time
+import unittest
+
+from rds_export_verify import PARQUET_MAGIC, QUEUED_PER_WORKER, parquet_footer_rows, verify_export
+
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError: # Only for the cross-check against real Parquet files
+    pyarrow = None
+
+# Just enough of the thrift compact protocol to write FileMetaData structs.
+I32, I64, BINARY, LIST, STRUCT = 5, 6, 8, 9, 12
+
+def varint(n):
+    out = bytearray()
+    while True:
+        byte, n = n & 0x7f, n >> 7
+        if not n:
+            return bytes(out + bytes([byte]))
+        out.append(byte | 0x80)
+
+def zigzag(n):
+    return varint((n << 1) ^ (n >> 63))
+
+def field(delta, field_type, payload):
+    return bytes([delta << 4 | field_type]) + payload
+
+def binary(value):
+    return varint(len(value)) + value
+
+def struct_list(structs):
+    return bytes([len(structs) << 4 | STRUCT]) + b''.join(structs)
+
+def row_group(rows, total_bytes=1024):
+    return (field(1, LIST, bytes([STRUCT])) # no column chunks
+            + field(1, I64, zigzag(total_bytes)) + field(1, I64, zigzag(rows)) + b'\0')
+
+def file_metadata(num_rows, groups):
+    schema = [field(4, BINARY, binary(b'schema')) + b'\0', field(4, BINARY, binary(b'id')) + b'\0']
+    return (field(1, I32, zigzag(1)) + field(1, LIST, struct_list(schema)) + field(1, I64, zigzag(num_rows))
+            + field(1, LIST, struct_list(groups))
+            + field(2, BINARY, binary(b'parquet-mr version 1.12.0')) + b'\0')
+
+class ParquetFooterRowsTest(unittest.TestCase):
+    def test_rows_and_row_groups(self):
+        footer = file_metadata(300_000, [row_group(131_072), row_group(131_072), row_group(37_856)])
+        self.assertEqual(parquet_footer_rows(footer), (300_000, [131_072, 131_072, 37_856]))
+
+    def test_empty_file(self):
+        self.assertEqual(parquet_footer_rows(file_metadata(0, [])), (0, []))
+
+    def test_row_group_without_row_count(self):
+        group = field(1, LIST, bytes([STRUCT])) + field(1, I64, zigzag(10)) + b'\0'
+        self.assertEqual(parquet_footer_rows(file_metadata(5, [group])), (5, [None]))
+
+    def test_truncated_footer(self):
+        footer = file_metadata(10, [row_group(10)])
+        with self.assertRaises(IndexError):
+            parquet_footer_rows(footer[:len(footer) // 2])
+
+    @unittest.skipIf(pyarrow is None, "pyarrow is not installed")
+    def test_matches_pyarrow(self):
+        table = pyarrow.table({'id': list(range(2500)), 'name': [f"row {i}" for i in range(2500)]})
+        buffer = io.BytesIO()
+        pyarrow.parquet.write_table(table, buffer, row_group_size=1000)
+        data = buffer.getvalue()
+        self.assertEqual(data[-4:], PARQUET_MAGIC)
+        footer_length = int.from_bytes(data[-8:-4], 'little')
+        self.assertEqual(parquet_footer_rows(data[-8 - footer_length:-8]), (2500, [1000, 1000, 500]))
+
+def parquet_file(rows, data_bytes):
+    footer = file_metadata(rows, [row_group(rows)])
+    return PARQUET_MAGIC + b'\0' * data_bytes + footer + len(footer).to_bytes(4, 'little') + PARQUET_MAGIC
+
+class FakeS3:
+    """list_objects_v2 and (ranged) get_object over a dict, counting concurrent gets."""
+
+    def __init__(self, objects, page_size=3):
+        self.objects = objects
+        self.page_size = page_size
+        self.delay = 0.001
+        self.active = self.max_active = 0
+        self.lock = threading.Lock()
+
+    def list_objects_v2(self, Bucket, Prefix, ContinuationToken=None):
+        keys = sorted(key for key in self.objects if key.startswith(Prefix))
+        start = int(ContinuationToken or 0)
+        page = keys[start:start + self.page_size]
+        response = {'Contents': [{'Key': key, 'Size': len(self.objects[key])} for key in page],
+                    'IsTruncated': start + self.page_size < len(keys)}
+        if response['IsTruncated']:
+            response['NextContinuationToken'] = str(start + self.page_size)
+        return response
+
+    def get_object(self, Bucket, Key, Range=None):
+        with self.lock:
+            self.active += 1
+            self.max_active = max(self.max_active, self.active)
+        try:
+            time.sleep(self.delay)
+            data = self.objects[Key]
+            if Range:
+                first, _, last = Range[len('bytes='):].partition('-')
+                data = data[-int(last):] if not first else data[int(first):int(last) + 1]
+            return {'Body': io.BytesIO(data)}
+        finally:
+            with self.lock:
+                self.active -= 1
+
+def export(tables, stray=()):
+    """S3 objects of an export with `tables` ({target: (files, sizeGB)}) under exports/task/."""
+    root = 'exports/task/'
+    objects = {f"{root}export_tables_info_task_from_1_to_2.json": json.dumps({'perTableStatus': [
+        {'target': target, 'status': 'COMPLETE', 'sizeGB': size_gb} for target, (_, size_gb) in tables.items()
+    ]}).encode()}
+    for target, (files, _) in tables.items():
+        database, _, table = target.partition('.')
+        for i, data in enumerate(files):
+            objects[f"{root}{database}/{table}/1/part-{i:05d}.parquet"] = data
+    for key in stray:
+        objects[f"{root}{key}"] = parquet_file(1, 0)
+    return objects
+
+class VerifyExportTest(unittest.TestCase):
+    def test_good_export(self):
+        files = [parquet_file(100, 1000) for _ in range(40)]
+        size_gb = sum(len(data) for data in files) / 2 ** 30
+        s3 = FakeS3(export({'shop.public.orders': (files, size_gb)}))
+        report = verify_export(s3, 'bucket', 'task', 'exports', workers=2)
+        self.assertTrue(report['ok'], report)
+        self.assertEqual((report['files'], report['rows']), (40, 4000))
+        self.assertEqual(report['tables'][0]['files'], 40)
+        self.assertLessEqual(s3.max_active, 2)
+
+    def test_in_flight_checks_are_bounded(self):
+        s3 = FakeS3(export({'shop.public.orders': ([parquet_file(1, 0)] * 50, 0)}), page_size=1)
+        s3.delay = 0.005
+        finished, behind = [0], []
+        get_object, list_objects_v2 = s3.get_object, s3.list_objects_v2
+
+        def counted_get(**kwargs):
+            response = get_object(**kwargs)
+            with s3.lock:
+                finished[0] += 1
+            return response
+
+        def listing(**kwargs):
+            listed = int(kwargs.get('ContinuationToken') or 0)
+            behind.append(listed - 1 - finished[0]) # data files listed but not checked yet
+            return list_objects_v2(**kwargs)
+        s3.get_object, s3.list_objects_v2 = counted_get, listing
+        report = verify_export(s3, 'bucket', 'task', 'exports', workers=2)
+        self.assertEqual(report['files'], 50)
+        self.assertLessEqual(max(behind), 2 * QUEUED_PER_WORKER)
+
+    def test_problems(self):
+        truncated = parquet_file(10, 10)[:-4]
+        s3 = FakeS3(export({
+            'shop.public.orders': ([parquet_file(10, 100), truncated], 0.0),
+            'shop.public.items': ([parquet_file(10, 100)], 1.5),
+            'shop.public.empty': ([], 0.2),
+        }, stray=['shop/public.extra/1/part-00000.parquet']))
+        report = verify_export(s3, 'bucket', 'task', 'exports')
+        self.assertFalse(report['ok'])
+        problems = {table['target']: table['problems'] for table in report['tables']}
+        self.assertEqual(len(problems['shop.public.orders']), 1)
+        self.assertIn('PAR1', problems['shop.public.orders'][0])
+        self.assertIn('manifest says 1.5 GB', problems['shop.public.items'][0])
+        self.assertEqual(problems['shop.public.empty'], ['no data files'])
+        self.assertEqual(report['problems'], ['1 data file(s) in shop/public.extra/ not listed in the manifest'])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,204 @@
+import datetime
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+import boto3
+from botocore.exceptions import ClientError
+from botocore.stub import ANY, Stubber
+
+import rds_s3_backup
+from rds_s3_backup import (BackupStateStore, advance_backup, backup_instances, get_client, lambda_handler,
+                           snapshot_identifier_for, verify_exports)
+
+NOW = 1_700_000_000
+DB = 'orders-db'
+SNAPSHOT = snapshot_identifier_for(f"manual-backup-{DB}", datetime.datetime.fromtimestamp(NOW))
+EXPORT = f"export-{SNAPSHOT}"
+KMS_KEY = 'arn:aws:kms:us-east-1:123456789012:key/backup'
+
+def snapshot_filter(identifier=SNAPSHOT):
+    return {'Filters': [{'Name': 'db-snapshot-id', 'Values': [identifier]}]}
+
+def export_filter(identifier=EXPORT):
+    return {'Filters': [{'Name': 'export-task-identifier', 'Values': [identifier]}]}
+
+ACTIVE_FILTER = {'Filters': [{'Name': 'status', 'Values': ['starting', 'in_progress']}], 'MaxRecords': ANY}
+
+def active_tasks(count):
+    return {'ExportTasks': [{'ExportTaskIdentifier': f"export-other-{i}", 'Status': 'IN_PROGRESS'}
+                            for i in range(count)]}
+
+class AdvanceBackupTest(unittest.TestCase):
+    def setUp(self):
+        self.state_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.state_dir)
+        self.store = BackupStateStore(self.state_dir)
+        self.rds = boto3.client('rds', region_name='us-east-1', aws_access_key_id='testing',
+                                aws_secret_access_key='testing')
+        self.stubber = Stubber(self.rds)
+        self.stubber.activate()
+        self.addCleanup(self.stubber.deactivate)
+        account_id, rds_s3_backup._account_id = rds_s3_backup._account_id, '123456789012'
+        self.addCleanup(setattr, rds_s3_backup, '_account_id', account_id)
+
+    def advance(self, start=False, now=NOW):
+        return advance_backup(self.rds, self.store, DB, 'manual-backup', 'backup-bucket',
+                              'arn:aws:iam::123456789012:role/export', KMS_KEY, start=start, now=now)
+
+    def test_nothing_happens_without_start(self):
+        self.assertIsNone(self.advance())
+        self.stubber.assert_no_pending_responses()
+
+    def test_full_backup_across_invocations(self):
+        self.stubber.add_response('describe_db_snapshots', {'DBSnapshots': []}, snapshot_filter())
+        self.stubber.add_response('create_db_snapshot', {}, {
+            'DBInstanceIdentifier': DB, 'DBSnapshotIdentifier': SNAPSHOT})
+        state = self.advance(start=True)
+        self.assertEqual(state['state'], 'snapshot_requested')
+
+        self.stubber.add_response('describe_db_snapshots', {'DBSnapshots': [
+            {'DBSnapshotIdentifier': SNAPSHOT, 'Status': 'creating'}]}, snapshot_filter())
+        self.assertEqual(self.advance(now=NOW + 60)['state'], 'snapshot_requested')
+
+        self.stubber.add_response('describe_db_snapshots', {'DBSnapshots': [
+            {'DBSnapshotIdentifier': SNAPSHOT, 'Status': 'available'}]}, snapshot_filter())
+        self.stubber.add_response('describe_export_tasks', active_tasks(2), ACTIVE_FILTER)
+        self.stubber.add_response('describe_export_tasks', {'ExportTasks': []}, export_filter())
+        self.stubber.add_response('start_export_task', {}, {
+            'ExportTaskIdentifier': EXPORT, 'SourceArn': ANY, 'S3BucketName': 'backup-bucket',
+            'IamRoleArn': 'arn:aws:iam::123456789012:role/export', 'KmsKeyId': KMS_KEY})
+        self.assertEqual(self.advance(now=NOW + 120)['state'], 'export_started')
+
+        self.stubber.add_response('describe_export_tasks', {'ExportTasks': [
+            {'ExportTaskIdentifier': EXPORT, 'Status': 'COMPLETE'}]}, export_filter())
+        state = self.advance(now=NOW + 180)
+        self.assertEqual(state['state'], 'completed')
+        self.assertEqual([entry['state'] for entry in state['history']],
+                         ['snapshot_requested', 'snapshot_available', 'export_started', 'completed'])
+        self.assertEqual(self.store.load(DB)['state'], 'completed')
+        self.stubber.assert_no_pending_responses()
+
+    def test_resumes_after_snapshot_already_exists(self):
+        # A snapshot requested by an invocation that died before saving is
+        # not visible yet; the retry's create hits AlreadyExists and waits.
+        self.stubber.add_response('describe_db_snapshots', {'DBSnapshots': []}, snapshot_filter())
+        self.stubber.add_client_error('create_db_snapshot', 'DBSnapshotAlreadyExists', http_status_code=400)
+        state = self.advance(start=True)
+        self.assertEqual(state['state'], 'snapshot_requested')
+        self.assertIsNone(state['error'])
+
+        self.stubber.add_response('describe_db_snapshots', {'DBSnapshots': [
+            {'DBSnapshotIdentifier': SNAPSHOT, 'Status': 'available'}]}, snapshot_filter())
+        self.stubber.add_response('describe_export_tasks', active_tasks(2), ACTIVE_FILTER)
+        self.stubber.add_response('describe_export_tasks', {'ExportTasks': []}, export_filter())
+        self.stubber.add_client_error('start_export_task', 'ExportTaskAlreadyExists', http_status_code=400)
+        self.assertEqual(self.advance(now=NOW + 60)['state'], 'export_started')
+
+        self.stubber.add_response('describe_export_tasks', {'ExportTasks': [
+            {'ExportTaskIdentifier': EXPORT, 'Status': 'COMPLETE'}]}, export_filter())
+        self.assertEqual(self.advance(now=NOW + 120)['state'], 'completed')
+        self.stubber.assert_no_pending_responses()
+
+    def test_waits_for_an_export_slot(self):
+        self.store.save({'db_instance_identifier': DB, 'snapshot_identifier': SNAPSHOT,
+                         'export_task_identifier': EXPORT, 'state': 'snapshot_available', 'deadline': None,
+                         'error': None, 'history': []})
+        self.stubber.add_response('describe_export_tasks', active_tasks(5), ACTIVE_FILTER)
+        self.assertEqual(self.advance()['state'], 'snapshot_available')
+        self.stubber.add_response('describe_export_tasks', active_tasks(4), ACTIVE_FILTER)
+        self.stubber.add_response('describe_export_tasks', {'ExportTasks': []}, export_filter())
+        self.stubber.add_response('start_export_task', {}, {
+            'ExportTaskIdentifier': EXPORT, 'SourceArn': ANY, 'S3BucketName': 'backup-bucket',
+            'IamRoleArn': 'arn:aws:iam::123456789012:role/export', 'KmsKeyId': KMS_KEY})
+        self.assertEqual(self.advance(now=NOW + 60)['state'], 'export_started')
+        self.stubber.assert_no_pending_responses()
+
+    def test_failed_export(self):
+        self.store.save({'db_instance_identifier': DB, 'snapshot_identifier': SNAPSHOT,
+                         'export_task_identifier': EXPORT, 'state': 'export_started', 'deadline': None,
+                         'error': None, 'history': []})
+        self.stubber.add_response('describe_export_tasks', {'ExportTasks': [
+            {'ExportTaskIdentifier': EXPORT, 'Status': 'FAILED', 'FailureCause': 'bucket gone'}]}, export_filter())
+        state = self.advance()
+        self.assertEqual(state['state'], 'failed')
+        self.assertIn('bucket gone', state['error'])
+
+    def test_times_out_without_calling_aws(self):
+        self.stubber.add_response('describe_db_snapshots', {'DBSnapshots': []}, snapshot_filter())
+        self.stubber.add_response('create_db_snapshot', {}, {
+            'DBInstanceIdentifier': DB, 'DBSnapshotIdentifier': SNAPSHOT})
+        self.advance(start=True)
+        state = self.advance(now=NOW + 61 * 60)
+        self.assertEqual(state['state'], 'failed')
+        self.assertIn('timed out', state['error'])
+        self.stubber.assert_no_pending_responses()
+
+    def test_api_error_is_raised_and_state_kept(self):
+        self.stubber.add_response('describe_db_snapshots', {'DBSnapshots': []}, snapshot_filter())
+        self.stubber.add_client_error('create_db_snapshot', 'InvalidDBInstanceState', http_status_code=400)
+        with self.assertRaises(self.rds.exceptions.InvalidDBInstanceStateFault):
+            self.advance(start=True)
+        self.assertEqual(self.store.load(DB)['state'], 'snapshot_requested')
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+class FakePoller:
+    """Every snapshot is available at once; counting the exports in progress always fails."""
+
+    def snapshot_statuses(self, snapshot_identifiers):
+        return {identifier: 'available' for identifier in snapshot_identifiers}
+
+    def export_tasks(self, export_task_identifiers):
+        return {}
+
+    def active_exports(self):
+        raise ClientError({'Error': {'Code': 'AccessDenied', 'Message': 'denied'}}, 'DescribeExportTasks')
+
+    def next_wait(self, changed):
+        return 60
+
+class BackupInstancesTest(unittest.TestCase):
+    def test_waiting_for_an_export_slot_times_out(self):
+        rds = boto3.client('rds', region_name='us-east-1', aws_access_key_id='testing',
+                           aws_secret_access_key='testing')
+        stubber = Stubber(rds)
+        stubber.add_response('describe_account_attributes', {'AccountQuotas': []})
+        stubber.add_response('create_db_snapshot', {}, {'DBInstanceIdentifier': DB, 'DBSnapshotIdentifier': ANY})
+        clock = FakeClock()
+        with stubber, self.assertLogs(level='WARNING'):
+            jobs = backup_instances(rds, [DB], 'manual-backup', 'backup-bucket', 'role', account_id='123456789012',
+                                    export_timeout_minutes=30, poller=FakePoller(), clock=clock,
+                                    sleep=clock.sleep)
+        self.assertEqual((jobs[0].state, jobs[0].error), ('failed', 'timed out'))
+        self.assertLessEqual(clock.now, 32 * 60)
+
+class LambdaHandlerTest(unittest.TestCase):
+    def test_missing_state_location(self):
+        event = {'db_instance_identifiers': DB, 's3_bucket_name': 'backup-bucket', 'iam_role_arn': 'role'}
+        with self.assertRaisesRegex(ValueError, 'STATE_LOCATION'):
+            lambda_handler(event)
+
+class VerifyExportsTest(unittest.TestCase):
+    def test_uses_its_own_client_sized_for_the_workers(self):
+        import rds_export_verify
+        with mock.patch.dict(rds_s3_backup._clients), \
+                mock.patch.object(rds_export_verify, 'verify_export', return_value={'ok': True}) as verify, \
+                mock.patch.object(rds_export_verify, 'log_verification'):
+            cached = get_client('s3', 'us-east-1') # as the state store creates it
+            self.assertTrue(verify_exports('us-east-1', 'backup-bucket', [EXPORT]))
+        s3_client = verify.call_args[0][0]
+        self.assertIsNot(s3_client, cached)
+        self.assertEqual(s3_client.meta.config.max_pool_connections, rds_export_verify.DEFAULT_WORKERS)
+
+if __name__ == '__main__':
+    unittest.main()
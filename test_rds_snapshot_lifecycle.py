@@ -0,0 +1,79 @@
+import datetime
+import unittest
+
+from rds_snapshot_lifecycle import MAX_CROSS_REGION_COPIES, plan_lifecycle, retained
+
+def snapshot(taken, status='available', instance='orders-db', encrypted=False):
+    snapshot_id = f"manual-backup-{instance}-{taken:%Y%m%d-%H%M%S}"
+    return {'id': snapshot_id, 'arn': f"arn:aws:rds:us-east-1:123456789012:snapshot:{snapshot_id}",
+            'instance': instance, 'taken': taken, 'status': status, 'gib': 100, 'encrypted': encrypted}
+
+def daily(days, start=datetime.datetime(2026, 3, 31, 2, 0), **kwargs):
+    """One snapshot a day for `days` days, newest first."""
+    return [snapshot(start - datetime.timedelta(days=i), **kwargs) for i in range(days)]
+
+def ids(snapshots):
+    return {s['id'] for s in snapshots}
+
+class RetainedTest(unittest.TestCase):
+    def test_daily_keeps_newest_per_day(self):
+        snapshots = daily(10) + [snapshot(datetime.datetime(2026, 3, 31, 1, 0))]
+        self.assertEqual(retained(snapshots, {'daily': 3}), ids(daily(3)))
+
+    def test_weekly_and_monthly_keep_newest_of_each_period(self):
+        snapshots = daily(70)
+        kept = retained(snapshots, {'daily': 0, 'weekly': 2, 'monthly': 3})
+        taken = sorted(s['taken'].date() for s in snapshots if s['id'] in kept)
+        self.assertEqual([str(day) for day in taken],
+                         ['2026-01-31', '2026-02-28', '2026-03-29', '2026-03-31'])
+
+    def test_periods_overlap(self):
+        self.assertEqual(retained(daily(3), {'daily': 2, 'weekly': 1, 'monthly': 1}), ids(daily(2)))
+
+    def test_only_available_snapshots_fill_periods(self):
+        creating = snapshot(datetime.datetime(2026, 4, 1, 2, 0), status='creating')
+        kept = retained([creating] + daily(5), {'daily': 2})
+        self.assertEqual(kept, ids(daily(2)))
+
+class PlanLifecycleTest(unittest.TestCase):
+    retention = {'daily': 2, 'weekly': 0, 'monthly': 0}
+
+    def test_deletes_expired_and_keeps_pending(self):
+        creating = snapshot(datetime.datetime(2026, 4, 1, 2, 0), status='creating')
+        plan = plan_lifecycle({'orders-db': [creating] + daily(4)}, self.retention)
+        self.assertEqual(ids(plan['keep']), ids([creating] + daily(2)))
+        self.assertEqual([(where, s['id']) for where, s in plan['delete']],
+                         [('source', s['id']) for s in daily(4)[2:]])
+        self.assertEqual(plan['copy'], [])
+
+    def test_copies_survivors_missing_from_dr(self):
+        source = daily(3)
+        plan = plan_lifecycle({'orders-db': source}, self.retention, dr={'orders-db': [source[1]]})
+        self.assertEqual(ids(plan['copy']), {source[0]['id']})
+        self.assertEqual(plan['delete'], [('source', source[2])])
+
+    def test_applies_retention_in_dr(self):
+        source = daily(2)
+        dr = daily(4)
+        plan = plan_lifecycle({'orders-db': source}, self.retention, dr={'orders-db': dr})
+        self.assertEqual([(where, s['id']) for where, s in plan['delete']], [('dr', s['id']) for s in dr[2:]])
+
+    def test_encrypted_copies_need_a_dr_key(self):
+        source = daily(1, encrypted=True)
+        plan = plan_lifecycle({'orders-db': source}, self.retention, dr={})
+        self.assertEqual(plan['copy'], [])
+        self.assertEqual([s['id'] for s, _ in plan['skipped']], [source[0]['id']])
+        plan = plan_lifecycle({'orders-db': source}, self.retention, dr={}, dr_kms_key_id='alias/dr')
+        self.assertEqual(plan['copy'], source)
+
+    def test_copies_beyond_the_limit_are_deferred(self):
+        instances = [f"db-{i}" for i in range(MAX_CROSS_REGION_COPIES + 3)]
+        source = {db: daily(1, instance=db) for db in instances}
+        in_flight = daily(1, instance='db-0', status='copying')
+        plan = plan_lifecycle(source, self.retention, dr={'db-0': in_flight})
+        # db-0's copy is the one in flight: it takes a slot and is not copied again.
+        self.assertEqual(len(plan['copy']), MAX_CROSS_REGION_COPIES - 1)
+        self.assertEqual(len(plan['deferred']), 3)
+
+if __name__ == '__main__':
+    unittest.main()
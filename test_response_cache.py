@@ -0,0 +1,125 @@
+import gzip
+import unittest
+import zlib
+
+from flask import Flask, Response, jsonify
+
+from response_cache import CachedResponse, ResponseCache
+
+def entry(size):
+    return CachedResponse('etag', 'application/json', [], {'identity': b'x' * size}, size, None)
+
+class LruTest(unittest.TestCase):
+    def test_evicts_least_recently_used_by_bytes(self):
+        cache = ResponseCache(max_bytes=100)
+        for key in 'abc':
+            cache.put(key, entry(30))
+        cache.get('a') # now b is the least recently used
+        cache.put('d', entry(30))
+        self.assertIsNone(cache.get('b'))
+        self.assertEqual([k for k in 'acd' if cache.get(k) is not None], ['a', 'c', 'd'])
+        self.assertEqual(cache.size, 90)
+        cache.put('e', entry(70)) # pushes out two entries
+        self.assertEqual(len(cache), 2)
+        self.assertEqual(cache.size, 100)
+
+    def test_oversized_entries_and_replacement(self):
+        cache = ResponseCache(max_bytes=100)
+        cache.put('a', entry(101))
+        self.assertEqual((len(cache), cache.size), (0, 0))
+        cache.put('a', entry(10))
+        cache.put('a', entry(20))
+        self.assertEqual((len(cache), cache.size), (1, 20))
+
+    def test_hits_and_misses(self):
+        found = []
+        cache = ResponseCache(on_lookup=found.append)
+        cache.get('a')
+        cache.put('a', entry(1))
+        cache.get('a')
+        self.assertEqual((cache.hits, cache.misses, found), (1, 1, [False, True]))
+
+class CachedViewTest(unittest.TestCase):
+    def setUp(self):
+        self.cache = ResponseCache()
+        self.version = 'v1'
+        self.calls = 0
+        flask_app = Flask(__name__)
+
+        @flask_app.route('/data')
+        @self.cache.cached(version=lambda: self.version)
+        def data():
+            self.calls += 1
+            return jsonify({'items': [f"item {i}" for i in range(100)], 'version': self.version})
+
+        @flask_app.route('/small')
+        @self.cache.cached()
+        def small():
+            return jsonify({'ok': True})
+
+        @flask_app.route('/missing')
+        @self.cache.cached()
+        def missing():
+            return jsonify({'error': 'not found'}), 404
+
+        @flask_app.route('/stream')
+        @self.cache.cached()
+        def stream():
+            return Response(iter(['a\n', 'b\n']), mimetype='application/x-ndjson')
+
+        @flask_app.route('/swapping')
+        @self.cache.cached(version=lambda: self.version)
+        def swapping():
+            self.version = 'v2' # as if the timetable was swapped while the view ran
+            return jsonify({'version': self.version})
+
+        self.client = flask_app.test_client()
+
+    def test_serves_from_cache_until_the_version_changes(self):
+        first = self.client.get('/data')
+        self.assertEqual(self.client.get('/data').get_data(), first.get_data())
+        self.assertEqual(self.calls, 1)
+        self.version = 'v2'
+        self.assertEqual(self.client.get('/data').get_json()['version'], 'v2')
+        self.assertEqual(self.calls, 2)
+        self.client.get('/data?b=2&a=1')
+        self.client.get('/data?a=1&b=2')
+        self.assertEqual(self.calls, 3)
+
+    def test_etag_and_304(self):
+        etag = self.client.get('/data').headers['ETag']
+        response = self.client.get('/data', headers={'If-None-Match': etag})
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.get_data(), b'')
+        gzip_etag = self.client.get('/data', headers={'Accept-Encoding': 'gzip'}).headers['ETag']
+        self.assertEqual(gzip_etag, etag[:-1] + '-gzip"')
+        for validator in (gzip_etag, f"W/{etag}", f'"other", {etag}', '*'):
+            with self.subTest(validator):
+                self.assertEqual(self.client.get('/data', headers={'If-None-Match': validator}).status_code, 304)
+        self.assertEqual(self.client.get('/data', headers={'If-None-Match': '"other"'}).status_code, 200)
+
+    def test_compressed_variants(self):
+        identity = self.client.get('/data').get_data()
+        cases = (('gzip', 'gzip', gzip.decompress), ('deflate', 'deflate', zlib.decompress),
+                 ('gzip;q=0, deflate', 'deflate', zlib.decompress), ('br', None, None), ('', None, None))
+        for accept, coding, decompress in cases:
+            with self.subTest(accept):
+                response = self.client.get('/data', headers={'Accept-Encoding': accept})
+                self.assertEqual(response.headers['Vary'], 'Accept-Encoding')
+                self.assertEqual(response.headers.get('Content-Encoding'), coding)
+                body = response.get_data()
+                self.assertEqual(decompress(body) if decompress else body, identity)
+        self.assertIsNone(self.client.get('/small', headers={'Accept-Encoding': 'gzip'})
+                          .headers.get('Content-Encoding'))
+
+    def test_errors_and_streams_are_not_cached(self):
+        self.assertEqual(self.client.get('/missing').status_code, 404)
+        self.assertEqual(self.client.get('/stream').get_data(), b'a\nb\n')
+        self.assertEqual(len(self.cache), 0)
+
+    def test_not_cached_when_the_version_changes_during_the_view(self):
+        self.assertEqual(self.client.get('/swapping').get_json(), {'version': 'v2'})
+        self.assertEqual(len(self.cache), 0)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,88 @@
+import logging
+import unittest
+
+from schedule_deltas import apply_deltas, validate_delta
+from schedule_store import ScheduleStore
+
+TRIPS = [
+    {'train_id': 'T101', 'origin': 'Station A', 'destination': 'Station B',
+     'departure_time': '08:00', 'arrival_time': '09:00'},
+    {'train_id': 'T101', 'origin': 'Station B', 'destination': 'Station C',
+     'departure_time': '09:10', 'arrival_time': '10:00'},
+    {'train_id': 'T202', 'origin': 'Station C', 'destination': 'Station A',
+     'departure_time': '12:00', 'arrival_time': '13:30'},
+]
+NEW_TRIP = {'train_id': 'T303', 'origin': 'Station D', 'destination': 'Station A',
+            'departure_time': '07:00', 'arrival_time': '07:45'}
+
+def all_trips(store):
+    return store.trips(range(len(store)))
+
+class ValidateDeltaTest(unittest.TestCase):
+    def test_valid_deltas(self):
+        for delta in ({'op': 'add', 'trip': NEW_TRIP}, {'op': 'cancel', 'train_id': 'T101'},
+                      {'op': 'cancel', 'train_id': 'T101', 'origin': 'Station A'},
+                      {'op': 'delay', 'train_id': 'T101', 'minutes': -5}):
+            validate_delta(delta)
+
+    def test_invalid_deltas(self):
+        for delta in (['add'], {'op': 'move'}, {'op': 'add', 'trip': dict(NEW_TRIP, origin=None)},
+                      {'op': 'add', 'trip': dict(NEW_TRIP, departure_time='07:75')},
+                      {'op': 'cancel'}, {'op': 'cancel', 'train_id': 'T101', 'origin': ['Station A']},
+                      {'op': 'delay', 'train_id': 'T101'}, {'op': 'delay', 'train_id': 'T101', 'minutes': '5'},
+                      {'op': 'delay', 'train_id': 'T101', 'minutes': True}):
+            with self.subTest(delta=delta), self.assertRaises(ValueError):
+                validate_delta(delta)
+
+class ApplyDeltasTest(unittest.TestCase):
+    def setUp(self):
+        self.store = ScheduleStore.from_trips(TRIPS)
+        logging.disable(logging.WARNING)
+        self.addCleanup(logging.disable, logging.NOTSET)
+
+    def test_add_keeps_departure_order_and_interns_stations(self):
+        store = apply_deltas(self.store, [{'op': 'add', 'trip': NEW_TRIP}])
+        self.assertEqual(all_trips(store)[0], NEW_TRIP)
+        self.assertEqual(len(store), 4)
+        self.assertEqual(list(store.trips(store.query(origin='Station D'))), [NEW_TRIP])
+
+    def test_rows_stay_in_sort_key_order_with_new_names(self):
+        # 'A000' and 'Station 0' are interned after the existing names but sort before them.
+        trip = dict(NEW_TRIP, train_id='A000', origin='Station 0', departure_time='08:00')
+        store = apply_deltas(self.store, [{'op': 'add', 'trip': trip}])
+        keys = [store.sort_key(row) for row in range(len(store))]
+        self.assertEqual(keys, sorted(keys))
+        self.assertEqual(all_trips(store)[0], trip)
+
+    def test_cancel_whole_run_or_one_stop(self):
+        store = apply_deltas(self.store, [{'op': 'cancel', 'train_id': 'T101', 'origin': 'Station B'}])
+        self.assertEqual([t['origin'] for t in all_trips(store)], ['Station A', 'Station C'])
+        store = apply_deltas(self.store, [{'op': 'cancel', 'train_id': 'T101'}])
+        self.assertEqual([t['train_id'] for t in all_trips(store)], ['T202'])
+
+    def test_delay_shifts_both_times(self):
+        store = apply_deltas(self.store, [{'op': 'delay', 'train_id': 'T202', 'minutes': 15}])
+        self.assertEqual(all_trips(store)[-1]['departure_time'], '12:15')
+        self.assertEqual(all_trips(store)[-1]['arrival_time'], '13:45')
+
+    def test_delay_out_of_range_is_skipped(self):
+        store = apply_deltas(self.store, [{'op': 'delay', 'train_id': 'T101', 'minutes': -600}])
+        self.assertEqual(all_trips(store), all_trips(self.store))
+
+    def test_bad_delta_does_not_lose_the_rest_of_the_batch(self):
+        store = apply_deltas(self.store, [
+            {'op': 'cancel', 'train_id': 'T202'},
+            {'op': 'delay', 'train_id': 'T101', 'minutes': True},
+            {'op': 'cancel', 'train_id': 'T101', 'origin': {'name': 'Station A'}},
+            {'op': 'add', 'trip': NEW_TRIP},
+        ])
+        self.assertEqual([t['train_id'] for t in all_trips(store)], ['T303', 'T101', 'T101'])
+
+    def test_input_store_is_untouched(self):
+        before = all_trips(self.store)
+        apply_deltas(self.store, [{'op': 'cancel', 'train_id': 'T101'}, {'op': 'add', 'trip': NEW_TRIP}])
+        self.assertEqual(all_trips(self.store), before)
+        self.assertIsNone(self.store.station_id('Station D'))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,60 @@
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+from schedule_snapshot import MAGIC, load_snapshot, write_snapshot
+from schedule_store import ScheduleStore
+from test_schedule_store import random_trips
+
+def section_typecodes(path):
+    with open(path, 'rb') as f:
+        data = f.read()
+    header_length = int.from_bytes(data[len(MAGIC):len(MAGIC) + 4], 'little')
+    header = json.loads(data[len(MAGIC) + 4:len(MAGIC) + 4 + header_length])
+    return {name: info['typecode'] for name, info in header['sections'].items()}
+
+class SnapshotRoundTripTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        self.store = ScheduleStore.from_trips(random_trips(300))
+
+    def path(self, name):
+        return os.path.join(self.directory, name)
+
+    def assertSameQueries(self, store):
+        self.assertEqual(len(store), len(self.store))
+        self.assertEqual(list(store.stations), list(self.store.stations))
+        for kwargs in ({}, {'origin': 'Station A'}, {'destination': 'Station B', 'depart_from': 600},
+                       {'origin': 'Station C', 'destination': 'Station D', 'depart_to': 900},
+                       {'after': self.store.sort_key(150), 'limit': 20}):
+            with self.subTest(**kwargs):
+                self.assertEqual(store.trips(store.query(**kwargs)), self.store.trips(self.store.query(**kwargs)))
+
+    def test_write_load_write_keeps_types_and_results(self):
+        write_snapshot(self.store, self.path('first.snap'))
+        loaded = load_snapshot(self.path('first.snap'))
+        # A store loaded from a snapshot has memoryview columns; writing it again must keep their types.
+        write_snapshot(loaded, self.path('second.snap'))
+        reloaded = load_snapshot(self.path('second.snap'))
+
+        typecodes = section_typecodes(self.path('first.snap'))
+        self.assertEqual(section_typecodes(self.path('second.snap')), typecodes)
+        self.assertEqual((typecodes['departure'], typecodes['train'], typecodes['origin_keys']), ('H', 'I', 'q'))
+        for name in ('train', 'origin', 'destination', 'departure', 'arrival'):
+            self.assertEqual(getattr(reloaded, name).format, getattr(self.store, name).typecode)
+        self.assertEqual(loaded.version, self.store.version)
+        self.assertEqual(reloaded.version, self.store.version)
+        self.assertSameQueries(loaded)
+        self.assertSameQueries(reloaded)
+
+    def test_rejects_other_files(self):
+        with open(self.path('other.snap'), 'wb') as f:
+            f.write(b'not a snapshot at all')
+        with self.assertRaises(ValueError):
+            load_snapshot(self.path('other.snap'))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,88 @@
+import random
+import unittest
+
+from schedule_store import MAX_MINUTES, TIME_BITS, ScheduleStore, format_time, parse_time
+
+def random_trips(count, seed=7):
+    rng = random.Random(seed)
+    stations = [f"Station {c}" for c in 'ABCDEF']
+    trips = []
+    for i in range(count):
+        origin, destination = rng.sample(stations, 2)
+        departure = rng.randrange(0, 26 * 60)
+        trips.append({'train_id': f"T{rng.randrange(40):03d}", 'origin': origin, 'destination': destination,
+                      'departure_time': format_time(departure),
+                      'arrival_time': format_time(departure + rng.randrange(5, 90))})
+    return trips
+
+def linear(store, origin=None, destination=None, depart_from=None, depart_to=None, after=None):
+    """The rows query() should return, by scanning every row."""
+    return [row for row in range(len(store))
+            if (origin is None or store.stations[store.origin[row]] == origin)
+            and (destination is None or store.stations[store.destination[row]] == destination)
+            and (depart_from is None or store.departure[row] >= depart_from)
+            and (depart_to is None or store.departure[row] <= depart_to)
+            and (after is None or store.sort_key(row) > after)]
+
+class ParseTimeTest(unittest.TestCase):
+    def test_valid(self):
+        self.assertEqual(parse_time('00:00'), 0)
+        self.assertEqual(parse_time('08:05'), 485)
+        self.assertEqual(parse_time('25:30'), 25 * 60 + 30) # overnight runs
+        self.assertEqual(parse_time(format_time(MAX_MINUTES)), MAX_MINUTES)
+
+    def test_invalid(self):
+        for value in ('8', '08:60', '-1:00', '08:-5', 'ab:cd', '08:00:00', None, format_time(MAX_MINUTES + 1)):
+            with self.subTest(value=value), self.assertRaises(ValueError):
+                parse_time(value)
+
+class QueryTest(unittest.TestCase):
+    def setUp(self):
+        self.store = ScheduleStore.from_trips(random_trips(500))
+
+    def test_rows_are_in_sort_key_order(self):
+        keys = [self.store.sort_key(row) for row in range(len(self.store))]
+        self.assertEqual(keys, sorted(keys))
+
+    def test_matches_a_linear_filter(self):
+        stations = list(self.store.stations) + ['Nowhere']
+        windows = [(None, None), (9 * 60, 9 * 60), (8 * 60, 12 * 60), (None, 7 * 60), (20 * 60, None), (600, 500)]
+        for origin in [None] + stations:
+            for destination in [None] + stations:
+                for depart_from, depart_to in windows:
+                    with self.subTest(origin=origin, destination=destination, window=(depart_from, depart_to)):
+                        rows = self.store.query(origin, destination, depart_from, depart_to)
+                        self.assertEqual(list(rows), linear(self.store, origin, destination, depart_from, depart_to))
+
+    def test_window_bounds_are_inclusive_at_group_edges(self):
+        # The composite keys of neighbouring groups meet at (group << TIME_BITS) | MAX_MINUTES.
+        store = ScheduleStore.from_trips([
+            {'train_id': 'T1', 'origin': 'A', 'destination': 'B', 'departure_time': '00:00', 'arrival_time': '00:10'},
+            {'train_id': 'T2', 'origin': 'A', 'destination': 'B', 'departure_time': format_time(MAX_MINUTES),
+             'arrival_time': format_time(MAX_MINUTES)},
+            {'train_id': 'T3', 'origin': 'B', 'destination': 'A', 'departure_time': '00:00', 'arrival_time': '00:10'},
+        ])
+        keys, _ = store.indexes['origin']
+        self.assertEqual(list(keys), [0, MAX_MINUTES, 1 << TIME_BITS])
+        self.assertEqual([store.trip(row)['train_id'] for row in store.query(origin='A')], ['T1', 'T2'])
+        self.assertEqual([store.trip(row)['train_id'] for row in store.query(origin='B')], ['T3'])
+        self.assertEqual(len(store.query(origin='A', depart_from=MAX_MINUTES)), 1)
+        self.assertEqual(len(store.query(origin='A', depart_to=0)), 1)
+
+    def test_after_resumes_past_the_cursor(self):
+        for origin, destination in ((None, None), ('Station A', None), (None, 'Station C'), ('Station B', 'Station D')):
+            rows = linear(self.store, origin, destination)
+            for cut in (0, 1, len(rows) // 2, len(rows) - 1):
+                after = self.store.sort_key(rows[cut])
+                with self.subTest(origin=origin, destination=destination, after=after):
+                    self.assertEqual(list(self.store.query(origin, destination, after=after)), rows[cut + 1:])
+        # A key that is not in the store resumes at the next row that sorts after it.
+        after = (9 * 60, 'T', '', '', 0)
+        self.assertEqual(list(self.store.query(after=after)), linear(self.store, after=after))
+
+    def test_limit(self):
+        self.assertEqual(list(self.store.query(origin='Station A', limit=5)), linear(self.store, 'Station A')[:5])
+        self.assertEqual(list(self.store.query(limit=0)), [])
+
+if __name__ == '__main__':
+    unittest.main()